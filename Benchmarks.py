@@ -0,0 +1,1200 @@
+"""
+Name:           Benchmarks
+
+Purpose:        Timing comparisons between the scalar utility functions
+                and their batch counterparts
+                Run as a script to execute all of the benchmarks
+
+Dependencies:   numpy, requests, GeometryUtils, GISUtils
+
+Version:        3.6
+
+Author:         ted.chapin
+
+Created:        10/18/2026
+"""
+
+
+import contextlib
+import csv
+import http.server
+import json
+import logging
+import math
+import os
+import requests
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import numpy as np
+import ConfigUtils
+import FTPUtils
+import GeometryUtils
+import GISUtils
+
+
+def main():
+    benchmark_calc_coords()
+    benchmark_calc_dist()
+    benchmark_calc_dist_matrix()
+    benchmark_get_station()
+    benchmark_export_table_to_csv()
+    benchmark_token_cache()
+    benchmark_format_station()
+    benchmark_create_rectangles()
+    benchmark_geodesic()
+    benchmark_point_index()
+    benchmark_get_prior_date()
+    benchmark_import_time()
+    benchmark_add_message()
+    benchmark_geometry_backend()
+    benchmark_call_overhead()
+    benchmark_ftp_pool()
+    benchmark_ftp_sync()
+    benchmark_ftp_upload()
+    benchmark_ftp_folder_tree()
+    benchmark_ftp_listing()
+
+    return
+
+
+def benchmark_add_message(n=100000, distinct=100):
+    """
+    purpose:
+        Compare add_message sending each message with add_message through a MessageSink
+        Output goes to a line buffered os.devnull, one write per line like a console,
+        so the terminal's drawing speed doesn't affect the result.
+    arguments:
+        n: int
+            number of messages
+        distinct: int
+            every distinct-th message is different, the rest repeat the one before it
+    return value: dictionary
+        scalar_seconds: float
+        batch_seconds: float
+    """
+
+    messages = ["feature {0} processed".format(i - i % distinct) for i in range(n)]
+    with open(os.devnull, "w", buffering=1) as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        for message in messages:
+            GISUtils.add_message(message)
+        scalar_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with GISUtils.MessageSink() as sink:
+            for message in messages:
+                GISUtils.add_message(message, "message", sink)
+        batch_seconds = time.perf_counter() - start
+
+    _report("add_message", n, scalar_seconds, batch_seconds)
+    return {"scalar_seconds": scalar_seconds, "batch_seconds": batch_seconds}
+
+
+def benchmark_calc_coords(n=100000, seed=0):
+    """
+    purpose:
+        Compare calc_coords called once per shot with calc_coords_batch
+    arguments:
+        n: int
+            number of survey shots
+        seed: int
+            random seed for the generated shots
+    return value: dictionary
+        scalar_seconds: float
+        batch_seconds: float
+        max_difference: float
+            largest absolute coordinate difference between the two methods
+    """
+
+    rng = np.random.default_rng(seed)
+    starting_points = rng.uniform(0, 10000, (n, 3))
+    distances = rng.uniform(1, 500, n)
+    h_angles = rng.uniform(0, 360, n)
+    v_angles = rng.uniform(0, 180, n)
+
+    start = time.perf_counter()
+    scalar_coords = [
+        GISUtils.calc_coords(tuple(starting_points[i]), distances[i], h_angles[i], v_angles[i])["coords"]
+        for i in range(n)
+    ]
+    scalar_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = GISUtils.calc_coords_batch(starting_points, distances, h_angles, v_angles)
+    batch_seconds = time.perf_counter() - start
+
+    max_difference = float(np.max(np.abs(np.array(scalar_coords) - batch["coords"])))
+    _report("calc_coords", n, scalar_seconds, batch_seconds, max_difference)
+    return {"scalar_seconds": scalar_seconds, "batch_seconds": batch_seconds, "max_difference": max_difference}
+
+
+def benchmark_calc_dist(n=100000, seed=0):
+    """
+    purpose:
+        Compare calc_dist called once per pair with calc_dist_batch
+    arguments:
+        n: int
+            number of point pairs
+        seed: int
+            random seed for the generated points
+    return value: dictionary
+        scalar_seconds: float
+        batch_seconds: float
+        max_difference: float
+            largest absolute 2D or 3D distance difference between the two methods
+    """
+
+    rng = np.random.default_rng(seed)
+    points1 = rng.uniform(0, 10000, (n, 3))
+    points2 = rng.uniform(0, 10000, (n, 3))
+
+    start = time.perf_counter()
+    scalar = [GISUtils.calc_dist(tuple(points1[i]), tuple(points2[i])) for i in range(n)]
+    scalar_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = GISUtils.calc_dist_batch(points1, points2)
+    batch_seconds = time.perf_counter() - start
+
+    max_difference = max(
+        float(np.max(np.abs(np.array([d["distance2D"] for d in scalar]) - batch["distance2D"]))),
+        float(np.max(np.abs(np.array([d["distance3D"] for d in scalar]) - batch["distance3D"])))
+    )
+    _report("calc_dist", n, scalar_seconds, batch_seconds, max_difference)
+    return {"scalar_seconds": scalar_seconds, "batch_seconds": batch_seconds, "max_difference": max_difference}
+
+
+def benchmark_calc_dist_matrix(n=1000, dimension=3, chunk_size=256, seed=0):
+    """
+    purpose:
+        Compare nested calc_dist loops with the chunked calc_dist_matrix
+    arguments:
+        n: int
+            number of points, the matrix has n * n cells
+        dimension: int
+            2 or 3
+        chunk_size: int
+            rows per chunk passed to calc_dist_matrix
+        seed: int
+            random seed for the generated points
+    return value: dictionary
+        scalar_seconds: float
+        batch_seconds: float
+        max_difference: float
+    """
+
+    rng = np.random.default_rng(seed)
+    points = rng.uniform(0, 10000, (n, 3))
+    key = "distance{0}D".format(dimension)
+    point_tuples = [tuple(point) for point in points]
+
+    start = time.perf_counter()
+    scalar = [[GISUtils.calc_dist(p1, p2)[key] for p2 in point_tuples] for p1 in point_tuples]
+    scalar_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = GISUtils.calc_dist_matrix(points, dimension=dimension, chunk_size=chunk_size)
+    batch_seconds = time.perf_counter() - start
+
+    max_difference = float(np.max(np.abs(np.array(scalar) - batch["distances"])))
+    _report("calc_dist_matrix", n * n, scalar_seconds, batch_seconds, max_difference)
+    return {"scalar_seconds": scalar_seconds, "batch_seconds": batch_seconds, "max_difference": max_difference}
+
+
+def benchmark_call_overhead(n=200000, seed=0):
+    """
+    purpose:
+        Per call cost of each layer of calc_coords, calc_dist, and rotate_xy
+        inline: the arithmetic written out in the loop, no function call
+        fast: the _fast function, returns a tuple and raises on error
+        wrapper: the original function, which builds a result dictionary around the _fast function
+    arguments:
+        n: int
+            number of calls per layer
+        seed: int
+            random seed for the generated arguments
+    return value: dictionary
+        key: function name
+        value: dictionary of nanoseconds per call, keys inline, fast, wrapper
+    """
+
+    rng = np.random.default_rng(seed)
+    points = [tuple(point) for point in rng.uniform(0, 10000, (n, 3)).tolist()]
+    others = [tuple(point) for point in rng.uniform(0, 10000, (n, 3)).tolist()]
+    distances = rng.uniform(1, 500, n).tolist()
+    h_angles = rng.uniform(0, 360, n).tolist()
+    v_angles = rng.uniform(0, 180, n).tolist()
+    shots = list(zip(points, distances, h_angles, v_angles))
+    pairs = list(zip(points, others))
+    rotations = [(x, y, 5000.0, 5000.0, angle) for (x, y, z), angle in zip(points, h_angles)]
+
+    def calc_coords_inline():
+        for point, distance, h_angle, v_angle in shots:
+            h_radians = math.radians(h_angle)
+            v_radians = math.radians(v_angle)
+            horizontal = distance * math.sin(v_radians)
+            (point[0] + (horizontal * math.cos(h_radians)), point[1] + (horizontal * math.sin(h_radians)),
+             point[2] + (distance * math.cos(v_radians)))
+
+    def calc_dist_inline():
+        for point1, point2 in pairs:
+            dx2 = (point2[0] - point1[0]) ** 2
+            dy2 = (point2[1] - point1[1]) ** 2
+            math.sqrt(dx2 + dy2), math.sqrt(dx2 + dy2 + ((point2[2] - point1[2]) ** 2))
+
+    def rotate_xy_inline():
+        for x, y, x_pivot, y_pivot, angle in rotations:
+            radians = math.radians(-angle)
+            cos_a = math.cos(radians)
+            sin_a = math.sin(radians)
+            (x_pivot + (((x - x_pivot) * cos_a) - ((y - y_pivot) * sin_a)),
+             y_pivot + (((x - x_pivot) * sin_a) + ((y - y_pivot) * cos_a)))
+
+    layers = {
+        "calc_coords": (calc_coords_inline, GISUtils.calc_coords_fast, GISUtils.calc_coords, shots),
+        "calc_dist": (calc_dist_inline, GISUtils.calc_dist_fast, GISUtils.calc_dist, pairs),
+        "rotate_xy": (rotate_xy_inline, GISUtils.rotate_xy_fast, GISUtils.rotate_xy, rotations),
+    }
+    results = {}
+    for name, (inline, fast, wrapper, arguments) in layers.items():
+        start = time.perf_counter()
+        inline()
+        inline_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        for args in arguments:
+            fast(*args)
+        fast_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        for args in arguments:
+            wrapper(*args)
+        wrapper_seconds = time.perf_counter() - start
+        results[name] = {"inline": inline_seconds * 1e9 / n, "fast": fast_seconds * 1e9 / n,
+                         "wrapper": wrapper_seconds * 1e9 / n}
+        print("{0}: n={1} inline={2:.0f}ns fast={3:.0f}ns wrapper={4:.0f}ns per call".format(
+            name, n, results[name]["inline"], results[name]["fast"], results[name]["wrapper"]))
+    return results
+
+
+def benchmark_create_rectangles(n=100000, seed=0):
+    """
+    purpose:
+        Compare rectangle corners from four rotate_xy calls per rectangle,
+        the way create_rectangle builds them, with create_rectangles
+    arguments:
+        n: int
+            number of rectangles
+        seed: int
+            random seed for the generated rectangles
+    return value: dictionary
+        scalar_seconds: float
+        batch_seconds: float
+        max_difference: float
+            largest absolute corner coordinate difference between the two methods
+    """
+
+    rng = np.random.default_rng(seed)
+    x_cens = rng.uniform(0, 100000, n)
+    y_cens = rng.uniform(0, 100000, n)
+    widths = rng.uniform(1, 100, n)
+    heights = rng.uniform(1, 100, n)
+    angles = rng.uniform(-360, 360, n)
+    rectangles = list(zip(x_cens.tolist(), y_cens.tolist(), widths.tolist(), heights.tolist(), angles.tolist()))
+
+    start = time.perf_counter()
+    scalar_corners = []
+    for x_cen, y_cen, width, height, angle in rectangles:
+        scalar_corners.append([
+            GISUtils.rotate_xy(x_cen - (width / 2.0), y_cen - (height / 2.0), x_cen, y_cen, angle),
+            GISUtils.rotate_xy(x_cen - (width / 2.0), y_cen + (height / 2.0), x_cen, y_cen, angle),
+            GISUtils.rotate_xy(x_cen + (width / 2.0), y_cen + (height / 2.0), x_cen, y_cen, angle),
+            GISUtils.rotate_xy(x_cen + (width / 2.0), y_cen - (height / 2.0), x_cen, y_cen, angle)
+        ])
+    scalar_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch_corners = GISUtils.create_rectangles(x_cens, y_cens, widths, heights, angles)
+    batch_seconds = time.perf_counter() - start
+
+    max_difference = float(np.max(np.abs(np.array(scalar_corners) - batch_corners)))
+    _report("create_rectangles", n, scalar_seconds, batch_seconds, max_difference)
+    return {"scalar_seconds": scalar_seconds, "batch_seconds": batch_seconds, "max_difference": max_difference}
+
+
+def benchmark_export_table_to_csv(n=1000000, seed=0):
+    """
+    purpose:
+        Compare writing rows one writerow at a time with the batched export_table_to_csv
+        The rows come from an IterableRowSource so arcpy is not needed.
+    arguments:
+        n: int
+            number of rows
+        seed: int
+            random seed for the generated rows
+    return value: dictionary
+        scalar_seconds: float
+            time for the row by row writer
+        batch_seconds: float
+            time for export_table_to_csv
+        rows_per_second: float
+            rate reported by export_table_to_csv
+    """
+
+    rng = np.random.default_rng(seed)
+    field_names = ["OID", "NAME", "X", "Y"]
+    xy = rng.uniform(0, 100000, (n, 2)).tolist()
+    rows = [(i, "feature {0}".format(i), xy[i][0], xy[i][1]) for i in range(n)]
+    with tempfile.TemporaryDirectory() as folder:
+        start = time.perf_counter()
+        with open(os.path.join(folder, "rowwise.csv"), "w", newline="") as csvfile:
+            csvwriter = csv.writer(csvfile)
+            csvwriter.writerow(field_names)
+            for row in rows:
+                csvwriter.writerow(row)
+        scalar_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        result = GISUtils.export_table_to_csv(GISUtils.IterableRowSource(rows, field_names), os.path.join(folder, "batched.csv"))
+        batch_seconds = time.perf_counter() - start
+
+    _report("export_table_to_csv", n, scalar_seconds, batch_seconds)
+    return {"scalar_seconds": scalar_seconds, "batch_seconds": batch_seconds, "rows_per_second": result["rows_per_second"]}
+
+
+def benchmark_format_station(n=1000000, precision=2, seed=0):
+    """
+    purpose:
+        Compare format_station called once per measure with format_stations
+    arguments:
+        n: int
+            number of measures
+        precision: int
+            decimal places passed to format_stations
+        seed: int
+            random seed for the generated measures
+    return value: dictionary
+        scalar_seconds: float
+        batch_seconds: float
+        max_difference: float
+            largest absolute difference between the measures and parse_stations of the batch output
+    """
+
+    rng = np.random.default_rng(seed)
+    measures = np.round(rng.uniform(0, 1000000, n), precision)
+    measure_list = measures.tolist()
+
+    start = time.perf_counter()
+    [GISUtils.format_station(measure) for measure in measure_list]
+    scalar_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    stations = GISUtils.format_stations(measures, precision)
+    batch_seconds = time.perf_counter() - start
+
+    max_difference = float(np.max(np.abs(GISUtils.parse_stations(stations) - measures)))
+    _report("format_station", n, scalar_seconds, batch_seconds, max_difference)
+    return {"scalar_seconds": scalar_seconds, "batch_seconds": batch_seconds, "max_difference": max_difference}
+
+
+def benchmark_geometry_backend(n=100000, seed=0):
+    """
+    purpose:
+        Time the pure python geometry backend used when arcpy is not installed
+        GeometryUtils.Table inserts, cursor reads, and a csv export of the table,
+        then point in polygon tests one at a time vs all at once.
+    arguments:
+        n: int
+            number of rows and points
+        seed: int
+            random seed for the generated rows
+    return value: dictionary
+        insert_rows_per_second: float
+        search_rows_per_second: float
+        export_rows_per_second: float
+        scalar_seconds: float
+            Polygon.contains for every point
+        batch_seconds: float
+            Polygon.contains_many for all of the points
+    """
+
+    rng = np.random.default_rng(seed)
+    xy = rng.uniform(-10.0, 10.0, (n, 2))
+    values = rng.uniform(0.0, 1000.0, n).tolist()
+
+    table = GeometryUtils.Table(["NAME", "VALUE", "SHAPE"])
+    start = time.perf_counter()
+    with table.insert_cursor(["NAME", "VALUE", "SHAPE@"]) as cursor:
+        for i, (x, y) in enumerate(xy.tolist()):
+            cursor.insertRow(("row {0}".format(i), values[i], GeometryUtils.Point(x, y)))
+    insert_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with table.search_cursor(["OID@", "VALUE", "SHAPE@"]) as cursor:
+        for row in cursor:
+            pass
+    search_seconds = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        result = GISUtils.export_table_to_csv(table, os.path.join(temp_dir, "table.csv"), ["OBJECTID", "NAME", "VALUE"])
+
+    polygon = GeometryUtils.Polygon([(-5, -5), (-5, 5), (0, 8), (5, 5), (5, -5)])
+    start = time.perf_counter()
+    scalar = [polygon.contains(point) for point in xy.tolist()]
+    scalar_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    batch = polygon.contains_many(xy)
+    batch_seconds = time.perf_counter() - start
+
+    print("GeometryUtils.Table: n={0} insert={1:.0f} rows/s search={2:.0f} rows/s export_table_to_csv={3:.0f} rows/s".format(
+        n, n / insert_seconds, n / search_seconds, result["rows_per_second"]))
+    _report("Polygon.contains", n, scalar_seconds, batch_seconds, float(np.count_nonzero(np.array(scalar) != batch)))
+    return {"insert_rows_per_second": n / insert_seconds, "search_rows_per_second": n / search_seconds,
+            "export_rows_per_second": result["rows_per_second"], "scalar_seconds": scalar_seconds,
+            "batch_seconds": batch_seconds}
+
+
+def benchmark_ftp_folder_tree(n=200, file_size=20000, latency=0.01, connections=8):
+    """
+    purpose:
+        Compare FTPUtils.get_folder_tree downloading over one connection with several connections
+        Runs against a local pyftpdlib server in this process that waits latency seconds
+        before each download, skipped if pyftpdlib isn't installed.
+    arguments:
+        n: int
+            number of files in the tree
+        file_size: int
+            size in bytes of each file
+        latency: number
+            seconds the server waits before each download
+        connections: int
+            number of connections for the parallel download
+    return value: dictionary
+        scalar_seconds: float
+            one connection
+        batch_seconds: float
+            connections connections
+        None if pyftpdlib isn't installed
+    """
+
+    if not ConfigUtils.module_available("pyftpdlib"):
+        print("ftp_folder_tree: skipped, pyftpdlib is not installed")
+        return None
+    with tempfile.TemporaryDirectory() as temp_dir:
+        server_folder = os.path.join(temp_dir, "server")
+        for i in range(n):
+            folder = os.path.join(server_folder, "tree", "folder{0}".format(i % 10))
+            if not os.path.isdir(folder):
+                os.makedirs(folder)
+            with open(os.path.join(folder, "file{0}.bin".format(i)), "wb") as f:
+                f.write(os.urandom(file_size))
+        server, host = _start_ftp_server(server_folder, "user", "password", latency)
+        try:
+            scalar = FTPUtils.get_folder_tree(host, "user", "password", "tree", os.path.join(temp_dir, "serial"))
+            batch = FTPUtils.get_folder_tree(host, "user", "password", "tree", os.path.join(temp_dir, "parallel"),
+                                             connections=connections)
+            FTPUtils.FTP_POOL.close_all()
+        finally:
+            server.close_all()
+
+    _report("ftp get_folder_tree", n, scalar["seconds"], batch["seconds"])
+    print("ftp get_folder_tree: connections={0} success={1} {2:.1f} MB/s {3:.0f} files/s".format(
+        connections, batch["success"], batch["bytes_per_second"] / 1e6, batch["files_per_second"]))
+    return {"scalar_seconds": scalar["seconds"], "batch_seconds": batch["seconds"]}
+
+
+def benchmark_ftp_listing(n=200, folders=10, command_latency=0.002):
+    """
+    purpose:
+        Compare walking an ftp folder tree by testing every item with cwd
+        with the one listing command per folder walk get_folder_tree uses
+        Runs against a local pyftpdlib server in this process that waits command_latency
+        seconds before answering each command, skipped if pyftpdlib isn't installed.
+    arguments:
+        n: int
+            number of files in the tree
+        folders: int
+            number of folders the files are spread over
+        command_latency: number
+            seconds the server waits before answering each command
+    return value: dictionary
+        scalar_seconds: float
+            nlst and a cwd test of every item
+        batch_seconds: float
+            MLSD
+        list_seconds: float
+            parsed LIST
+        None if pyftpdlib isn't installed
+    """
+
+    if not ConfigUtils.module_available("pyftpdlib"):
+        print("ftp_listing: skipped, pyftpdlib is not installed")
+        return None
+    with tempfile.TemporaryDirectory() as temp_dir:
+        server_folder = os.path.join(temp_dir, "server")
+        for i in range(n):
+            folder = os.path.join(server_folder, "tree", "folder{0}".format(i % folders))
+            if not os.path.isdir(folder):
+                os.makedirs(folder)
+            with open(os.path.join(folder, "file{0}.bin".format(i)), "wb") as f:
+                f.write(b"x")
+        server, host = _start_ftp_server(server_folder, "user", "password", command_latency=command_latency)
+        try:
+            with FTPUtils.FTP_POOL.connection(host, "user", "password") as ftp:
+                # the walk get_folder_tree used to do, nlst each folder then cwd to every item
+                start = time.perf_counter()
+                probed_files = 0
+                stack = ["/tree"]
+                while stack:
+                    folder = stack.pop()
+                    ftp.cwd(folder)
+                    for name in ftp.nlst():
+                        try:
+                            ftp.cwd("{0}/{1}".format(folder, name))
+                            stack.append("{0}/{1}".format(folder, name))
+                        except Exception:
+                            probed_files += 1
+                scalar_seconds = time.perf_counter() - start
+
+                start = time.perf_counter()
+                batch_files = len(FTPUtils._walk_folder_tree(ftp, "/tree")[1])
+                batch_seconds = time.perf_counter() - start
+
+                ftp._mlsd_supported = False
+                start = time.perf_counter()
+                list_files = len(FTPUtils._walk_folder_tree(ftp, "/tree")[1])
+                list_seconds = time.perf_counter() - start
+                del ftp._mlsd_supported
+            FTPUtils.FTP_POOL.close_all()
+        finally:
+            server.close_all()
+
+    _report("ftp folder walk", n, scalar_seconds, batch_seconds)
+    print("ftp folder walk: LIST={0:.3f}s files found cwd={1} MLSD={2} LIST={3}".format(
+        list_seconds, probed_files, batch_files, list_files))
+    return {"scalar_seconds": scalar_seconds, "batch_seconds": batch_seconds, "list_seconds": list_seconds}
+
+
+def benchmark_ftp_pool(n=200, file_size=1024):
+    """
+    purpose:
+        Compare FTPUtils.get_file opening a new connection every call with get_file using FTP_POOL
+        Runs against a local pyftpdlib server in this process, skipped if pyftpdlib isn't installed.
+    arguments:
+        n: int
+            number of downloads
+        file_size: int
+            size in bytes of the downloaded file
+    return value: dictionary
+        scalar_seconds: float
+            new connection per download
+        batch_seconds: float
+            pooled connections
+        connections: int
+            connections the pool opened
+        None if pyftpdlib isn't installed
+    """
+
+    if not ConfigUtils.module_available("pyftpdlib"):
+        print("ftp_pool: skipped, pyftpdlib is not installed")
+        return None
+    with tempfile.TemporaryDirectory() as temp_dir:
+        server_folder = os.path.join(temp_dir, "server")
+        download_folder = os.path.join(temp_dir, "download")
+        os.makedirs(os.path.join(server_folder, "data"))
+        os.makedirs(download_folder)
+        with open(os.path.join(server_folder, "data", "file.bin"), "wb") as f:
+            f.write(os.urandom(file_size))
+        server, host = _start_ftp_server(server_folder, "user", "password")
+        try:
+            start = time.perf_counter()
+            for i in range(n):
+                FTPUtils.get_file(host, "user", "password", "data", "file.bin", download_folder, "yes", use_pool=False)
+            scalar_seconds = time.perf_counter() - start
+
+            pool = FTPUtils.FTP_POOL
+            created = pool.created
+            start = time.perf_counter()
+            for i in range(n):
+                FTPUtils.get_file(host, "user", "password", "data", "file.bin", download_folder, "yes")
+            batch_seconds = time.perf_counter() - start
+            connections = pool.created - created
+            pool.close_all()
+        finally:
+            server.close_all()
+
+    _report("ftp get_file", n, scalar_seconds, batch_seconds)
+    print("ftp get_file: pooled connections opened={0}".format(connections))
+    return {"scalar_seconds": scalar_seconds, "batch_seconds": batch_seconds, "connections": connections}
+
+
+def benchmark_ftp_sync(n=200, file_size=20000, changed=10, connections=4):
+    """
+    purpose:
+        Compare downloading an ftp folder tree again with syncing it after a few files change
+        Runs against a local pyftpdlib server in this process, skipped if pyftpdlib isn't installed.
+    arguments:
+        n: int
+            number of files in the tree
+        file_size: int
+            size in bytes of each file
+        changed: int
+            number of files changed on the server before the second download
+        connections: int
+            number of connections used by get_folder_tree
+    return value: dictionary
+        scalar_seconds: float
+            downloading the whole tree again
+        batch_seconds: float
+            syncing the tree
+        bytes: int
+            bytes the sync downloaded
+        None if pyftpdlib isn't installed
+    """
+
+    if not ConfigUtils.module_available("pyftpdlib"):
+        print("ftp_sync: skipped, pyftpdlib is not installed")
+        return None
+    with tempfile.TemporaryDirectory() as temp_dir:
+        server_folder = os.path.join(temp_dir, "server")
+        last_hour = time.time() - 3600
+        for i in range(n):
+            folder = os.path.join(server_folder, "tree", "folder{0}".format(i % 10))
+            if not os.path.isdir(folder):
+                os.makedirs(folder)
+            file_path = os.path.join(folder, "file{0}.bin".format(i))
+            with open(file_path, "wb") as f:
+                f.write(os.urandom(file_size))
+            os.utime(file_path, (last_hour, last_hour))
+        server, host = _start_ftp_server(server_folder, "user", "password")
+        try:
+            mirror = os.path.join(temp_dir, "mirror")
+            FTPUtils.get_folder_tree(host, "user", "password", "tree", mirror, connections=connections, sync=True)
+            for i in range(changed):
+                with open(os.path.join(server_folder, "tree", "folder{0}".format(i % 10), "file{0}.bin".format(i)), "wb") as f:
+                    f.write(os.urandom(file_size))
+            scalar = FTPUtils.get_folder_tree(host, "user", "password", "tree", os.path.join(temp_dir, "full"),
+                                              connections=connections)
+            batch = FTPUtils.get_folder_tree(host, "user", "password", "tree", mirror, connections=connections, sync=True)
+            FTPUtils.FTP_POOL.close_all()
+        finally:
+            server.close_all()
+
+    _report("ftp sync", n, scalar["seconds"], batch["seconds"])
+    print("ftp sync: full={0} bytes sync={1} bytes skipped={2} files".format(scalar["bytes"], batch["bytes"], batch["skipped"]))
+    return {"scalar_seconds": scalar["seconds"], "batch_seconds": batch["seconds"], "bytes": batch["bytes"]}
+
+
+def benchmark_ftp_upload(n=200, file_size=20000, changed=10, connections=4, command_latency=0.002):
+    """
+    purpose:
+        Compare uploading a folder tree over one connection with uploading it over several,
+        then sync the tree again after a few local files change
+        Runs against a local pyftpdlib server in this process, skipped if pyftpdlib isn't installed.
+    arguments:
+        n: int
+            number of files in the tree
+        file_size: int
+            size in bytes of each file
+        changed: int
+            number of local files changed before the sync
+        connections: int
+            number of connections used by the parallel upload and the sync
+        command_latency: number
+            seconds the server waits before answering each command
+    return value: dictionary
+        scalar_seconds: float
+            upload over one connection
+        batch_seconds: float
+            upload over connections connections
+        sync_seconds: float
+            syncing the tree after the changes
+        bytes: int
+            bytes the sync uploaded
+        None if pyftpdlib isn't installed
+    """
+
+    if not ConfigUtils.module_available("pyftpdlib"):
+        print("ftp_upload: skipped, pyftpdlib is not installed")
+        return None
+    with tempfile.TemporaryDirectory() as temp_dir:
+        local_folder = os.path.join(temp_dir, "tree")
+        for i in range(n):
+            folder = os.path.join(local_folder, "folder{0}".format(i % 10))
+            if not os.path.isdir(folder):
+                os.makedirs(folder)
+            with open(os.path.join(folder, "file{0}.bin".format(i)), "wb") as f:
+                f.write(os.urandom(file_size))
+        server_folder = os.path.join(temp_dir, "server")
+        for folder in ("single", "parallel"):
+            os.makedirs(os.path.join(server_folder, folder))
+        server, host = _start_ftp_server(server_folder, "user", "password", command_latency=command_latency)
+        try:
+            scalar = FTPUtils.put_folder_tree(host, "user", "password", local_folder, "single")
+            batch = FTPUtils.put_folder_tree(host, "user", "password", local_folder, "parallel", connections=connections)
+            next_second = time.time() + 1
+            for i in range(changed):
+                file_path = os.path.join(local_folder, "folder{0}".format(i % 10), "file{0}.bin".format(i))
+                with open(file_path, "wb") as f:
+                    f.write(os.urandom(file_size))
+                # modify times are whole seconds, a change in the second of the upload isn't seen
+                os.utime(file_path, (next_second, next_second))
+            sync = FTPUtils.put_folder_tree(host, "user", "password", local_folder, "parallel", connections=connections,
+                                            sync=True)
+            FTPUtils.FTP_POOL.close_all()
+        finally:
+            server.close_all()
+
+    _report("ftp upload", n, scalar["seconds"], batch["seconds"])
+    print("ftp upload: success={0} {1} folders created, sync={2:.3f}s {3} bytes skipped={4} files".format(
+        scalar["success"] and batch["success"] and sync["success"], batch["folders_created"], sync["seconds"],
+        sync["bytes"], sync["skipped"]))
+    assert scalar["success"] and batch["success"] and sync["success"], "ftp upload failed"
+    assert sync["bytes"] == changed * file_size, "ftp upload sync uploaded {0} bytes, expected {1}".format(
+        sync["bytes"], changed * file_size)
+    return {"scalar_seconds": scalar["seconds"], "batch_seconds": batch["seconds"], "sync_seconds": sync["seconds"],
+            "bytes": sync["bytes"]}
+
+
+def benchmark_geodesic(n=100000, seed=0, tolerance=0.002, bearing_tolerance=1e-5):
+    """
+    purpose:
+        Check calc_geodesic_dist and calc_geodesic_coords against published geodesic
+        reference values, then compare a per-pair haversine in plain python with
+        both batch methods
+        A check outside its tolerance fails with an AssertionError.
+    arguments:
+        n: int
+            number of point pairs
+        seed: int
+            random seed for the generated points
+        tolerance: float
+            allowed distance error in meters against the reference values,
+            for both the inverse (distance) and the forward (end point) problem
+        bearing_tolerance: float
+            allowed initial bearing error in degrees against the reference values
+    return value: dictionary
+        scalar_seconds: float
+            time for the per-pair python haversine
+        batch_seconds: float
+            time for calc_geodesic_dist with vincenty
+        haversine_seconds: float
+            time for calc_geodesic_dist with haversine
+        max_reference_error: float
+            largest distance error in meters against the reference values
+    """
+
+    # (lon1, lat1, lon2, lat2, distance meters, initial bearing degrees)
+    references = [
+        # Flinders Peak to Buninyong, Vincenty (1975) / Geoscience Australia
+        (_dms(144, 25, 29.52440), -_dms(37, 57, 3.72030), _dms(143, 55, 35.38390), -_dms(37, 39, 10.15610),
+         54972.271, _dms(306, 52, 5.37)),
+        # one degree along the equator, pi * a / 180
+        (0.0, 0.0, 1.0, 0.0, math.pi * GISUtils.WGS84_A / 180, 90.0),
+        # one degree of meridian arc north from the equator
+        (0.0, 0.0, 0.0, 1.0, 110574.3886, 0.0)
+    ]
+    max_reference_error = 0.0
+    for lon1, lat1, lon2, lat2, distance, bearing in references:
+        inverse = GISUtils.calc_geodesic_dist((lon1, lat1), (lon2, lat2))
+        forward = GISUtils.calc_geodesic_coords((lon1, lat1), distance, bearing)
+        distance_error = abs(inverse["distance"][0] - distance)
+        bearing_error = abs(inverse["bearings"][0] - bearing)
+        # the forward problem should land back on the end point, in meters
+        forward_error = GISUtils.calc_geodesic_dist(forward["coords"][0], (lon2, lat2))["distance"][0]
+        max_reference_error = max(max_reference_error, distance_error, forward_error)
+        print("geodesic reference: distance_error={0:.2e}m bearing_error={1:.2e}deg forward_error={2:.2e}m".format(
+            distance_error, bearing_error, forward_error))
+        assert distance_error <= tolerance, "vincenty distance off by {0}m".format(distance_error)
+        assert bearing_error <= bearing_tolerance, "vincenty bearing off by {0}deg".format(bearing_error)
+        assert forward_error <= tolerance, "vincenty end point off by {0}m".format(forward_error)
+    # one degree along the equator of the haversine sphere, pi * R / 180
+    haversine_error = abs(GISUtils.calc_geodesic_dist((0.0, 0.0), (1.0, 0.0), "haversine")["distance"][0] -
+                          math.pi * GISUtils.EARTH_RADIUS / 180)
+    print("geodesic reference: haversine_error={0:.2e}m".format(haversine_error))
+    assert haversine_error <= tolerance, "haversine distance off by {0}m".format(haversine_error)
+
+    rng = np.random.default_rng(seed)
+    points1 = np.column_stack((rng.uniform(-180, 180, n), rng.uniform(-80, 80, n)))
+    points2 = np.column_stack((rng.uniform(-180, 180, n), rng.uniform(-80, 80, n)))
+    pairs = list(zip(points1.tolist(), points2.tolist()))
+
+    start = time.perf_counter()
+    scalar = []
+    for (lon1, lat1), (lon2, lat2) in pairs:
+        phi1 = math.radians(lat1)
+        phi2 = math.radians(lat2)
+        h = math.sin((phi2 - phi1) / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2
+        scalar.append(2 * GISUtils.EARTH_RADIUS * math.asin(math.sqrt(h)))
+    scalar_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    haversine = GISUtils.calc_geodesic_dist(points1, points2, "haversine")
+    haversine_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vincenty = GISUtils.calc_geodesic_dist(points1, points2, "vincenty")
+    batch_seconds = time.perf_counter() - start
+
+    haversine_difference = float(np.max(np.abs(np.array(scalar) - haversine["distance"])))
+    _report("calc_geodesic_dist haversine", n, scalar_seconds, haversine_seconds, haversine_difference)
+    _report("calc_geodesic_dist vincenty", n, scalar_seconds, batch_seconds)
+    assert haversine_difference <= tolerance, "batch haversine differs from python by {0}m".format(haversine_difference)
+    # the sphere is within about 0.5% of the ellipsoid, nearly antipodal pairs vincenty doesn't solve are nan
+    relative = np.abs(vincenty["distance"] - haversine["distance"]) / np.maximum(haversine["distance"], 1.0)
+    assert np.nanmax(relative) < 0.01, "vincenty and haversine differ by {0:.2%}".format(float(np.nanmax(relative)))
+    return {"scalar_seconds": scalar_seconds, "batch_seconds": batch_seconds,
+            "haversine_seconds": haversine_seconds, "max_reference_error": max_reference_error}
+
+
+def benchmark_get_prior_date(n=1000000, day_of_week=0, seed=0):
+    """
+    purpose:
+        Compare get_prior_date called once per date with get_prior_dates
+    arguments:
+        n: int
+            number of dates
+        day_of_week: int
+            Monday is 0, Sunday is 6
+        seed: int
+            random seed for the generated dates
+    return value: dictionary
+        scalar_seconds: float
+        batch_seconds: float
+        mismatches: int
+            number of dates where the two methods disagree
+    """
+
+    rng = np.random.default_rng(seed)
+    dates = np.datetime64("2000-01-01") + rng.integers(0, 10000, n).astype("timedelta64[D]")
+    date_list = dates.tolist()
+
+    start = time.perf_counter()
+    scalar = [GISUtils.get_prior_date(date, day_of_week) for date in date_list]
+    scalar_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = GISUtils.get_prior_dates(dates, day_of_week)
+    batch_seconds = time.perf_counter() - start
+
+    mismatches = sum(1 for a, b in zip(scalar, batch.tolist()) if a != b)
+    _report("get_prior_date", n, scalar_seconds, batch_seconds)
+    print("get_prior_date: mismatches={0}".format(mismatches))
+    return {"scalar_seconds": scalar_seconds, "batch_seconds": batch_seconds, "mismatches": mismatches}
+
+
+def benchmark_get_station(n_lines=5000, n_points=100, vertices=10, seed=0):
+    """
+    purpose:
+        Compare get_station scanning every line with get_station using a GeometryUtils.LineIndex
+    arguments:
+        n_lines: int
+            number of random polylines
+        n_points: int
+            number of points to station
+        vertices: int
+            vertices per polyline
+        seed: int
+            random seed for the generated lines and points
+    return value: dictionary
+        scalar_seconds: float
+            time for the linear scan
+        batch_seconds: float
+            time to build the index and station every point with it
+        mismatches: int
+            number of points whose stations differ between the two methods
+        batch_mismatches: int
+            number of points whose get_stations station differs from the linear scan,
+            run in this process and on a pool of 2 processes
+    """
+
+    rng = np.random.default_rng(seed)
+    starts = rng.uniform(0, 100000, (n_lines, 1, 2))
+    steps = rng.normal(0, 100, (n_lines, vertices - 1, 2))
+    lines = [GeometryUtils.Polyline(vertices) for vertices in np.concatenate((starts, starts + np.cumsum(steps, axis=1)), axis=1)]
+    points = [tuple(point) for point in rng.uniform(0, 100000, (n_points, 2))]
+
+    start = time.perf_counter()
+    scan_stations = [GISUtils.get_station(point, lines) for point in points]
+    scalar_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    line_index = GeometryUtils.LineIndex(lines)
+    index_stations = [GISUtils.get_station(point, line_index) for point in points]
+    batch_seconds = time.perf_counter() - start
+
+    mismatches = sum(1 for a, b in zip(scan_stations, index_stations) if a != b)
+    batch_mismatches = 0
+    for processes in (1, 2):
+        result = GISUtils.get_stations(points, lines, processes, chunk_size=max(1, n_points // 4))
+        assert result["success"], result["messages"]
+        batch_mismatches += sum(1 for a, b in zip(scan_stations, result["stations"]) if a != b)
+    _report("get_station", n_points, scalar_seconds, batch_seconds)
+    print("get_station: lines={0} mismatches={1} get_stations mismatches={2}".format(n_lines, mismatches, batch_mismatches))
+    assert batch_mismatches == 0, "get_stations differs from get_station on {0} points".format(batch_mismatches)
+    return {"scalar_seconds": scalar_seconds, "batch_seconds": batch_seconds, "mismatches": mismatches,
+            "batch_mismatches": batch_mismatches}
+
+
+def benchmark_import_time(modules=("ConfigUtils", "GeometryUtils", "GISUtils", "EmailUtils", "FTPUtils",
+                                   "SlackUtils", "SMSUtils", "TypeUtils", "ZipUtils"), repeat=5):
+    """
+    purpose:
+        Time importing each module in a fresh interpreter
+        The time to start an interpreter that imports nothing is subtracted,
+        the best of repeat runs is kept.
+    arguments:
+        modules: list of strings
+            module names, imported from the folder this file is in
+        repeat: int
+            number of runs per module
+    return value: dictionary
+        key: module name
+        value: float seconds
+    """
+
+    def best_time(code):
+        times = []
+        for i in range(repeat):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, "-c", code], cwd=os.path.dirname(os.path.abspath(__file__)),
+                           check=True)
+            times.append(time.perf_counter() - start)
+        return min(times)
+
+    baseline = best_time("pass")
+    results = {}
+    for module in modules:
+        results[module] = max(best_time("import {0}".format(module)) - baseline, 0.0)
+        print("import {0}: {1:.3f}s".format(module, results[module]))
+    return results
+
+
+def benchmark_point_index(n_points=20000, n_queries=500, k=3, seed=0):
+    """
+    purpose:
+        Compare nested calc_dist loops with GeometryUtils.PointIndex
+        for "nearest k hydrants to each asset" queries
+    arguments:
+        n_points: int
+            number of indexed points
+        n_queries: int
+            number of query points
+        k: int
+            number of neighbors
+        seed: int
+            random seed for the generated points
+    return value: dictionary
+        scalar_seconds: float
+        batch_seconds: float
+            time to build the index and run the queries
+        mismatches: int
+            number of queries whose neighbors differ between the two methods
+    """
+
+    rng = np.random.default_rng(seed)
+    points = rng.uniform(0, 10000, (n_points, 2))
+    queries = rng.uniform(0, 10000, (n_queries, 2))
+    point_tuples = [tuple(point) for point in points.tolist()]
+
+    start = time.perf_counter()
+    scalar_neighbors = []
+    for query in queries.tolist():
+        distances = [GISUtils.calc_dist(query, point)["distance2D"] for point in point_tuples]
+        scalar_neighbors.append(sorted(range(n_points), key=lambda i: (distances[i], i))[:k])
+    scalar_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    point_index = GeometryUtils.PointIndex(points)
+    indices = point_index.query_knn(queries, k)[1]
+    batch_seconds = time.perf_counter() - start
+
+    mismatches = sum(1 for a, b in zip(scalar_neighbors, indices.tolist()) if a != b)
+    _report("PointIndex.query_knn", n_queries, scalar_seconds, batch_seconds)
+    print("PointIndex.query_knn: points={0} mismatches={1}".format(n_points, mismatches))
+    return {"scalar_seconds": scalar_seconds, "batch_seconds": batch_seconds, "mismatches": mismatches}
+
+
+def benchmark_token_cache(n=200, token_seconds=3600):
+    """
+    purpose:
+        Compare a new requests.post for every token with GISUtils.TokenCache
+        against a local stand-in generateToken server
+    arguments:
+        n: int
+            number of token requests
+        token_seconds: number
+            lifetime of the tokens the stand-in server issues
+    return value: dictionary
+        scalar_seconds: float
+            time for a new connection and token every call
+        batch_seconds: float
+            time for the cached tokens on the shared session
+        server_requests: int
+            number of requests the stand-in server received from the cache
+    """
+
+    server = _start_token_server(token_seconds)
+    url = "http://127.0.0.1:{0}/arcgis/tokens/generateToken".format(server.server_address[1])
+    params = {"username": "user", "password": "pass", "f": "json"}
+    try:
+        start = time.perf_counter()
+        for i in range(n):
+            requests.post(url, params).json().get("token")
+        scalar_seconds = time.perf_counter() - start
+
+        server.request_count = 0
+        token_cache = GISUtils.TokenCache()
+        start = time.perf_counter()
+        for i in range(n):
+            token_cache.get_token(url, "user", "pass")
+        batch_seconds = time.perf_counter() - start
+        server_requests = server.request_count
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    _report("get_ags_token", n, scalar_seconds, batch_seconds)
+    print("get_ags_token: cached server requests={0}".format(server_requests))
+    return {"scalar_seconds": scalar_seconds, "batch_seconds": batch_seconds, "server_requests": server_requests}
+
+
+def _dms(degrees, minutes, seconds):
+    """
+    purpose:
+        convert degrees, minutes, seconds to decimal degrees
+    arguments:
+        degrees: number
+        minutes: number
+        seconds: number
+    return value: float
+    """
+
+    return degrees + (minutes / 60.0) + (seconds / 3600.0)
+
+
+def _report(name, n, scalar_seconds, batch_seconds, max_difference=None):
+    """
+    purpose:
+        print a one line summary of a scalar vs batch benchmark
+    arguments:
+        name: string
+            name of the benchmarked function
+        n: int
+            number of items processed
+        scalar_seconds: float
+        batch_seconds: float
+        max_difference: float
+            optional largest difference between the two result sets
+    return value: none
+    """
+
+    speedup = scalar_seconds / batch_seconds if batch_seconds > 0 else float("inf")
+    line = "{0}: n={1} scalar={2:.3f}s batch={3:.3f}s speedup={4:.1f}x".format(
+        name, n, scalar_seconds, batch_seconds, speedup)
+    if max_difference is not None:
+        line += " max_diff={0:.3g}".format(max_difference)
+    print(line)
+
+
+def _start_ftp_server(folder, username, password, latency=0, command_latency=0):
+    """
+    purpose:
+        start a pyftpdlib server on a free local port in a background thread
+    arguments:
+        folder: string
+            home folder of the user
+        username: string
+        password: string
+        latency: number
+            seconds each download waits before it starts, to stand in for a remote server
+            if > 0, each connection gets its own server thread so the waits overlap
+        command_latency: number
+            seconds every command waits before it is answered, like a round trip to a remote server
+    return value: tuple
+        (pyftpdlib.servers.FTPServer, host:port string)
+        stop the server with close_all
+    """
+
+    from pyftpdlib.authorizers import DummyAuthorizer
+    from pyftpdlib.handlers import FTPHandler
+    from pyftpdlib.servers import FTPServer, ThreadedFTPServer
+
+    # keep the server's per command logging off the console
+    logger = logging.getLogger("pyftpdlib")
+    if not logger.handlers:
+        logger.addHandler(logging.NullHandler())
+        logger.propagate = False
+    authorizer = DummyAuthorizer()
+    authorizer.add_user(username, password, folder, perm="elradfmwMT")
+    handler_attributes = {"authorizer": authorizer}
+    if latency > 0:
+        def ftp_RETR(self, file):
+            time.sleep(latency)
+            return FTPHandler.ftp_RETR(self, file)
+        handler_attributes["ftp_RETR"] = ftp_RETR
+    if command_latency > 0:
+        def process_command(self, cmd, *args, **kwargs):
+            time.sleep(command_latency)
+            return FTPHandler.process_command(self, cmd, *args, **kwargs)
+        handler_attributes["process_command"] = process_command
+    handler = type("BenchmarkFTPHandler", (FTPHandler,), handler_attributes)
+    server = (ThreadedFTPServer if latency > 0 or command_latency > 0 else FTPServer)(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, kwargs={"timeout": 0.1, "blocking": True})
+    thread.daemon = True
+    thread.start()
+    server_close_all = server.close_all
+
+    def close_all():
+        # close on the server's own thread and wait for it, closing the sockets from here races
+        # the io loop, which can then close reused descriptors of the next server
+        if threading.current_thread() is thread:
+            # serve_forever closes everything when its loop ends
+            server_close_all()
+            return
+        server.ioloop.call_later(0, server_close_all)
+        thread.join(10)
+
+    server.close_all = close_all
+    return server, "127.0.0.1:{0}".format(server.address[1])
+
+
+def _start_token_server(token_seconds):
+    """
+    purpose:
+        start a local http server that answers every POST like an ArcGIS generateToken endpoint
+    arguments:
+        token_seconds: number
+            lifetime of the issued tokens
+    return value: http.server.ThreadingHTTPServer
+        request_count holds the number of requests received
+    """
+
+    class TokenHandler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            self.server.request_count += 1
+            body = json.dumps({
+                "token": "token{0}".format(self.server.request_count),
+                "expires": int((time.time() + token_seconds) * 1000)
+            }).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), TokenHandler)
+    server.request_count = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""
+Name:           ConfigUtils
+
+Purpose:        Shared config.json loading and lazy imports of heavy modules
+                The config file is read once and the same dictionary is shared
+                by every module, reload_config refreshes it in place.
+
+Dependencies:   none
+
+Version:        3.6
+
+Author:         ted.chapin
+
+Created:        10/18/2026
+"""
+
+
+import importlib
+import importlib.util
+import json
+import os
+import threading
+
+
+config_file = os.path.join(os.path.dirname(__file__), "config.json")
+
+# the shared config dictionary, filled by get_config
+_CONFIG = {}
+_CONFIG_LOADED = False
+_CONFIG_LOCK = threading.Lock()
+
+
+def main():
+    pass
+
+    return
+
+
+class LazyModule(object):
+    """
+    purpose:
+        Stand-in for a module that is imported the first time one of its attributes is used
+        Attributes are copied onto the stand-in as they are used, so after the
+        first access they cost the same as a normal module attribute.
+    arguments:
+        module_name: string
+            full name of the module, e.g. arcpy or twilio.rest
+    """
+
+    def __init__(self, module_name):
+        self.__dict__["_module_name"] = module_name
+        self.__dict__["_module"] = None
+
+    def __getattr__(self, name):
+        module = self.__dict__["_module"]
+        if module is None:
+            module = importlib.import_module(self.__dict__["_module_name"])
+            self.__dict__["_module"] = module
+        value = getattr(module, name)
+        self.__dict__[name] = value
+        return value
+
+    def __repr__(self):
+        state = "loaded" if self.__dict__["_module"] is not None else "not loaded"
+        return "<lazy module '{0}' ({1})>".format(self.__dict__["_module_name"], state)
+
+
+def get_config(reload=False):
+    """
+    purpose:
+        get the shared config dictionary, reading config.json the first time
+    arguments:
+        reload: boolean
+            if True, read config.json again
+            the shared dictionary is updated in place, so every module's CONFIG sees the new values
+    return value: dictionary
+        empty if there is no config.json
+    """
+
+    global _CONFIG_LOADED
+    with _CONFIG_LOCK:
+        if reload or not _CONFIG_LOADED:
+            values = {}
+            if os.path.isfile(config_file):
+                with open(config_file, "r") as f:
+                    values = json.load(f)
+            _CONFIG.clear()
+            _CONFIG.update(values)
+            _CONFIG_LOADED = True
+    return _CONFIG
+
+
+def lazy_import(module_name):
+    """
+    purpose:
+        get a module that is only imported when it is first used
+    arguments:
+        module_name: string
+    return value: LazyModule
+    """
+
+    return LazyModule(module_name)
+
+
+def module_available(module_name):
+    """
+    purpose:
+        determine if a module can be imported, without importing it
+    arguments:
+        module_name: string
+    return value: boolean
+    """
+
+    try:
+        return importlib.util.find_spec(module_name) is not None
+    except Exception:
+        return False
+
+
+def reload_config():
+    """
+    purpose:
+        read config.json again into the shared config dictionary
+    arguments: none
+    return value: dictionary
+    """
+
+    return get_config(reload=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -5,7 +5,7 @@ Purpose:        Send an email via Python
                 Adapted from http://naelshiab.com/tutorial-send-email-python/
                 Uses Slack notifications for errors
 
-Dependencies:   SlackUtils
+Dependencies:   ConfigUtils, SlackUtils
 
 Version:        3.6
 
@@ -15,7 +15,7 @@ Created:        9/12/2018
 """
 
 
-import json
+import ConfigUtils
 import os
 import smtplib
 from email.mime.multipart import MIMEMultipart
@@ -25,8 +25,7 @@ from email.mime.application import encoders
 import SlackUtils
 
 
-config_file = os.path.join(os.path.dirname(__file__), "config.json")
-CONFIG = json.loads(open(config_file).read()) if os.path.isfile(config_file) else {}
+CONFIG = ConfigUtils.get_config()
 
 
 def main():
@@ -2,8 +2,10 @@
 Name:           FTPUtils
 
 Purpose:        Utilities for FTP
+                Connections are taken from a pool of logged in connections,
+                so repeated calls to the same host don't reconnect every time.
 
-Dependencies:   none
+Dependencies:   ConfigUtils
 
 Version:        3.6
 
@@ -12,13 +14,32 @@ Author:         ted.chapin
 Created:        9/12/2018
 """
 
-from ftplib import FTP
+import atexit
+import calendar
+import collections
+import ConfigUtils
+import contextlib
+import datetime
+from ftplib import FTP, error_perm, error_reply
+import functools
+import hashlib
 import json
 import os
+import re
+import threading
+import time
 
 
-config_file = os.path.join(os.path.dirname(__file__), "config.json")
-CONFIG = json.loads(open(config_file).read()) if os.path.isfile(config_file) else {}
+CONFIG = ConfigUtils.get_config()
+
+# name of the sync manifest get_folder_tree keeps in the local copy of the ftp folder
+MANIFEST_FILE_NAME = ".ftp_manifest.json"
+
+# LIST output lines, e.g.
+# drwxr-xr-x   2 owner    group        4096 Oct 18 04:49 folder
+# 10-18-26  04:49AM       <DIR>          folder
+_UNIX_LIST_LINE = re.compile(r"^([-dlbcps])\S{9}\S*\s+\d+\s+\S+(?:\s+\S+)?\s+(\d+)\s+([A-Za-z]{3})\s+(\d{1,2})\s+(\d{1,2}:\d{2}|\d{4})\s(.+)$")
+_WINDOWS_LIST_LINE = re.compile(r"^(\d{2}-\d{2}-\d{2}(?:\d{2})?)\s+(\d{1,2}:\d{2}[AaPp][Mm])\s+(<DIR>|\d+)\s+(.+)$")
 
 
 def main():
@@ -27,13 +48,196 @@ def main():
     return
 
 
-def get_file(host, username, password, ftp_folder, file_name, destination_folder, overwrite="no"):
+class FTPPool(object):
+    """
+    purpose:
+        Thread-safe pool of logged in ftp connections
+        Idle connections are kept per host, username, and password (hashed), so a connection
+        is only handed to callers that could log in with it. Before an idle connection
+        is reused it is moved back to its login folder, which also checks that the
+        server hasn't dropped it. Connections idle longer than max_idle_seconds are
+        closed the next time the pool is used, or with close_idle.
+    arguments:
+        max_idle_seconds: number
+            how long an unused connection is kept open
+        max_idle: int
+            maximum number of idle connections kept per host and login
+        timeout: number
+            socket timeout in seconds for new connections, None for no timeout
+            with no timeout, the health check of a half-open idle connection can hang forever
+    """
+
+    def __init__(self, max_idle_seconds=60, max_idle=4, timeout=60):
+        self.max_idle_seconds = max_idle_seconds
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self.created = 0
+        self.reused = 0
+        # (host, username, password hash) -> list of (ftp, login folder, release time)
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close_all()
+
+    def acquire(self, host, username, password):
+        """
+        purpose:
+            get a logged in connection, reusing an idle one if it is still alive
+            give it back with release when done, or use connection instead
+        arguments:
+            host: string
+                ftp site address, optionally host:port
+            username: string
+            password: string
+        return value: tuple
+            (ftplib.FTP, login folder)
+        """
+
+        key = self._key(host, username, password)
+        self.close_idle()
+        while True:
+            with self._lock:
+                idle = self._idle.get(key)
+                if not idle:
+                    break
+                ftp, home, released = idle.pop()
+            try:
+                # back to the login folder, this is also the health check
+                ftp.cwd(home)
+                with self._lock:
+                    self.reused += 1
+                return ftp, home
+            except Exception:
+                _close(ftp)
+        ftp = _connect(host, username, password, self.timeout)
+        try:
+            home = ftp.pwd()
+        except Exception:
+            _close(ftp)
+            raise
+        with self._lock:
+            self.created += 1
+        return ftp, home
+
+    def close_all(self):
+        """
+        purpose:
+            close every idle connection
+        arguments: none
+        return value: none
+        """
+
+        self.close_idle(0)
+
+    def close_idle(self, max_idle_seconds=None):
+        """
+        purpose:
+            close the connections that have been idle too long
+        arguments:
+            max_idle_seconds: number
+                None uses the pool's max_idle_seconds
+        return value: none
+        """
+
+        if max_idle_seconds is None:
+            max_idle_seconds = self.max_idle_seconds
+        cutoff = time.time() - max_idle_seconds
+        stale = []
+        with self._lock:
+            for key in list(self._idle):
+                keep = []
+                for entry in self._idle[key]:
+                    if entry[2] > cutoff:
+                        keep.append(entry)
+                    else:
+                        stale.append(entry[0])
+                if keep:
+                    self._idle[key] = keep
+                else:
+                    del self._idle[key]
+        for ftp in stale:
+            _close(ftp)
+
+    @contextlib.contextmanager
+    def connection(self, host, username, password):
+        """
+        purpose:
+            with block that acquires a connection and releases it at the end
+            If the block fails with anything but a permanent ftp error (e.g. file not found)
+            the connection may be mid transfer, so it is closed instead of kept.
+        arguments:
+            host: string
+                ftp site address, optionally host:port
+            username: string
+            password: string
+        return value: ftplib.FTP
+        """
+
+        ftp, home = self.acquire(host, username, password)
+        try:
+            yield ftp
+        except error_perm:
+            self.release(host, username, password, ftp, home)
+            raise
+        except BaseException:
+            _close(ftp)
+            raise
+        self.release(host, username, password, ftp, home)
+
+    def release(self, host, username, password, ftp, home):
+        """
+        purpose:
+            give a connection from acquire back to the pool
+        arguments:
+            host: string
+            username: string
+            password: string
+            ftp: ftplib.FTP
+            home: string
+                login folder returned by acquire
+        return value: none
+        """
+
+        key = self._key(host, username, password)
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle:
+                idle.append((ftp, home, time.time()))
+                ftp = None
+        if ftp is not None:
+            _close(ftp)
+
+    def _key(self, host, username, password):
+        """
+        purpose:
+            get the idle connection key of a login
+            the password is hashed so it isn't kept in the pool
+        arguments:
+            host: string
+            username: string
+            password: string
+        return value: tuple
+        """
+
+        return host, username, hashlib.sha256(password.encode("utf-8")).hexdigest()
+
+
+# shared connection pool used by the FTPUtils functions
+FTP_POOL = FTPPool()
+atexit.register(FTP_POOL.close_all)
+
+
+def get_file(host, username, password, ftp_folder, file_name, destination_folder, overwrite="no", use_pool=True):
     """
     purpose:
         Download a file from an ftp site and copy it to a destination folder.
     arguments:
         host: string
-            ftp site address
+            ftp site address, optionally host:port
         username: string
         password: string
         ftp_folder: string
@@ -43,20 +247,29 @@ def get_file(host, username, password, ftp_folder, file_name, destination_folder
         destination_folder: string
             the path to a folder to receive the downloaded file
         overwrite: string
-            yes or no
+            yes, no, or sync
             indicates whether to overwrite the destination file if it already exists
             if no, a number suffix will be added to the file's root name until
             a new filename is obtained
+            if sync, the download is skipped when the destination file has the remote
+            file's size and modify time (MDTM), and an interrupted download is resumed
+        use_pool: boolean
+            if True, take the connection from FTP_POOL and give it back when done
+            if False, open a new connection and close it when done
     return value: dictionary
         success: boolean
+        skipped: boolean
+            True if sync found the file unchanged
+        bytes: int
+            number of bytes downloaded
         messages: list of string
     """
 
-    ret_dict = {"messages": []}
+    ret_dict = {"messages": [], "skipped": False, "bytes": 0}
     try:
         # get the output file
         # if no overwrite, append an incrementing suffix until you get a new file name
-        if overwrite == "yes":
+        if overwrite in ("yes", "sync"):
             destination_file_path = os.path.join(destination_folder, file_name)
         else:
             if os.path.exists(os.path.join(destination_folder, file_name)):
@@ -71,10 +284,14 @@ def get_file(host, username, password, ftp_folder, file_name, destination_folder
                 destination_file_path = os.path.join(
                     destination_folder, file_name)
         # download the ftp file to the destination file
-        ftp = FTP(host, username, password)
-        ftp.cwd(ftp_folder)
-        with open(destination_file_path, "wb") as f:
-            ftp.retrbinary("RETR {0}".format(file_name), f.write)
+        with _connection(host, username, password, use_pool) as ftp:
+            ftp.cwd(ftp_folder)
+            if overwrite == "sync":
+                result = _sync_file(ftp, file_name, destination_file_path)
+                ret_dict["skipped"] = result["skipped"]
+                ret_dict["bytes"] = result["bytes"]
+            else:
+                ret_dict["bytes"] = _download_file(ftp, file_name, destination_file_path)
         ret_dict["success"] = True
     except Exception as e:
         ret_dict["messages"].append(str(e))
@@ -83,13 +300,23 @@ def get_file(host, username, password, ftp_folder, file_name, destination_folder
         return ret_dict
 
 
-def get_folder_tree(host, username, password, ftp_folder, destination_folder):
+def get_folder_tree(host, username, password, ftp_folder, destination_folder, use_pool=True, connections=1,
+                    retries=2, sync=False):
     """
     purpose:
         Download a folder tree (all files and folders and all files and folders they contain).
+        The tree is listed first over one connection, then the files are downloaded
+        by a number of threads, each with its own connection.
+        A file that fails is put back at the end of the queue and tried again,
+        the rest of the tree carries on.
+        Each file is downloaded to a .part file that is renamed when it is complete.
+        In sync mode, files that haven't changed since the last sync are skipped,
+        and .part files left by an interrupted sync are resumed from where they stopped.
+        The remote size and modify time of every synced file are kept in a manifest file,
+        MANIFEST_FILE_NAME, in the local copy of ftp_folder.
     arguments:
         host: string
-            ftp site address
+            ftp site address, optionally host:port
         username: string
         password: string
         ftp_folder: string
@@ -97,21 +324,89 @@ def get_folder_tree(host, username, password, ftp_folder, destination_folder):
         destination_folder: string
             The folder on the file system into which
             you want to copy the entire tree starting at ftp_folder
+        use_pool: boolean
+            if True, take the connections from FTP_POOL and give them back when done
+            if False, open new connections and close them when done
+        connections: int
+            number of files downloaded at the same time
+        retries: int
+            number of times a failed file is tried again
+            permanent errors (e.g. permission denied) are not retried
+        sync: boolean
+            if True, only download new and changed files
+            a file is unchanged if its size and modify time match the manifest,
+            or if there is no manifest entry, the local file's size and modify time
+            if the server doesn't give modify times, only the sizes are compared
     return value: dictionary
         success: boolean
+            True only if every file was downloaded or skipped
+        files: list of dictionary, one per file
+            remote_path: string
+            local_path: string
+            success: boolean
+            skipped: boolean
+                True if sync found the file unchanged
+            resumed_from: int
+                offset a resumed download started at, 0 if it started from the beginning
+            bytes: int
+            seconds: float
+            bytes_per_second: float
+            attempts: int
+            message: string
+                error of the last attempt, None if successful
+        bytes: int
+            total bytes downloaded
+        skipped: int
+            number of files sync found unchanged
+        seconds: float
+            time taken by the whole download, including listing the tree
+        bytes_per_second: float
+        files_per_second: float
         messages: list of string
     """
 
-    ret_dict = {"messages": []}
+    ret_dict = {"messages": [], "files": [], "bytes": 0, "skipped": 0, "seconds": 0.0, "bytes_per_second": 0.0,
+                "files_per_second": 0.0}
     try:
-        # make an ftp connection
-        ftp = FTP(host, username, password)
-        # get the folder tree
-        _get_files_recursive(ftp, ftp_folder, destination_folder, destination_folder)
-        # close the ftp connection
-        ftp.quit()
-
-        ret_dict["success"] = True
+        start_time = time.time()
+        # phase 1, list the tree and create the local folders
+        with _connection(host, username, password, use_pool) as ftp:
+            folders, files = _walk_folder_tree(ftp, ftp_folder)
+            if not getattr(ftp, "_mlsd_supported", True):
+                # LIST times are local to the server and rounded, sync asks each file's MDTM instead
+                files = [(remote_path, relative_path, size, None) for remote_path, relative_path, size, modify in files]
+        local_root = os.path.join(destination_folder, *[part for part in ftp_folder.split("/") if part])
+        for relative_path in folders:
+            local_folder = os.path.join(local_root, *relative_path.split("/")) if relative_path else local_root
+            if not os.path.isdir(local_folder):
+                os.makedirs(local_folder)
+        manifest_file = os.path.join(local_root, MANIFEST_FILE_NAME)
+        manifest = {}
+        if sync and os.path.isfile(manifest_file):
+            with open(manifest_file, "r") as f:
+                manifest = json.load(f)
+        # phase 2, download the files
+        tasks = collections.deque()
+        for remote_path, relative_path, size, modify in files:
+            tasks.append({"remote_path": remote_path, "local_path": os.path.join(local_root, *relative_path.split("/")),
+                          "relative_path": relative_path, "remote_size": size, "remote_modify": modify,
+                          "success": False, "skipped": False, "resumed_from": 0, "bytes": 0, "seconds": 0.0,
+                          "bytes_per_second": 0.0, "attempts": 0, "message": None})
+        ret_dict["files"] = list(tasks)
+        _run_transfers(host, username, password, use_pool, tasks, connections, retries,
+                       functools.partial(_download_task, manifest=manifest if sync else None))
+        if sync:
+            # only the files that are in sync now, so removed and failed files are checked again next time
+            manifest = {}
+            for task in ret_dict["files"]:
+                if task["success"] and task["remote_size"] is not None:
+                    # servers without MLSD or MDTM only give a size
+                    modify = task["remote_modify"].strftime("%Y%m%d%H%M%S") if task["remote_modify"] is not None else None
+                    manifest[task["relative_path"]] = {"size": task["remote_size"], "modify": modify}
+            _write_manifest(manifest_file, manifest)
+        for task in ret_dict["files"]:
+            del task["relative_path"], task["remote_size"], task["remote_modify"]
+        _summarize_transfers(ret_dict, start_time)
     except Exception as e:
         ret_dict["messages"].append(str(e))
         ret_dict["success"] = False
@@ -119,31 +414,47 @@ def get_folder_tree(host, username, password, ftp_folder, destination_folder):
         return ret_dict
 
 
-def list_items(host, username, password, folder):
+def list_items(host, username, password, folder, use_pool=True, details=False):
     """
     purpose:
         Get a list of items (files & folders) in the ftp host's folder.
     arguments:
         host: string
-            ftp site address
+            ftp site address, optionally host:port
         username: string
         password: string
         folder: string
             folder on the ftp host
+        use_pool: boolean
+            if True, take the connection from FTP_POOL and give it back when done
+            if False, open a new connection and close it when done
+        details: boolean
+            if True, return the type, size, and modify time of each item
+            from one MLSD command, or parsed LIST output if the server doesn't support MLSD
     return value: dictionary
         success: boolean
-        items: list of string
+        items: list of string, or list of dictionary if details is True
             list of files/folders in the FTP folder
+            name: string
+            type: string
+                file or dir
+            size: int
+                None if the server didn't send it
+            modify: datetime.datetime
+                UTC from MLSD, server time from LIST, None if the server didn't send it
         messages: list of string
     """
 
     ret_dict = {"messages": [], "items": []}
     try:
-        ftp = FTP(host, username, password)
-        ftp.cwd(folder)
-        # get all the items in this folder, nlst doesn't distinguish between
-        # folders and files
-        ret_dict["items"] = ftp.nlst()
+        with _connection(host, username, password, use_pool) as ftp:
+            ftp.cwd(folder)
+            if details:
+                ret_dict["items"] = _list_folder(ftp, ftp.pwd())
+            else:
+                # get all the items in this folder, nlst doesn't distinguish between
+                # folders and files
+                ret_dict["items"] = ftp.nlst()
         ret_dict["success"] = True
     except Exception as e:
         ret_dict["messages"].append(str(e))
@@ -152,20 +463,23 @@ def list_items(host, username, password, folder):
         return ret_dict
 
 
-def put_file(host, username, password, local_file, ftp_folder):
+def put_file(host, username, password, local_file, ftp_folder, use_pool=True):
     """
     purpose:
         Upload a file to an ftp server.
         If the file already exists it will be overwritten.
     arguments:
         host: string
-            ftp site address
+            ftp site address, optionally host:port
         username: string
         password: string
         local_file: string
             path to a file on the local file system
         ftp_folder: string
             folder on the remote ftp server into which to upload the file
+        use_pool: boolean
+            if True, take the connection from FTP_POOL and give it back when done
+            if False, open a new connection and close it when done
     return value: dictionary
         success: boolean
         messages: list of string
@@ -173,9 +487,10 @@ def put_file(host, username, password, local_file, ftp_folder):
 
     ret_dict = {"messages": []}
     try:
-        ftp = FTP(host, username, password)
-        ftp.cwd(ftp_folder)
-        ftp.storbinary("STOR {0}".format(os.path.basename(local_file)), open(local_file, "rb"))
+        with _connection(host, username, password, use_pool) as ftp:
+            ftp.cwd(ftp_folder)
+            with open(local_file, "rb") as f:
+                ftp.storbinary("STOR {0}".format(os.path.basename(local_file)), f)
         ret_dict["success"] = True
     except Exception as e:
         ret_dict["messages"].append(str(e))
@@ -184,37 +499,569 @@ def put_file(host, username, password, local_file, ftp_folder):
         return ret_dict
 
 
-def _get_files_recursive(ftp, item, destination_root, destination_folder):
+def put_folder_tree(host, username, password, local_folder, ftp_folder, use_pool=True, connections=1, retries=2,
+                    sync=False):
+    """
+    purpose:
+        Upload a folder tree (all files and folders and all files and folders they contain).
+        local_folder is copied into ftp_folder, so its files end up in ftp_folder/<local_folder name>.
+        The remote tree is listed and the missing remote folders are created first over one connection,
+        then the files are uploaded by a number of threads, each with its own connection.
+        A file that fails is put back at the end of the queue and tried again,
+        the rest of the tree carries on.
+        Each file is uploaded to a .part file that is renamed when it is complete,
+        and the remote modify time is set to the local one if the server supports MFMT.
+        In sync mode, files that haven't changed since they were uploaded are skipped,
+        and .part files left by an interrupted sync are resumed from where they stopped.
+        .part files and get_folder_tree's MANIFEST_FILE_NAME in local_folder are not uploaded.
+    arguments:
+        host: string
+            ftp site address, optionally host:port
+        username: string
+        password: string
+        local_folder: string
+            folder on the file system to upload
+        ftp_folder: string
+            existing folder on the ftp host into which to upload the tree
+        use_pool: boolean
+            if True, take the connections from FTP_POOL and give them back when done
+            if False, open new connections and close them when done
+        connections: int
+            number of files uploaded at the same time
+        retries: int
+            number of times a failed file is tried again
+            permanent errors (e.g. permission denied) are not retried
+        sync: boolean
+            if True, only upload new and changed files
+            a file is unchanged if the remote file has the same size and the local file's modify time,
+            or a newer one if the server doesn't support MFMT
+    return value: dictionary
+        success: boolean
+            True only if every file was uploaded or skipped
+        files: list of dictionary, one per file
+            local_path: string
+            remote_path: string
+            success: boolean
+            skipped: boolean
+                True if sync found the file unchanged
+            resumed_from: int
+                offset a resumed upload started at, 0 if it started from the beginning
+            bytes: int
+            seconds: float
+            bytes_per_second: float
+            attempts: int
+            message: string
+                error of the last attempt, None if successful
+        folders_created: int
+            number of remote folders created
+        bytes: int
+            total bytes uploaded
+        skipped: int
+            number of files sync found unchanged
+        seconds: float
+            time taken by the whole upload, including listing the remote tree
+        bytes_per_second: float
+        files_per_second: float
+        messages: list of string
+    """
+
+    ret_dict = {"messages": [], "files": [], "folders_created": 0, "bytes": 0, "skipped": 0, "seconds": 0.0,
+                "bytes_per_second": 0.0, "files_per_second": 0.0}
+    try:
+        start_time = time.time()
+        local_folder = os.path.abspath(local_folder)
+        folders = []
+        files = []
+        for folder, folder_names, file_names in os.walk(local_folder):
+            folder_names.sort()
+            relative_folder = os.path.relpath(folder, local_folder).replace(os.sep, "/")
+            relative_folder = "" if relative_folder == "." else relative_folder
+            folders.append(relative_folder)
+            for file_name in sorted(file_names):
+                if file_name.endswith(".part") or file_name == MANIFEST_FILE_NAME:
+                    continue
+                relative_path = "{0}/{1}".format(relative_folder, file_name) if relative_folder else file_name
+                files.append((os.path.join(folder, file_name), relative_path))
+        # phase 1, list the remote tree and create the missing remote folders, parents first
+        remote_files = {}
+        with _connection(host, username, password, use_pool) as ftp:
+            ftp.cwd(ftp_folder)
+            remote_root = "{0}/{1}".format(ftp.pwd().rstrip("/"), os.path.basename(local_folder))
+            remote_folders = set()
+            # uploads copy the local modify time only if the server supports MFMT
+            exact_modify = sync and "MFMT" in _server_features(ftp)
+            if _try_cwd(ftp, remote_root):
+                listed_folders, listed_files = _walk_folder_tree(ftp, remote_root)
+                remote_folders.update(listed_folders)
+                for remote_path, relative_path, size, modify in listed_files:
+                    if not getattr(ftp, "_mlsd_supported", True):
+                        # LIST times are local to the server and rounded, sync asks each file's MDTM instead
+                        modify = None
+                    remote_files[relative_path] = (size, modify)
+            for relative_folder in folders:
+                if relative_folder not in remote_folders:
+                    ftp.mkd("{0}/{1}".format(remote_root, relative_folder) if relative_folder else remote_root)
+                    ret_dict["folders_created"] += 1
+        # phase 2, upload the files
+        tasks = collections.deque()
+        for local_path, relative_path in files:
+            remote_size, remote_modify = remote_files.get(relative_path, (None, None))
+            part_size, part_modify = remote_files.get(relative_path + ".part", (None, None))
+            tasks.append({"local_path": local_path, "remote_path": "{0}/{1}".format(remote_root, relative_path),
+                          "remote_exists": relative_path in remote_files, "remote_size": remote_size,
+                          "remote_modify": remote_modify, "part_size": part_size, "part_modify": part_modify,
+                          "success": False, "skipped": False, "resumed_from": 0, "bytes": 0, "seconds": 0.0,
+                          "bytes_per_second": 0.0, "attempts": 0, "message": None})
+        ret_dict["files"] = list(tasks)
+        _run_transfers(host, username, password, use_pool, tasks, connections, retries,
+                       functools.partial(_upload_task, sync=sync, exact_modify=exact_modify))
+        for task in ret_dict["files"]:
+            del task["remote_exists"], task["remote_size"], task["remote_modify"], task["part_size"], task["part_modify"]
+        _summarize_transfers(ret_dict, start_time)
+    except Exception as e:
+        ret_dict["messages"].append(str(e))
+        ret_dict["success"] = False
+    finally:
+        return ret_dict
+
+
+def _close(ftp):
     """
     purpose:
-        This is a recursive function that will download all folders, files, and their children.
-        The first time this function gets called, the item represents the top-level folder on the ftp server.
-        It will walk the FTP folder tree from there down and recreate the tree in destination_root.
+        close an ftp connection, politely if the server is still there
     arguments:
         ftp: ftplib.FTP
-            authenticated ftp connection
-        item: string
-            a folder or file in the ftp pwd
-        destination_root: string
-            the folder on the local file system to receive the remote directory tree
-            everything from and including the original item down will get created here
-        destination_folder: string
-            the sub-folder on the local file system representing this iteration of the item
     return value: none
     """
 
-    if _try_cwd(ftp, item):
-        destination_folder = os.path.join(destination_root, os.path.join(*item.split("/")))
-        if not os.path.isdir(destination_folder):
-            os.makedirs(destination_folder)
-        for sub_item in ftp.nlst():
-            if sub_item not in (".", ".."):
-                sub_folder = "{0}/{1}".format(item, sub_item)
-                _get_files_recursive(ftp, sub_folder, destination_root, destination_folder)
+    try:
+        ftp.quit()
+    except Exception:
+        ftp.close()
+
+
+def _connect(host, username, password, timeout=None):
+    """
+    purpose:
+        open and log in an ftp connection
+    arguments:
+        host: string
+            ftp site address, optionally host:port
+        username: string
+        password: string
+        timeout: number
+            socket timeout in seconds, None for no timeout
+    return value: ftplib.FTP
+    """
+
+    port = 0
+    if host.count(":") == 1:
+        host, port = host.split(":")
+        port = int(port)
+    ftp = FTP(timeout=timeout) if timeout is not None else FTP()
+    ftp.connect(host, port)
+    try:
+        ftp.login(username, password)
+    except Exception:
+        ftp.close()
+        raise
+    return ftp
+
+
+@contextlib.contextmanager
+def _connection(host, username, password, use_pool=True):
+    """
+    purpose:
+        with block that gets a connection from FTP_POOL or a new one that is closed at the end
+    arguments:
+        host: string
+            ftp site address, optionally host:port
+        username: string
+        password: string
+        use_pool: boolean
+    return value: ftplib.FTP
+    """
+
+    if use_pool:
+        with FTP_POOL.connection(host, username, password) as ftp:
+            yield ftp
     else:
-        destination_file = os.path.join(destination_root, os.path.join(*item.split("/")))
-        with open(destination_file, "wb") as f:
-            ftp.retrbinary("RETR {0}".format(item), f.write)
+        ftp = _connect(host, username, password)
+        try:
+            yield ftp
+        finally:
+            _close(ftp)
+
+
+def _download_file(ftp, remote_path, local_path, offset=0, keep_part=False, expected_size=None):
+    """
+    purpose:
+        Download one file to a .part file and rename it when it is complete
+    arguments:
+        ftp: ftplib.FTP
+            authenticated ftp connection
+        remote_path: string
+        local_path: string
+        offset: int
+            if > 0, append to the existing .part file starting at this byte (REST)
+        keep_part: boolean
+            if True, leave the .part file behind on failure so it can be resumed
+        expected_size: int
+            if not None, fail unless the finished file has this many bytes
+    return value: int
+        number of bytes downloaded
+    """
+
+    part_path = local_path + ".part"
+    size = [0]
+
+    def write(data):
+        f.write(data)
+        size[0] += len(data)
+
+    try:
+        with open(part_path, "ab" if offset > 0 else "wb") as f:
+            if offset > 0:
+                f.truncate(offset)
+            ftp.retrbinary("RETR {0}".format(remote_path), write, rest=offset if offset > 0 else None)
+        if expected_size is not None and offset + size[0] != expected_size:
+            raise IOError("{0} is {1} bytes, expected {2}".format(remote_path, offset + size[0], expected_size))
+        os.replace(part_path, local_path)
+    except Exception:
+        if os.path.isfile(part_path) and not (keep_part and size[0] + offset < (expected_size or 0)):
+            os.remove(part_path)
+        raise
+    return size[0]
+
+
+def _download_task(ftp, task, manifest=None):
+    """
+    purpose:
+        Download one file of get_folder_tree, see _transfer_worker
+    arguments:
+        ftp: ftplib.FTP
+            authenticated ftp connection
+        task: dictionary
+            see get_folder_tree
+        manifest: dictionary
+            sync manifest loaded by get_folder_tree, None to download every file
+    return value: none
+    """
+
+    if manifest is None:
+        task["bytes"] = _download_file(ftp, task["remote_path"], task["local_path"])
+        return
+    result = _sync_file(ftp, task["remote_path"], task["local_path"], task["remote_size"],
+                        task["remote_modify"], manifest.get(task["relative_path"]))
+    task["remote_size"] = result["size"]
+    task["remote_modify"] = result["modify"]
+    task["skipped"] = result["skipped"]
+    task["resumed_from"] = result["offset"]
+    task["bytes"] = result["bytes"]
+
+
+def _list_folder(ftp, remote_folder):
+    """
+    purpose:
+        List a folder with MLSD, or LIST if the server doesn't support MLSD.
+        Items whose type can't be told from the listing (links, unparsed LIST lines)
+        are tested with cwd, if you can cwd it's a folder, if not, it's a file.
+    arguments:
+        ftp: ftplib.FTP
+            authenticated ftp connection
+        remote_folder: string
+            absolute path of the folder on the ftp host
+    return value: list of dictionary
+        see list_items
+    """
+
+    items = None
+    if getattr(ftp, "_mlsd_supported", True):
+        try:
+            items = []
+            for name, facts in ftp.mlsd(remote_folder, ["type", "size", "modify"]):
+                item_type = facts.get("type", "").lower()
+                if item_type in ("cdir", "pdir") or name in (".", ".."):
+                    continue
+                size = facts.get("size")
+                modify = facts.get("modify")
+                items.append({
+                    "name": name,
+                    "type": "dir" if item_type == "dir" else "file" if item_type == "file" else None,
+                    "size": int(size) if size is not None and size.isdigit() else None,
+                    "modify": datetime.datetime.strptime(modify[:14], "%Y%m%d%H%M%S") if modify else None
+                })
+        except error_perm as e:
+            # 500 and 502 mean the command isn't supported, remember that for this connection
+            if not str(e).startswith(("500", "502")):
+                raise
+            ftp._mlsd_supported = False
+            items = None
+    if items is None:
+        lines = []
+        ftp.retrlines("LIST {0}".format(remote_folder), lines.append)
+        items = [item for item in (_parse_list_line(line) for line in lines)
+                 if item is not None and item["name"] not in (".", "..")]
+    for item in items:
+        if item["type"] is None:
+            item["type"] = "dir" if _try_cwd(ftp, "{0}/{1}".format(remote_folder.rstrip("/"), item["name"])) else "file"
+    return items
+
+
+def _parse_list_line(line):
+    """
+    purpose:
+        Parse one line of LIST output in the unix (ls -l) or windows (dir) format
+    arguments:
+        line: string
+    return value: dictionary
+        see list_items, type is None for links and lines that can't be parsed
+        None for blank and total lines
+    """
+
+    if not line.strip() or line.startswith("total "):
+        return None
+    match = _UNIX_LIST_LINE.match(line)
+    if match is not None:
+        kind, size, month, day, year_or_time, name = match.groups()
+        item_type = {"d": "dir", "-": "file"}.get(kind)
+        if kind == "l":
+            name = name.split(" -> ")[0]
+        try:
+            if ":" in year_or_time:
+                now = datetime.datetime.now()
+                modify = datetime.datetime.strptime("{0} {1} {2} {3}".format(now.year, month, day, year_or_time), "%Y %b %d %H:%M")
+                # listings show the time instead of the year for the last 6 months
+                if modify > now + datetime.timedelta(days=1):
+                    modify = modify.replace(year=now.year - 1)
+            else:
+                modify = datetime.datetime.strptime("{0} {1} {2}".format(year_or_time, month, day), "%Y %b %d")
+        except ValueError:
+            modify = None
+        return {"name": name, "type": item_type, "size": int(size), "modify": modify}
+    match = _WINDOWS_LIST_LINE.match(line)
+    if match is not None:
+        date, time_of_day, size, name = match.groups()
+        try:
+            modify = datetime.datetime.strptime("{0} {1}".format(date, time_of_day),
+                                                "%m-%d-%Y %I:%M%p" if len(date) == 10 else "%m-%d-%y %I:%M%p")
+        except ValueError:
+            modify = None
+        if size.upper() == "<DIR>":
+            return {"name": name, "type": "dir", "size": None, "modify": modify}
+        return {"name": name, "type": "file", "size": int(size), "modify": modify}
+    # unknown format, the name is probably the last column
+    return {"name": line.split()[-1], "type": None, "size": None, "modify": None}
+
+
+def _remote_modify(ftp, remote_path):
+    """
+    purpose:
+        Get the modify time of a remote file with MDTM
+    arguments:
+        ftp: ftplib.FTP
+            authenticated ftp connection
+        remote_path: string
+    return value: datetime.datetime
+        UTC, None if the server doesn't support MDTM
+    """
+
+    try:
+        response = ftp.sendcmd("MDTM {0}".format(remote_path))
+    except error_perm:
+        return None
+    return datetime.datetime.strptime(response.split()[-1][:14], "%Y%m%d%H%M%S")
+
+
+def _run_transfers(host, username, password, use_pool, tasks, connections, retries, transfer):
+    """
+    purpose:
+        Transfer the queued files on a number of threads, each with its own connection
+    arguments:
+        host: string
+        username: string
+        password: string
+        use_pool: boolean
+        tasks: collections.deque of dictionary
+            see _transfer_worker
+        connections: int
+            number of threads
+        retries: int
+        transfer: function
+            see _transfer_worker
+    return value: none
+    """
+
+    lock = threading.Lock()
+    workers = [threading.Thread(target=_transfer_worker,
+                                args=(host, username, password, use_pool, tasks, lock, retries, transfer))
+               for i in range(max(1, min(connections, len(tasks))))]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    # files left in the queue if every worker gave up connecting
+    for task in tasks:
+        if task["message"] is None:
+            task["message"] = "not transferred, no connection to the server"
+
+
+def _server_features(ftp):
+    """
+    purpose:
+        Get the extensions a server supports from FEAT
+    arguments:
+        ftp: ftplib.FTP
+            authenticated ftp connection
+    return value: set of string
+        upper case command names, e.g. MLST, MFMT
+        empty if the server doesn't support FEAT
+    """
+
+    try:
+        response = ftp.sendcmd("FEAT")
+    except (error_perm, error_reply):
+        return set()
+    # the features are the indented lines between the first and last lines
+    return set(line.split()[0].upper() for line in response.splitlines()[1:-1] if line.strip())
+
+
+def _summarize_transfers(ret_dict, start_time):
+    """
+    purpose:
+        Fill in the totals and messages of a get_folder_tree or put_folder_tree result
+    arguments:
+        ret_dict: dictionary
+            with files, see get_folder_tree
+        start_time: float
+            time.time() the transfer started
+    return value: none
+    """
+
+    ret_dict["seconds"] = time.time() - start_time
+    ret_dict["skipped"] = sum(1 for task in ret_dict["files"] if task["skipped"])
+    ret_dict["bytes"] = sum(task["bytes"] for task in ret_dict["files"] if task["success"])
+    ret_dict["bytes_per_second"] = ret_dict["bytes"] / max(ret_dict["seconds"], 1e-9)
+    ret_dict["files_per_second"] = len(ret_dict["files"]) / max(ret_dict["seconds"], 1e-9)
+    for task in ret_dict["files"]:
+        if not task["success"]:
+            ret_dict["messages"].append("{0}: {1}".format(task["remote_path"], task["message"]))
+    ret_dict["success"] = len(ret_dict["messages"]) == 0
+
+
+def _sync_file(ftp, remote_path, local_path, size=None, modify=None, entry=None):
+    """
+    purpose:
+        Download a file unless the local copy already matches it
+        The local file matches if it has the remote size and either the manifest entry
+        has the remote size and modify time, or the local modify time is the remote one.
+        If the server doesn't give a modify time, the manifest entry only needs the remote size.
+        A .part file newer than the remote file is resumed with REST.
+        The finished file's modify time is set to the remote modify time.
+    arguments:
+        ftp: ftplib.FTP
+            authenticated ftp connection
+        remote_path: string
+        local_path: string
+        size: int
+            remote size from the listing, None to ask the server with SIZE
+        modify: datetime.datetime
+            remote UTC modify time from the listing, None to ask the server with MDTM
+        entry: dictionary
+            manifest entry of the file from the last sync, see get_folder_tree
+            {"size": int, "modify": "YYYYMMDDHHMMSS" or None}
+    return value: dictionary
+        skipped: boolean
+        bytes: int
+            number of bytes downloaded
+        offset: int
+            offset the download was resumed from
+        size: int
+        modify: datetime.datetime
+    """
+
+    if size is None:
+        # SIZE is only reliable in binary mode
+        ftp.voidcmd("TYPE I")
+        size = ftp.size(remote_path)
+    if modify is None:
+        modify = _remote_modify(ftp, remote_path)
+    result = {"skipped": False, "bytes": 0, "offset": 0, "size": size, "modify": modify}
+    modify_seconds = calendar.timegm(modify.timetuple()) if modify is not None else None
+    if size is not None and os.path.isfile(local_path) and os.path.getsize(local_path) == size:
+        if modify_seconds is None:
+            unchanged = entry is not None and entry.get("size") == size
+        elif entry is not None:
+            unchanged = entry.get("size") == size and entry.get("modify") == modify.strftime("%Y%m%d%H%M%S")
+        else:
+            unchanged = int(os.path.getmtime(local_path)) == modify_seconds
+        if unchanged:
+            result["skipped"] = True
+            return result
+    part_path = local_path + ".part"
+    if modify_seconds is not None and size is not None and os.path.isfile(part_path):
+        # only resume a part that was written after the remote file last changed
+        if 0 < os.path.getsize(part_path) < size and os.path.getmtime(part_path) >= modify_seconds:
+            result["offset"] = os.path.getsize(part_path)
+    result["bytes"] = _download_file(ftp, remote_path, local_path, result["offset"], keep_part=modify_seconds is not None,
+                                     expected_size=size)
+    if modify_seconds is not None:
+        os.utime(local_path, (modify_seconds, modify_seconds))
+    return result
+
+
+def _transfer_worker(host, username, password, use_pool, tasks, lock, retries, transfer):
+    """
+    purpose:
+        Thread target for get_folder_tree and put_folder_tree
+        Transfers files from the shared queue over one connection until the queue is empty.
+        If a transfer fails the connection is dropped and the file goes back on the queue,
+        unless it has used up its retries or the error is permanent.
+    arguments:
+        host: string
+        username: string
+        password: string
+        use_pool: boolean
+        tasks: collections.deque of dictionary
+            files still to transfer, see get_folder_tree
+            the dictionaries are updated with the results
+        lock: threading.Lock
+            guards taking tasks and putting them back
+        retries: int
+        transfer: function
+            called with (ftp, task) to transfer one file, sets task["bytes"] and
+            optionally task["skipped"] and task["resumed_from"]
+    return value: none
+    """
+
+    connect_failures = 0
+    while connect_failures <= retries:
+        task = None
+        try:
+            with _connection(host, username, password, use_pool) as ftp:
+                connect_failures = 0
+                while True:
+                    with lock:
+                        if not tasks:
+                            return
+                        task = tasks.popleft()
+                    task["attempts"] += 1
+                    start_time = time.time()
+                    transfer(ftp, task)
+                    task["seconds"] = time.time() - start_time
+                    task["bytes_per_second"] = task["bytes"] / max(task["seconds"], 1e-9)
+                    task["success"] = True
+                    task["message"] = None
+                    task = None
+        except Exception as e:
+            if task is None:
+                # couldn't connect, try again
+                connect_failures += 1
+                continue
+            task["message"] = str(e)
+            if not isinstance(e, error_perm) and task["attempts"] <= retries:
+                with lock:
+                    tasks.append(task)
 
 
 def _try_cwd(ftp, item):
@@ -240,5 +1087,164 @@ def _try_cwd(ftp, item):
         return False
 
 
+def _upload_file(ftp, local_path, remote_path, offset=0):
+    """
+    purpose:
+        Upload one file to a .part file and rename it when it is complete
+        The remote modify time is set to the local one with MFMT, if the server supports it.
+    arguments:
+        ftp: ftplib.FTP
+            authenticated ftp connection
+        local_path: string
+        remote_path: string
+        offset: int
+            if > 0, append to the existing remote .part file starting at this byte,
+            with REST and STOR, or APPE if the server doesn't support REST for uploads
+    return value: int
+        number of bytes uploaded
+    """
+
+    part_path = remote_path + ".part"
+    size = [0]
+
+    def count(data):
+        size[0] += len(data)
+
+    local_size = os.path.getsize(local_path)
+    modify_seconds = int(os.path.getmtime(local_path))
+    with open(local_path, "rb") as f:
+        if offset > 0:
+            f.seek(offset)
+            try:
+                ftp.storbinary("STOR {0}".format(part_path), f, callback=count, rest=offset)
+            except (error_perm, error_reply):
+                f.seek(offset)
+                ftp.storbinary("APPE {0}".format(part_path), f, callback=count)
+            # a resumed upload is only as good as the part it was appended to
+            ftp.voidcmd("TYPE I")
+            uploaded_size = ftp.size(part_path)
+            if uploaded_size != local_size:
+                raise IOError("{0} is {1} bytes, expected {2}".format(part_path, uploaded_size, local_size))
+        else:
+            ftp.storbinary("STOR {0}".format(part_path), f, callback=count)
+    try:
+        ftp.rename(part_path, remote_path)
+    except error_perm:
+        # some servers won't rename over an existing file
+        ftp.delete(remote_path)
+        ftp.rename(part_path, remote_path)
+    try:
+        ftp.sendcmd("MFMT {0} {1}".format(time.strftime("%Y%m%d%H%M%S", time.gmtime(modify_seconds)), remote_path))
+    except (error_perm, error_reply):
+        pass
+    return size[0]
+
+
+def _upload_task(ftp, task, sync=False, exact_modify=False):
+    """
+    purpose:
+        Upload one file of put_folder_tree, see _transfer_worker
+        In sync mode the file is skipped if the remote file has its size and modify time.
+        Uploads set the remote modify time to the local one with MFMT, so if the server
+        supports MFMT the times must be equal, if not the remote time must be no older
+        than the local one. A remote .part file written after the local file last changed is resumed.
+        Modify times are whole seconds, so a same size change within the second of the
+        last upload isn't seen.
+    arguments:
+        ftp: ftplib.FTP
+            authenticated ftp connection
+        task: dictionary
+            see put_folder_tree, with the remote size and modify time of the file and its .part file
+            from the listing, a modify time of None is asked for with MDTM
+        sync: boolean
+        exact_modify: boolean
+            True if the server supports MFMT
+    return value: none
+    """
+
+    offset = 0
+    if sync:
+        local_size = os.path.getsize(task["local_path"])
+        modify_seconds = int(os.path.getmtime(task["local_path"]))
+        if task["remote_exists"] and task["remote_size"] == local_size:
+            modify = task["remote_modify"] or _remote_modify(ftp, task["remote_path"])
+            remote_seconds = calendar.timegm(modify.timetuple()) if modify is not None else None
+            if remote_seconds == modify_seconds or (not exact_modify and remote_seconds is not None
+                                                    and remote_seconds > modify_seconds):
+                task["skipped"] = True
+                task["bytes"] = 0
+                return
+        part_path = task["remote_path"] + ".part"
+        if task["attempts"] > 1:
+            # an earlier attempt may have left a longer part behind
+            try:
+                ftp.voidcmd("TYPE I")
+                task["part_size"] = ftp.size(part_path)
+                task["part_modify"] = None
+            except error_perm:
+                task["part_size"] = None
+        if task["part_size"] is not None and 0 < task["part_size"] < local_size:
+            modify = task["part_modify"] or _remote_modify(ftp, part_path)
+            if modify is not None and calendar.timegm(modify.timetuple()) >= modify_seconds:
+                offset = task["part_size"]
+    task["resumed_from"] = offset
+    task["bytes"] = _upload_file(ftp, task["local_path"], task["remote_path"], offset)
+
+
+def _walk_folder_tree(ftp, ftp_folder):
+    """
+    purpose:
+        List every folder and file under an ftp folder, with one listing command per folder
+    arguments:
+        ftp: ftplib.FTP
+            authenticated ftp connection
+        ftp_folder: string
+            top level folder on the ftp host
+    return value: tuple
+        (folders, files)
+        folders: list of string
+            paths relative to ftp_folder, "" for ftp_folder itself
+        files: list of tuple
+            (absolute path on the ftp host, path relative to ftp_folder, size, modify)
+            see list_items for size and modify
+    """
+
+    ftp.cwd(ftp_folder)
+    # absolute paths so the listings don't depend on the current folder
+    root = ftp.pwd().rstrip("/")
+    folders = []
+    files = []
+    stack = [""]
+    while stack:
+        relative_folder = stack.pop()
+        folders.append(relative_folder)
+        remote_folder = "{0}/{1}".format(root, relative_folder) if relative_folder else root or "/"
+        for item in _list_folder(ftp, remote_folder):
+            relative_path = "{0}/{1}".format(relative_folder, item["name"]) if relative_folder else item["name"]
+            if item["type"] == "dir":
+                stack.append(relative_path)
+            else:
+                files.append(("{0}/{1}".format(root, relative_path), relative_path, item["size"], item["modify"]))
+    return folders, files
+
+
+def _write_manifest(manifest_file, manifest):
+    """
+    purpose:
+        Write a sync manifest to a temporary file then move it into place,
+        so an interrupted write never leaves a broken manifest
+    arguments:
+        manifest_file: string
+        manifest: dictionary
+            relative path: {"size": int, "modify": "YYYYMMDDHHMMSS" or None}
+    return value: none
+    """
+
+    temp_file = manifest_file + ".part"
+    with open(temp_file, "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(temp_file, manifest_file)
+
+
 if __name__ == '__main__':
     main()
@@ -3,7 +3,10 @@ Name:           GISUtils
 
 Purpose:        GIS utilities
 
-Dependencies:   arcpy, requests, TypeUtils
+Dependencies:   arcpy, numpy, requests, ConfigUtils, GeometryUtils, TypeUtils
+                arcpy, numpy, and requests are imported the first time they are used
+                without arcpy, geometry is built with GeometryUtils and tables can be
+                GeometryUtils.Table or any other row source
 
 Version:        3.6
 
@@ -13,17 +16,54 @@ Created:        9/17/2018
 """
 
 
-import arcpy
+import atexit
+import concurrent.futures
+import ConfigUtils
 import csv
 import datetime
+import decimal
+import GeometryUtils
+import gzip
+import hashlib
+import itertools
 import json
 import math
+import multiprocessing
+import numbers
+import operator
 import os
-import requests
+import re
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
 import TypeUtils
+import weakref
+import zipfile
 
-config_file = os.path.join(os.path.dirname(__file__), "config.json")
-CONFIG = json.loads(open(config_file).read()) if os.path.isfile(config_file) else {}
+# heavy dependencies are imported the first time they are used
+arcpy = ConfigUtils.lazy_import("arcpy")
+np = ConfigUtils.lazy_import("numpy")
+requests = ConfigUtils.lazy_import("requests")
+
+CONFIG = ConfigUtils.get_config()
+
+# if False, geometry is built with GeometryUtils instead of arcpy
+ARCPY_AVAILABLE = ConfigUtils.module_available("arcpy")
+
+# WGS84 ellipsoid semi-major axis (meters) and flattening
+WGS84_A = 6378137.0
+WGS84_F = 1 / 298.257223563
+# mean earth radius (meters) used by the haversine methods
+EARTH_RADIUS = 6371008.8
+
+# line index used by the get_stations worker processes
+_STATION_INDEX = None
+
+# shared keep-alive session, see get_session
+_SESSION = None
+_SESSION_LOCK = threading.Lock()
 
 
 def main():
@@ -32,6 +72,626 @@ def main():
     return
 
 
+class ArcpyRowSource(object):
+    """
+    purpose:
+        Row source that reads a feature class, layer, table, or table view
+        with an arcpy.da.SearchCursor
+    arguments:
+        input_table: string
+            full path to a feature class, layer, table, or table view
+    """
+
+    def __init__(self, input_table):
+        self.input_table = input_table
+
+    def list_fields(self):
+        """
+        purpose:
+            get the names of all the fields in the table
+        return value: list of string
+        """
+
+        return [fld.name for fld in arcpy.ListFields(self.input_table)]
+
+    def rows(self, field_names, after_field=None, after_value=None):
+        """
+        purpose:
+            iterate over the rows of the table
+        arguments:
+            field_names: list of string
+                fields to include in each row, in order
+            after_field: string
+                optional field to filter and sort on
+            after_value: varies
+                only rows with after_field > after_value are returned
+                ignored if None
+        return value: iterator of tuple
+        """
+
+        where_clause = None
+        sql_clause = (None, None)
+        filter_position = None
+        if after_field is not None:
+            sql_clause = (None, "ORDER BY {0}".format(after_field))
+            if after_value is not None:
+                lower_names = [name.lower() for name in field_names]
+                if isinstance(after_value, datetime.datetime) and after_field.lower() in lower_names:
+                    # date literals stop at whole seconds, so read from the start of after_value's second
+                    # and drop the rows up to the exact after_value here
+                    where_clause = "{0} >= {1}".format(after_field, _sql_literal(after_value))
+                    filter_position = lower_names.index(after_field.lower())
+                else:
+                    where_clause = "{0} > {1}".format(after_field, _sql_literal(after_value))
+        with arcpy.da.SearchCursor(self.input_table, field_names, where_clause, sql_clause=sql_clause) as cursor:
+            for row in cursor:
+                if filter_position is not None and row[filter_position] <= after_value:
+                    continue
+                yield row
+
+
+class IterableRowSource(object):
+    """
+    purpose:
+        Row source over any iterable of tuples, e.g. a list or a generator
+        A generator can only be read once, use a list if the rows are read more than once.
+    arguments:
+        rows: iterable of tuple
+            the rows, each tuple ordered like field_names
+        field_names: list of string
+            names of the values in each row
+    """
+
+    def __init__(self, rows, field_names):
+        self._rows = rows
+        self.field_names = list(field_names)
+
+    def list_fields(self):
+        """
+        purpose:
+            get the names of all the fields in the rows
+        return value: list of string
+        """
+
+        return list(self.field_names)
+
+    def rows(self, field_names, after_field=None, after_value=None):
+        """
+        purpose:
+            iterate over the rows
+        arguments:
+            field_names: list of string
+                fields to include in each row, in order
+            after_field: string
+                optional field to filter on
+                the rows are expected to already be sorted on this field
+            after_value: varies
+                only rows with after_field > after_value are returned
+                ignored if None
+        return value: iterator of tuple
+        """
+
+        lower_names = [name.lower() for name in self.field_names]
+        positions = [lower_names.index(name.lower()) for name in field_names]
+        rows = iter(self._rows)
+        if after_field is not None and after_value is not None:
+            filter_position = lower_names.index(after_field.lower())
+            rows = (row for row in rows if row[filter_position] is not None and row[filter_position] > after_value)
+        if positions == list(range(len(self.field_names))):
+            # all of the fields in their original order, pass the rows through untouched
+            return rows
+        select = operator.itemgetter(*positions)
+        if len(positions) == 1:
+            return ((select(row),) for row in rows)
+        return map(select, rows)
+
+
+class MessageSink(object):
+    """
+    purpose:
+        Buffered, throttled messaging for add_message
+        Messages are held in a buffer and sent in one print or one arcpy call per
+        message type when the buffer is full, when flush_seconds have passed (on a
+        background timer, so nothing waits for the next message), when an error
+        is written, and on flush or close.
+        A message that is the same as the one before it is counted instead of sent,
+        then reported once as "previous message repeated n times".
+        Plain messages over max_per_second are dropped and reported as a count,
+        warnings and errors are never dropped.
+        Pass the sink as the run_method of add_message, or of any function with a run_method argument.
+        Use it in a with block, or call close, so the last messages are sent.
+        Sinks still open when python exits are closed then.
+    arguments:
+        run_method: string
+            script (default), tool
+        buffer_size: int
+            number of messages held before they are sent
+        flush_seconds: number
+            maximum seconds a message is held
+        max_per_second: number
+            maximum plain messages per second, None (default) for no limit
+    """
+
+    # sinks that haven't been closed, weak so an unused sink can still be garbage collected
+    _open_sinks = weakref.WeakSet()
+
+    def __init__(self, run_method="script", buffer_size=100, flush_seconds=1.0, max_per_second=None):
+        self.run_method = run_method
+        self.buffer_size = buffer_size
+        self.flush_seconds = flush_seconds
+        self.max_per_second = max_per_second
+        self.counts = {"message": 0, "warning": 0, "error": 0}
+        self.repeated = 0
+        self.suppressed = 0
+        self._buffer = []
+        self._last = None
+        self._last_repeats = 0
+        self._suppressed = 0
+        self._flush_time = time.time()
+        self._rate_time = self._flush_time
+        self._rate_allowance = max_per_second
+        self._timer = None
+        self._lock = threading.Lock()
+        MessageSink._open_sinks.add(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @classmethod
+    def close_all(cls):
+        """
+        purpose:
+            close every sink that is still open, registered with atexit
+        arguments: none
+        return value: none
+        """
+
+        for sink in list(cls._open_sinks):
+            sink.close()
+
+    def close(self):
+        """
+        purpose:
+            send everything still buffered, including pending repeat and suppressed counts
+        arguments: none
+        return value: none
+        """
+
+        with self._lock:
+            self._end_runs()
+            self._flush()
+            self._last = None
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        MessageSink._open_sinks.discard(self)
+
+    def flush(self):
+        """
+        purpose:
+            send the buffered messages
+            a run of repeated messages that is still going is reported once it ends
+        arguments: none
+        return value: none
+        """
+
+        with self._lock:
+            self._flush()
+
+    def write(self, message, message_type="message"):
+        """
+        purpose:
+            add a message to the buffer
+        arguments:
+            message: string
+            message_type: string
+                message (default), warning, error
+        return value: none
+        """
+
+        entry = (message_type, message)
+        with self._lock:
+            counts = self.counts
+            counts[message_type] = counts.get(message_type, 0) + 1
+            now = time.time()
+            if entry == self._last:
+                self._last_repeats += 1
+                self.repeated += 1
+                self._schedule()
+                return
+            if self.max_per_second is not None and message_type == "message" and not self._allow(now):
+                self._suppressed += 1
+                self.suppressed += 1
+                self._schedule()
+                return
+            if self._last_repeats or self._suppressed:
+                self._end_runs()
+            self._last = entry
+            buffer = self._buffer
+            buffer.append(entry)
+            if len(buffer) >= self.buffer_size or message_type == "error" or \
+                    now - self._flush_time >= self.flush_seconds:
+                self._flush()
+            else:
+                self._schedule()
+
+    def _allow(self, now):
+        """
+        purpose:
+            determine if a plain message is under max_per_second
+            a token bucket refilled at max_per_second, holding at most one second of messages
+        arguments:
+            now: float
+                time.time() of the message
+        return value: boolean
+        """
+
+        self._rate_allowance = min(self._rate_allowance + (now - self._rate_time) * self.max_per_second,
+                                   self.max_per_second)
+        self._rate_time = now
+        if self._rate_allowance < 1:
+            return False
+        self._rate_allowance -= 1
+        return True
+
+    def _end_runs(self):
+        """
+        purpose:
+            buffer the repeat count of the last message and the count of
+            suppressed messages, so they are sent in order with the other messages
+        return value: none
+        """
+
+        if self._last_repeats:
+            self._buffer.append((self._last[0], "previous message repeated {0:,} times".format(self._last_repeats)))
+            self._last_repeats = 0
+        if self._suppressed:
+            self._buffer.append(("warning", "{0:,} messages suppressed".format(self._suppressed)))
+            self._suppressed = 0
+
+    def _flush(self):
+        """
+        purpose:
+            send the buffer, caller holds the lock
+        return value: none
+        """
+
+        if self._buffer:
+            if self.run_method == "script":
+                print("\n".join("{0}: {1}".format(message_type, message) for message_type, message in self._buffer))
+            else:
+                # one call per run of messages of the same type
+                for message_type, run in itertools.groupby(self._buffer, operator.itemgetter(0)):
+                    _send_message("\n".join(message for _, message in run), message_type, self.run_method)
+            self._buffer = []
+        self._flush_time = time.time()
+
+    def _schedule(self):
+        """
+        purpose:
+            start the timer that sends what is held after flush_seconds, if it isn't running
+            caller holds the lock
+        return value: none
+        """
+
+        if self._timer is None:
+            self._timer = threading.Timer(self.flush_seconds, self._timed_flush)
+            # don't keep python running for a timer, atexit closes the sink
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _timed_flush(self):
+        """
+        purpose:
+            timer target, send the buffer and the counts of runs still going
+        return value: none
+        """
+
+        with self._lock:
+            self._timer = None
+            self._end_runs()
+            self._flush()
+
+
+# send what open sinks still hold when python exits
+atexit.register(MessageSink.close_all)
+
+
+class SchemaCache(object):
+    """
+    purpose:
+        Cache of dataset fields and geodatabase domains
+        Fields and domains are listed with arcpy once and kept in dictionaries
+        keyed by lower case name, so repeated lookups don't call arcpy.
+        Entries are reloaded when invalidated or when the dataset's modification time changes.
+        Paths with no modification time, like layer names and in_memory datasets,
+        are never cached. For enterprise geodatabases the .sde connection file never changes,
+        so call invalidate after changing the schema.
+    arguments:
+        check_mtime: boolean
+            if True, reload entries whose dataset has been modified since they were loaded
+        check_seconds: number
+            minimum number of seconds between modification time checks of a dataset
+    """
+
+    def __init__(self, check_mtime=True, check_seconds=5):
+        self.check_mtime = check_mtime
+        self.check_seconds = check_seconds
+        self._fields = {}
+        self._domains = {}
+        self._lock = threading.Lock()
+
+    def field_exists(self, dataset, field_name):
+        """
+        purpose:
+            determine if a field exists in a dataset
+        arguments:
+            dataset: string
+            field_name: string
+        return value: boolean
+        """
+
+        return field_name.lower() in self.get_fields(dataset)
+
+    def get_domain(self, gdb, domain_name):
+        """
+        purpose:
+            get a domain from a geodatabase
+        arguments:
+            gdb: string
+            domain_name: string
+        return value: arcpy.Domain
+            None if the domain does not exist
+        """
+
+        return self.get_domains(gdb).get(domain_name.lower())
+
+    def get_domains(self, gdb):
+        """
+        purpose:
+            get all the domains in a geodatabase
+        arguments:
+            gdb: string
+        return value: dictionary
+            lower case domain name: arcpy.Domain
+        """
+
+        return self._get(self._domains, gdb, lambda: {domain.name.lower(): domain for domain in arcpy.da.ListDomains(gdb)})
+
+    def get_fields(self, dataset):
+        """
+        purpose:
+            get all the fields in a dataset
+        arguments:
+            dataset: string
+        return value: dictionary
+            lower case field name: arcpy.Field
+        """
+
+        return self._get(self._fields, dataset, lambda: {fld.name.lower(): fld for fld in arcpy.ListFields(dataset)})
+
+    def invalidate(self, path=None):
+        """
+        purpose:
+            remove cached fields and domains
+        arguments:
+            path: string
+                dataset or geodatabase to remove, None to clear everything
+        return value: none
+        """
+
+        with self._lock:
+            if path is None:
+                self._fields.clear()
+                self._domains.clear()
+            else:
+                key = os.path.normcase(path)
+                self._fields.pop(key, None)
+                self._domains.pop(key, None)
+
+    def _get(self, entries, path, load):
+        """
+        purpose:
+            get an entry from the cache, loading it if it is missing or stale
+        arguments:
+            entries: dictionary
+                self._fields or self._domains
+            path: string
+            load: function
+                returns the dictionary to cache
+        return value: dictionary
+        """
+
+        key = os.path.normcase(path)
+        now = time.time()
+        with self._lock:
+            entry = entries.get(key)
+            if entry is not None:
+                if not self.check_mtime or now - entry["checked"] < self.check_seconds:
+                    return entry["items"]
+                mtime = _schema_mtime(path)
+                if mtime == entry["mtime"]:
+                    entry["checked"] = now
+                    return entry["items"]
+        mtime = _schema_mtime(path) if self.check_mtime else None
+        items = load()
+        if self.check_mtime and mtime is None:
+            # nothing to tell when it changes
+            return items
+        with self._lock:
+            entries[key] = {"items": items, "mtime": mtime, "checked": now}
+        return items
+
+
+# shared schema cache used by field_exists and get_domain
+SCHEMA_CACHE = SchemaCache()
+
+
+class SqliteRowSource(object):
+    """
+    purpose:
+        Row source that reads a table in a sqlite database
+    arguments:
+        database: string or sqlite3.Connection
+            path to the sqlite database or an open connection
+        table_name: string
+            name of the table to read
+    """
+
+    def __init__(self, database, table_name):
+        self.database = database
+        self.table_name = table_name
+
+    def list_fields(self):
+        """
+        purpose:
+            get the names of all the fields in the table
+        return value: list of string
+        """
+
+        connection = self._connect()
+        try:
+            return [row[1] for row in connection.execute("PRAGMA table_info({0})".format(_sql_identifier(self.table_name)))]
+        finally:
+            if connection is not self.database:
+                connection.close()
+
+    def rows(self, field_names, after_field=None, after_value=None):
+        """
+        purpose:
+            iterate over the rows of the table
+        arguments:
+            field_names: list of string
+                fields to include in each row, in order
+            after_field: string
+                optional field to filter and sort on
+            after_value: varies
+                only rows with after_field > after_value are returned
+                ignored if None
+        return value: iterator of tuple
+        """
+
+        sql = "SELECT {0} FROM {1}".format(
+            ", ".join(_sql_identifier(name) for name in field_names), _sql_identifier(self.table_name))
+        params = ()
+        if after_field is not None:
+            if after_value is not None:
+                sql += " WHERE {0} > ?".format(_sql_identifier(after_field))
+                params = (after_value,)
+            sql += " ORDER BY {0}".format(_sql_identifier(after_field))
+        connection = self._connect()
+        try:
+            cursor = connection.execute(sql, params)
+            while True:
+                batch = cursor.fetchmany(10000)
+                if len(batch) == 0:
+                    break
+                for row in batch:
+                    yield row
+        finally:
+            if connection is not self.database:
+                connection.close()
+
+    def _connect(self):
+        """
+        purpose:
+            get a connection to the database
+        return value: sqlite3.Connection
+        """
+
+        if isinstance(self.database, sqlite3.Connection):
+            return self.database
+        return sqlite3.connect(self.database)
+
+
+class TokenCache(object):
+    """
+    purpose:
+        Thread-safe cache of ArcGIS security tokens
+        Tokens are kept per token url, username, and password (hashed) until shortly before the
+        expires time returned by the server, then a new token is requested.
+        Requests go through the shared keep-alive session from get_session.
+    arguments:
+        refresh_seconds: number
+            how many seconds before expiration a token is replaced
+        session: requests.Session
+            session to send the requests with
+            if None, the session from get_session is used
+    """
+
+    def __init__(self, refresh_seconds=60, session=None):
+        self.refresh_seconds = refresh_seconds
+        self.session = session
+        self._tokens = {}
+        self._key_locks = {}
+        self._lock = threading.Lock()
+
+    def get_token(self, url, username, password, params=None):
+        """
+        purpose:
+            get a cached token or request a new one from a generateToken url
+        arguments:
+            url: string
+                generateToken url
+            username: string
+            password: string
+            params: dictionary
+                additional request parameters, e.g. referer
+        return value: string
+            token, None if error
+        """
+
+        # a wrong password must not get the token of the right one
+        key = (url, username, hashlib.sha256(password.encode("utf-8")).hexdigest())
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        # one request per key at a time, other threads wait for the new token
+        with key_lock:
+            with self._lock:
+                cached = self._tokens.get(key)
+            if cached is not None and time.time() < cached[1] - self.refresh_seconds:
+                return cached[0]
+            request_params = {"username": username, "password": password, "f": "json"}
+            if params is not None:
+                request_params.update(params)
+            session = self.session if self.session is not None else get_session()
+            result = session.post(url, request_params).json()
+            token = result.get("token")
+            expires = result.get("expires")
+            with self._lock:
+                if token is not None and expires is not None:
+                    # ArcGIS returns epoch milliseconds
+                    expires = float(expires)
+                    self._tokens[key] = (token, expires / 1000.0 if expires > 1e11 else expires)
+                else:
+                    self._tokens.pop(key, None)
+            return token
+
+    def invalidate(self, url=None, username=None):
+        """
+        purpose:
+            remove cached tokens, e.g. after a request is rejected with an invalid token error
+        arguments:
+            url: string
+                only remove tokens for this url, None for all urls
+            username: string
+                only remove tokens for this username, None for all usernames
+        return value: none
+        """
+
+        with self._lock:
+            for key in list(self._tokens):
+                if (url is None or key[0] == url) and (username is None or key[1] == username):
+                    del self._tokens[key]
+
+
+# shared token cache used by get_agol_token and get_ags_token
+TOKEN_CACHE = TokenCache()
+
+
 def add_message(message, message_type="message", run_method="script"):
     """
     purpose:
@@ -45,25 +705,58 @@ def add_message(message, message_type="message", run_method="script"):
         For GP tools that will be published as services,
             use "messages" output parameter method.
             it is more friendly for the WAB gp widget
+        For tools that send many messages, pass a MessageSink as the run_method
+            to buffer the messages and collapse repeats.
     arguments:
         message: string
             the message to send to the user
         message_type: string
             message (default), warning, error
-        run_method: string
-            script (default), tool
+        run_method: string or MessageSink
+            script (default), tool, or a MessageSink to buffer the message in
     return value: none
     """
 
-    if run_method == "script":
-        print("{0}: {1}".format(message_type, message))
-    elif run_method == "tool":
-        if message_type == "message":
-            arcpy.AddMessage(message)
-        elif message_type == "warning":
-            arcpy.AddWarning(message)
-        elif message_type == "error":
-            arcpy.AddError(message)
+    if isinstance(run_method, MessageSink):
+        run_method.write(message, message_type)
+    else:
+        _send_message(message, message_type, run_method)
+
+
+def affine_matrix(angle=0, x_pivot=0, y_pivot=0, x_scale=1, y_scale=1, x_offset=0, y_offset=0):
+    """
+    purpose:
+        Compose a scale, rotation, and translation into one 3x3 affine matrix
+        for use with transform_coords.
+        The coordinates are scaled and rotated about the pivot point, then moved by the offsets.
+    arguments:
+        angle: number
+            rotation angle in degrees, same convention as rotate_xy
+            positive numbers for clockwise
+            negative numbers for counter-clockwise
+        x_pivot: number
+            x coordinate of the point to scale and rotate about
+        y_pivot: number
+            y coordinate of the point to scale and rotate about
+        x_scale: number
+            scale factor in the x direction
+        y_scale: number
+            scale factor in the y direction
+        x_offset: number
+            distance to move in the x direction
+        y_offset: number
+            distance to move in the y direction
+    return value: numpy.ndarray of float, shape (3, 3)
+    """
+
+    radians = math.radians(angle)
+    cos_a = math.cos(radians)
+    sin_a = math.sin(radians)
+    to_origin = np.array([[1, 0, -x_pivot], [0, 1, -y_pivot], [0, 0, 1]], dtype=np.float64)
+    scale = np.array([[x_scale, 0, 0], [0, y_scale, 0], [0, 0, 1]], dtype=np.float64)
+    rotate = np.array([[cos_a, sin_a, 0], [-sin_a, cos_a, 0], [0, 0, 1]], dtype=np.float64)
+    from_origin = np.array([[1, 0, x_pivot + x_offset], [0, 1, y_pivot + y_offset], [0, 0, 1]], dtype=np.float64)
+    return from_origin @ rotate @ scale @ to_origin
 
 
 def calc_coords(starting_point, distance, h_angle, v_angle):
@@ -91,58 +784,130 @@ def calc_coords(starting_point, distance, h_angle, v_angle):
 
     ret_dict = {"messages": [], "coords": ()}
     try:
-        # validate starting_point
-        if len(starting_point) != 3:
-            ret_dict["messages"].append("Error in calc_coords: starting_point does not have 3 items")
-            ret_dict["success"] = False
-            return
-        # validate distance
-        if TypeUtils.is_numeric(distance):
-            if distance <= 0:
-                ret_dict["messages"].append("Error in calc_coords: distance must be > 0")
-                ret_dict["success"] = False
-                return
-        else:
-            ret_dict["messages"].append("Error in calc_coords: distance must be a number")
-            ret_dict["success"] = False
-            return
-        # validate h_angle
-        if TypeUtils.is_numeric(distance):
-            if not 0 <= h_angle < 360:
-                ret_dict["messages"].append("Error in calc_coords: horizontal angle much be between 0 and 360")
-                ret_dict["success"] = False
-                return
-        else:
-            ret_dict["messages"].append("Error in calc_coords: horizontal angle must be a number")
-            ret_dict["success"] = False
-            return
-        # validate v_angle
-        if TypeUtils.is_numeric(distance):
-            if not 0 <= h_angle <= 180:
-                ret_dict["messages"].append("Error in calc_coords: vertical angle much be between 0 and 180")
-                ret_dict["success"] = False
-                return
-        else:
-            ret_dict["messages"].append("Error in calc_coords: vertical angle must be a number")
+        ret_dict["coords"] = calc_coords_fast(starting_point, distance, h_angle, v_angle)
+        ret_dict["success"] = True
+    except ValueError as e:
+        ret_dict["messages"].append("Error in calc_coords: {0}".format(str(e)))
+        ret_dict["success"] = False
+    except Exception as e:
+        ret_dict["messages"].append("Error: {0}".format(str(e)))
+        ret_dict["success"] = False
+    finally:
+        return ret_dict
+    return
+
+
+def calc_coords_batch(starting_points, distances, h_angles, v_angles):
+    """
+    purpose:
+        Vectorized version of calc_coords for arrays of survey shots.
+        Calculates all the new coordinates in a single numpy pass.
+        Scalar arguments are broadcast against the array arguments.
+    arguments:
+        starting_points: array-like of float, shape (N, 3) or (3,)
+            (x, y, z) coordinates of the starting points
+        distances: array-like of float, shape (N,) or scalar
+            3D distances to the new points, must be > 0
+        h_angles: array-like of float, shape (N,) or scalar
+            Horizontal angles, counter clockwise from east
+            0 <= h_angle < 360
+        v_angles: array-like of float, shape (N,) or scalar
+            Vertical angles, 180 degrees from zenith to nadir
+            Horizon is 90
+            0 <= v_angle <= 180
+    return value: dictionary
+        success: boolean
+            False only if the arguments could not be processed at all,
+            individual bad rows are reported in valid
+        coords: numpy.ndarray of float, shape (N, 3)
+            (x, y, z) coordinates of the new points
+            rows that failed validation are NaN
+        valid: numpy.ndarray of bool, shape (N,)
+            True for rows that passed the same validation as calc_coords
+        messages: list of string
+    """
+
+    ret_dict = {"messages": [], "coords": None, "valid": None}
+    try:
+        starting_points = np.asarray(starting_points, dtype=np.float64)
+        if starting_points.ndim == 1:
+            starting_points = starting_points.reshape(1, -1)
+        if starting_points.ndim != 2 or starting_points.shape[1] != 3:
+            ret_dict["messages"].append("Error in calc_coords_batch: starting_points must have 3 columns")
             ret_dict["success"] = False
             return
-        # get the starting coordinates
-        x1 = starting_point[0]
-        y1 = starting_point[1]
-        z1 = starting_point[2]
+        distances = np.asarray(distances, dtype=np.float64)
+        h_angles = np.asarray(h_angles, dtype=np.float64)
+        v_angles = np.asarray(v_angles, dtype=np.float64)
+        # broadcast everything to a common row count
+        x1, y1, z1, distances, h_angles, v_angles = np.broadcast_arrays(
+            starting_points[:, 0], starting_points[:, 1], starting_points[:, 2],
+            distances, h_angles, v_angles
+        )
+        # validate every row at once, NaN fails all the comparisons
+        valid = (
+            np.isfinite(x1) & np.isfinite(y1) & np.isfinite(z1) &
+            (distances > 0) &
+            (h_angles >= 0) & (h_angles < 360) &
+            (v_angles >= 0) & (v_angles <= 180)
+        )
         # compute the new coordinates
-        x2 = x1 + (distance * math.sin(math.radians(v_angle)) * math.cos(math.radians(h_angle)))
-        y2 = y1 + (distance * math.sin(math.radians(v_angle)) * math.sin(math.radians(h_angle)))
-        z2 = z1 + (distance * math.cos(math.radians(v_angle)))
-        # return the new point
-        ret_dict["coords"] = (x2, y2, z2)
+        h_rad = np.radians(h_angles)
+        v_rad = np.radians(v_angles)
+        horiz = distances * np.sin(v_rad)
+        coords = np.empty((valid.shape[0], 3), dtype=np.float64)
+        coords[:, 0] = x1 + (horiz * np.cos(h_rad))
+        coords[:, 1] = y1 + (horiz * np.sin(h_rad))
+        coords[:, 2] = z1 + (distances * np.cos(v_rad))
+        coords[~valid] = np.nan
+        invalid_count = int(valid.size - np.count_nonzero(valid))
+        if invalid_count > 0:
+            ret_dict["messages"].append("calc_coords_batch: {0} of {1} rows failed validation".format(invalid_count, valid.size))
+        ret_dict["coords"] = coords
+        ret_dict["valid"] = valid
         ret_dict["success"] = True
     except Exception as e:
         ret_dict["messages"].append("Error: {0}".format(str(e)))
         ret_dict["success"] = False
     finally:
         return ret_dict
-    return
+
+
+def calc_coords_fast(starting_point, distance, h_angle, v_angle):
+    """
+    purpose:
+        Fast path of calc_coords for tight loops
+        Returns the coordinates directly and raises exceptions instead of building a result dictionary.
+    arguments:
+        see calc_coords
+    return value: tuple
+        (x, y, z) coordinates of the new point
+        raises ValueError if an argument is out of range or not a number
+    """
+
+    if len(starting_point) != 3:
+        raise ValueError("starting_point does not have 3 items")
+    try:
+        if distance <= 0:
+            raise ValueError("distance must be > 0")
+    except TypeError:
+        raise ValueError("distance must be a number")
+    try:
+        if not 0 <= h_angle < 360:
+            raise ValueError("horizontal angle much be between 0 and 360")
+    except TypeError:
+        raise ValueError("horizontal angle must be a number")
+    try:
+        if not 0 <= v_angle <= 180:
+            raise ValueError("vertical angle much be between 0 and 180")
+    except TypeError:
+        raise ValueError("vertical angle must be a number")
+    h_radians = math.radians(h_angle)
+    v_radians = math.radians(v_angle)
+    horizontal = distance * math.sin(v_radians)
+    return (starting_point[0] + (horizontal * math.cos(h_radians)),
+            starting_point[1] + (horizontal * math.sin(h_radians)),
+            starting_point[2] + (distance * math.cos(v_radians)))
 
 
 def calc_dist(point1, point2):
@@ -157,6 +922,7 @@ def calc_dist(point1, point2):
             (x2, y2) or (x2, y2, z2)
     return value: dictionary
         success: boolean
+            False if either point has fewer than 2 coordinates
         distance2D: float
             will only have a value if success == True
         distance3D: float
@@ -167,18 +933,7 @@ def calc_dist(point1, point2):
 
     ret_dict = {"messages": [], "distance2D": None, "distance3D": None}
     try:
-        if len(point1) >= 2 and len(point2) >= 2:
-            x1 = point1[0]
-            y1 = point1[1]
-            x2 = point2[0]
-            y2 = point2[1]
-            distance2D = math.sqrt((math.pow(x2 - x1, 2)) + (math.pow(y2 - y1, 2)))
-            ret_dict["distance2D"] = distance2D
-        if len(point1) == 3 and len(point2) == 3:
-            z1 = point1[2]
-            z2 = point2[2]
-            distance3D = math.sqrt((math.pow(x2 - x1, 2)) + (math.pow(y2 - y1, 2)) + (math.pow(z2 - z1, 2)))
-            ret_dict["distance3D"] = distance3D
+        ret_dict["distance2D"], ret_dict["distance3D"] = calc_dist_fast(point1, point2)
         ret_dict["success"] = True
     except Exception as e:
         ret_dict["messages"].append("Error: {0}".format(str(e)))
@@ -188,327 +943,2140 @@ def calc_dist(point1, point2):
     return
 
 
-def create_rectangle(x_cen, y_cen, width, height, angle=0, clockwise=True):
-    """
-    purpose:
-        Create an arcpy.Polygon from the corner coordinates, optionally rotated
-    arguments:
-        x_cen: number
-            center x coordinate of the rectangle
-        y_cen: number
-            center y coordinate of the rectangle
-        width: number
-            width of the rectangle
-        height: number
-            height of the rectangle
-        angle: number
-            angle between the original point and the new point using the pivot point as the vertex of the angle
-            0-360
-            positive numbers for clockwise
-            negative numbers for counter-clockwise
-    return value: arcpy.Polygon
-        if error, None
-    """
-
-    try:
-        array = arcpy.Array()
-        # lower-left
-        coords_ll = rotate_xy(x_cen - (width / float(2)), y_cen - (height / float(2)), x_cen, y_cen, angle, True)
-        array.add(arcpy.Point(coords_ll[0], coords_ll[1]))
-        # upper-left
-        coords_ul = rotate_xy(x_cen - (width / float(2)), y_cen + (height / float(2)), x_cen, y_cen, angle, True)
-        array.add(arcpy.Point(coords_ul[0], coords_ul[1]))
-        # upper-right
-        coords_ur = rotate_xy(x_cen + (width / float(2)), y_cen + (height / float(2)), x_cen, y_cen, angle, True)
-        array.add(arcpy.Point(coords_ur[0], coords_ur[1]))
-        # lower-right
-        coords_lr = rotate_xy(x_cen + (width / float(2)), y_cen - (height / float(2)), x_cen, y_cen, angle, True)
-        array.add(arcpy.Point(coords_lr[0], coords_lr[1]))
-        return arcpy.Polygon(array)
-    except Exception:
-        return None
-
-
-def export_table_to_csv(input_table, output_file, field_names=["*"], include_header=True):
+def calc_dist_batch(points1, points2):
     """
     purpose:
-        Export a feature class or table to a csv file
+        Vectorized version of calc_dist for paired arrays of points
+        Row i of points1 is measured to row i of points2
+        Compute both 2D and 3D distances (if z coordinates are provided)
     arguments:
-        input_table: string
-            full path to a feature class, layer, table, or table view
-        output_file: string
-            full path to the csv file to create
-            WARNING: if the output_file exists it will be overwritten
-        field_names: list of string
-            list of field names to include in the csv file
-            specify individual field names or use ["*"] for all fields
-        include_header: boolean
-            whether or not to include the header row in the output_file
+        points1: array-like of float, shape (N, 2) or (N, 3)
+            (x1, y1) or (x1, y1, z1) rows
+        points2: array-like of float, shape (N, 2) or (N, 3)
+            (x2, y2) or (x2, y2, z2) rows
+            a single point is broadcast against every row of points1
     return value: dictionary
         success: boolean
-        messages: list of string
-            only error messages will be returned.
-            This will be empty if successful
+        distance2D: numpy.ndarray of float, shape (N,)
+            will only have a value if success == True
+        distance3D: numpy.ndarray of float, shape (N,)
+            will only have a value if success == True and
+            z values were provided in both point arrays
+        messages: list
     """
 
-    ret_dict = {"messages": []}
+    ret_dict = {"messages": [], "distance2D": None, "distance3D": None}
     try:
-        # get all the fields if ["*"] was specified
-        if len(field_names) == 1 and field_names[0] == "*":
-            field_names = [fld.name for fld in arcpy.ListFields(input_table)]
-        with open(output_file, "w", newline="") as csvfile:
-            csvwriter = csv.writer(csvfile)
-            # write the header row
-            if include_header is True:
-                csvwriter.writerow(field_names)
-            # write the data
-            for row in arcpy.da.SearchCursor(input_table, field_names):
-                csvwriter.writerow(row)
+        points1 = np.atleast_2d(np.asarray(points1, dtype=np.float64))
+        points2 = np.atleast_2d(np.asarray(points2, dtype=np.float64))
+        if points1.shape[1] < 2 or points2.shape[1] < 2:
+            ret_dict["messages"].append("Error in calc_dist_batch: points must have at least 2 columns")
+            ret_dict["success"] = False
+            return
+        dx = points2[:, 0] - points1[:, 0]
+        dy = points2[:, 1] - points1[:, 1]
+        sum_sq = (dx * dx) + (dy * dy)
+        ret_dict["distance2D"] = np.sqrt(sum_sq)
+        if points1.shape[1] == 3 and points2.shape[1] == 3:
+            dz = points2[:, 2] - points1[:, 2]
+            ret_dict["distance3D"] = np.sqrt(sum_sq + (dz * dz))
         ret_dict["success"] = True
     except Exception as e:
-        ret_dict["messages"].append(str(e))
+        ret_dict["messages"].append("Error: {0}".format(str(e)))
         ret_dict["success"] = False
     finally:
         return ret_dict
 
 
-def field_exists(feature_class, field_name):
+def calc_dist_fast(point1, point2):
     """
     purpose:
-        determine if a field exists in a feature class
+        Fast path of calc_dist for tight loops
+        Returns the distances directly and raises exceptions instead of building a result dictionary.
     arguments:
-        feature_class: string
-            gdb feature class
-        field_name: string
-    return value: boolean
-        True if the field exists
-        False if it does not exist or if there is an error
+        see calc_dist
+    return value: tuple
+        (distance2D, distance3D)
+        distance3D is None unless both points have z coordinates
+        raises ValueError if either point has fewer than 2 coordinates
     """
-    try:
-        return field_name.lower() in [fld.name.lower() for fld in arcpy.ListFields(feature_class, field_name)]
-    except Exception:
-        return False
 
+    if len(point1) < 2 or len(point2) < 2:
+        raise ValueError("points must have at least 2 coordinates")
+    # squared with ** (C pow) like calc_dist always has, so the results match it exactly
+    dx2 = (point2[0] - point1[0]) ** 2
+    dy2 = (point2[1] - point1[1]) ** 2
+    if len(point1) == 3 and len(point2) == 3:
+        return math.sqrt(dx2 + dy2), math.sqrt(dx2 + dy2 + ((point2[2] - point1[2]) ** 2))
+    return math.sqrt(dx2 + dy2), None
 
-def format_station(station):
+
+def calc_dist_matrix(points1, points2=None, dimension=2, chunk_size=1024, output_file=None):
     """
     purpose:
-        format a measure as a station value with hundreds offset
-        0+00 notation
+        Calculate the distance from every point in points1 to every point in points2
+        The matrix is filled chunk_size rows at a time so the working memory
+        stays at roughly chunk_size * len(points2) floats regardless of input size.
     arguments:
-        station: number
-            station measurement
-    return value: string
-        measurement formatted as 0+00
-        None if error
+        points1: array-like of float, shape (N, 2) or (N, 3)
+        points2: array-like of float, shape (M, 2) or (M, 3)
+            if None, points1 is compared against itself
+        dimension: int
+            2 for planar distances, 3 for 3D distances
+            3 requires z values in both point arrays
+        chunk_size: int
+            number of rows of points1 to process at a time
+        output_file: string
+            optional path to a .npy file to hold the matrix
+            the matrix is written through a memory map instead of being held in memory
+            WARNING: if the output_file exists it will be overwritten
+    return value: dictionary
+        success: boolean
+        distances: numpy.ndarray of float, shape (N, M)
+            numpy.memmap if output_file was specified
+            will only have a value if success == True
+        messages: list
     """
 
+    ret_dict = {"messages": [], "distances": None}
     try:
-        if TypeUtils.is_numeric(station):
-            station_str = str(station)
-            if station < 100 and station >= 10:
-                return "0+{0}".format(station_str)
-            elif station < 10:
-                return "0+0{0}".format(station_str)
-            else:
-                if "." in station_str:
-                    return "{0}+{1}.{2}".format(
-                        station_str.split(".")[0][:-2],
-                        station_str.split(".")[0][-2:],
-                        station_str.split(".")[1]
-                    )
-                else:
-                    return "{0}+{1}".format(
-                        station_str.split(".")[0][:-2],
-                        station_str.split(".")[0][-2:]
-                    )
+        points1 = np.atleast_2d(np.asarray(points1, dtype=np.float64))
+        points2 = points1 if points2 is None else np.atleast_2d(np.asarray(points2, dtype=np.float64))
+        if dimension not in (2, 3):
+            ret_dict["messages"].append("Error in calc_dist_matrix: dimension must be 2 or 3")
+            ret_dict["success"] = False
+            return
+        if points1.shape[1] < dimension or points2.shape[1] < dimension:
+            ret_dict["messages"].append("Error in calc_dist_matrix: points must have at least {0} columns".format(dimension))
+            ret_dict["success"] = False
+            return
+        if chunk_size < 1:
+            ret_dict["messages"].append("Error in calc_dist_matrix: chunk_size must be >= 1")
+            ret_dict["success"] = False
+            return
+        shape = (points1.shape[0], points2.shape[0])
+        if output_file is None:
+            distances = np.empty(shape, dtype=np.float64)
         else:
-            return None
-    except Exception:
-        return None
+            distances = np.lib.format.open_memmap(output_file, mode="w+", dtype=np.float64, shape=shape)
+        for start in range(0, shape[0], chunk_size):
+            stop = min(start + chunk_size, shape[0])
+            block = distances[start:stop]
+            # accumulate the squared deltas one axis at a time to keep the temporaries 2D
+            block[:] = 0
+            for axis in range(dimension):
+                delta = points1[start:stop, axis][:, np.newaxis] - points2[:, axis][np.newaxis, :]
+                block += delta * delta
+            np.sqrt(block, out=block)
+        if output_file is not None:
+            distances.flush()
+        ret_dict["distances"] = distances
+        ret_dict["success"] = True
+    except Exception as e:
+        ret_dict["messages"].append("Error: {0}".format(str(e)))
+        ret_dict["success"] = False
+    finally:
+        return ret_dict
 
 
-def get_agol_token(username, password):
+def calc_geodesic_coords(starting_points, distances, bearings, method="vincenty"):
     """
     purpose:
-        get a security token from ArcGIS Online
+        Calculate destination points on the WGS84 ellipsoid from longitude/latitude
+        starting points, distances, and bearings (the geodesic forward problem)
+        Works on arrays directly, no projection needed.
+        Scalar arguments are broadcast against the array arguments.
     arguments:
-        username: string
-        password: string
-    return value: string
-        token, None if error
+        starting_points: array-like of float, shape (N, 2) or (2,)
+            (longitude, latitude) in decimal degrees
+        distances: array-like of float, shape (N,) or scalar
+            distances in meters
+        bearings: array-like of float, shape (N,) or scalar
+            initial bearings in degrees clockwise from north
+            note this is not the calc_coords convention of counter clockwise from east
+        method: string
+            vincenty (default): ellipsoidal, sub-millimeter accuracy
+            haversine: spherical, faster, error up to about 0.5%
+    return value: dictionary
+        success: boolean
+        coords: numpy.ndarray of float, shape (N, 2)
+            (longitude, latitude) of the destination points
+            longitudes are normalized to -180 to 180
+        bearings: numpy.ndarray of float, shape (N,)
+            final bearings at the destination points, degrees clockwise from north
+        valid: numpy.ndarray of bool, shape (N,)
+            False for rows with non-finite input or that did not converge
+        messages: list of string
     """
 
+    ret_dict = {"messages": [], "coords": None, "bearings": None, "valid": None}
     try:
-        url = "https://www.arcgis.com/sharing/rest/generateToken"
-        params = {
-            "username": username,
-            "password": password,
-            "referer": "something",
-            "f": "json"}
-        result = requests.post(url, params).json()
-        return result.get("token")
-    except Exception:
-        return None
+        if method not in ("vincenty", "haversine"):
+            ret_dict["messages"].append("Error in calc_geodesic_coords: method must be vincenty or haversine")
+            ret_dict["success"] = False
+            return
+        starting_points = np.atleast_2d(np.asarray(starting_points, dtype=np.float64))
+        lon1, lat1, distances, bearings = np.broadcast_arrays(
+            starting_points[:, 0], starting_points[:, 1],
+            np.asarray(distances, dtype=np.float64), np.asarray(bearings, dtype=np.float64))
+        valid = np.isfinite(lon1) & np.isfinite(lat1) & np.isfinite(distances) & np.isfinite(bearings)
+        phi1 = np.radians(lat1)
+        alpha1 = np.radians(bearings)
+        if method == "haversine":
+            delta = distances / EARTH_RADIUS
+            sin_phi2 = (np.sin(phi1) * np.cos(delta)) + (np.cos(phi1) * np.sin(delta) * np.cos(alpha1))
+            phi2 = np.arcsin(np.clip(sin_phi2, -1, 1))
+            lon_delta = np.arctan2(np.sin(alpha1) * np.sin(delta) * np.cos(phi1), np.cos(delta) - (np.sin(phi1) * sin_phi2))
+            # final bearing is the reverse of the initial bearing from the destination back
+            final = np.arctan2(np.sin(-lon_delta) * np.cos(phi1),
+                               (np.cos(phi2) * np.sin(phi1)) - (np.sin(phi2) * np.cos(phi1) * np.cos(lon_delta)))
+            # zero length moves keep the initial bearing
+            final = np.where(distances == 0, alpha1, final + math.pi)
+        else:
+            a = WGS84_A
+            f = WGS84_F
+            b = (1 - f) * a
+            sin_alpha1 = np.sin(alpha1)
+            cos_alpha1 = np.cos(alpha1)
+            tan_u1 = (1 - f) * np.tan(phi1)
+            cos_u1 = 1 / np.sqrt(1 + (tan_u1 * tan_u1))
+            sin_u1 = tan_u1 * cos_u1
+            sigma1 = np.arctan2(tan_u1, cos_alpha1)
+            sin_alpha = cos_u1 * sin_alpha1
+            cos_sq_alpha = 1 - (sin_alpha * sin_alpha)
+            u_sq = cos_sq_alpha * ((a * a) - (b * b)) / (b * b)
+            big_a = 1 + (u_sq / 16384) * (4096 + u_sq * (-768 + u_sq * (320 - 175 * u_sq)))
+            big_b = (u_sq / 1024) * (256 + u_sq * (-128 + u_sq * (74 - 47 * u_sq)))
+            sigma = distances / (b * big_a)
+            converged = np.zeros(sigma.shape, dtype=bool)
+            for i in range(200):
+                cos_2sigma_m = np.cos((2 * sigma1) + sigma)
+                sin_sigma = np.sin(sigma)
+                cos_sigma = np.cos(sigma)
+                delta_sigma = big_b * sin_sigma * (cos_2sigma_m + (big_b / 4) * (
+                    cos_sigma * (-1 + 2 * cos_2sigma_m * cos_2sigma_m) -
+                    (big_b / 6) * cos_2sigma_m * (-3 + 4 * sin_sigma * sin_sigma) * (-3 + 4 * cos_2sigma_m * cos_2sigma_m)))
+                sigma_new = (distances / (b * big_a)) + delta_sigma
+                converged = ~(np.abs(sigma_new - sigma) > 1e-12)
+                sigma = sigma_new
+                if np.all(converged):
+                    break
+            valid &= converged
+            cos_2sigma_m = np.cos((2 * sigma1) + sigma)
+            sin_sigma = np.sin(sigma)
+            cos_sigma = np.cos(sigma)
+            tmp = (sin_u1 * sin_sigma) - (cos_u1 * cos_sigma * cos_alpha1)
+            phi2 = np.arctan2((sin_u1 * cos_sigma) + (cos_u1 * sin_sigma * cos_alpha1),
+                              (1 - f) * np.sqrt((sin_alpha * sin_alpha) + (tmp * tmp)))
+            lam = np.arctan2(sin_sigma * sin_alpha1, (cos_u1 * cos_sigma) - (sin_u1 * sin_sigma * cos_alpha1))
+            c = (f / 16) * cos_sq_alpha * (4 + f * (4 - 3 * cos_sq_alpha))
+            lon_delta = lam - (1 - c) * f * sin_alpha * (sigma + c * sin_sigma * (
+                cos_2sigma_m + c * cos_sigma * (-1 + 2 * cos_2sigma_m * cos_2sigma_m)))
+            final = np.arctan2(sin_alpha, -tmp)
+        coords = np.empty((lon1.shape[0], 2), dtype=np.float64)
+        coords[:, 0] = _normalize_longitude(lon1 + np.degrees(lon_delta))
+        coords[:, 1] = np.degrees(phi2)
+        coords[~valid] = np.nan
+        final = np.degrees(final) % 360
+        final[~valid] = np.nan
+        invalid_count = int(valid.size - np.count_nonzero(valid))
+        if invalid_count > 0:
+            ret_dict["messages"].append("calc_geodesic_coords: {0} of {1} rows are invalid".format(invalid_count, valid.size))
+        ret_dict["coords"] = coords
+        ret_dict["bearings"] = final
+        ret_dict["valid"] = valid
+        ret_dict["success"] = True
+    except Exception as e:
+        ret_dict["messages"].append("Error: {0}".format(str(e)))
+        ret_dict["success"] = False
+    finally:
+        return ret_dict
 
 
-def get_ags_token(server, username, password):
+def calc_geodesic_dist(points1, points2, method="vincenty"):
     """
     purpose:
-        get a security token from ArcGIS Server
+        Calculate distances on the WGS84 ellipsoid between longitude/latitude points
+        Row i of points1 is measured to row i of points2.
+        Works on arrays directly, no projection needed.
     arguments:
-        server: string
-            the name of the ArcGIS Server to get the token from
-        username: string
-        password: string
-    return value: string
-        token, None if error
+        points1: array-like of float, shape (N, 2) or (2,)
+            (longitude, latitude) in decimal degrees
+        points2: array-like of float, shape (N, 2) or (2,)
+            (longitude, latitude) in decimal degrees
+            a single point is broadcast against every row of the other array
+        method: string
+            vincenty (default): ellipsoidal, sub-millimeter accuracy
+                nearly antipodal points may not converge, they are marked invalid
+            haversine: spherical, faster, error up to about 0.5%
+    return value: dictionary
+        success: boolean
+        distance: numpy.ndarray of float, shape (N,)
+            distances in meters
+        bearings: numpy.ndarray of float, shape (N,)
+            initial bearings from points1 to points2, degrees clockwise from north
+        valid: numpy.ndarray of bool, shape (N,)
+            False for rows with non-finite input or that did not converge
+        messages: list of string
     """
 
+    ret_dict = {"messages": [], "distance": None, "bearings": None, "valid": None}
     try:
-        url = r"http://{0}:6080/arcgis/tokens/generateToken".format(server)
-        params = {
-            "username": username,
-            "password": password,
-            "f": "json"}
-        result = requests.post(url, params).json()
-        return result.get("token")
-    except Exception:
-        return None
+        if method not in ("vincenty", "haversine"):
+            ret_dict["messages"].append("Error in calc_geodesic_dist: method must be vincenty or haversine")
+            ret_dict["success"] = False
+            return
+        points1 = np.atleast_2d(np.asarray(points1, dtype=np.float64))
+        points2 = np.atleast_2d(np.asarray(points2, dtype=np.float64))
+        lon1, lat1, lon2, lat2 = np.broadcast_arrays(points1[:, 0], points1[:, 1], points2[:, 0], points2[:, 1])
+        valid = np.isfinite(lon1) & np.isfinite(lat1) & np.isfinite(lon2) & np.isfinite(lat2)
+        phi1 = np.radians(lat1)
+        phi2 = np.radians(lat2)
+        lon_delta = np.radians(lon2 - lon1)
+        if method == "haversine":
+            h = (np.sin((phi2 - phi1) / 2) ** 2) + (np.cos(phi1) * np.cos(phi2) * (np.sin(lon_delta / 2) ** 2))
+            distance = 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.clip(h, 0, 1)))
+            bearings = np.arctan2(np.sin(lon_delta) * np.cos(phi2),
+                                  (np.cos(phi1) * np.sin(phi2)) - (np.sin(phi1) * np.cos(phi2) * np.cos(lon_delta)))
+        else:
+            a = WGS84_A
+            f = WGS84_F
+            b = (1 - f) * a
+            u1 = np.arctan((1 - f) * np.tan(phi1))
+            u2 = np.arctan((1 - f) * np.tan(phi2))
+            sin_u1 = np.sin(u1)
+            cos_u1 = np.cos(u1)
+            sin_u2 = np.sin(u2)
+            cos_u2 = np.cos(u2)
+            lam = lon_delta.copy()
+            converged = ~valid
+            # only the rows that haven't converged are iterated
+            active = np.nonzero(valid)[0]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                for i in range(200):
+                    if active.shape[0] == 0:
+                        break
+                    lam_new = _vincenty_lambda(lam[active], lon_delta[active], sin_u1[active], cos_u1[active],
+                                               sin_u2[active], cos_u2[active])[0]
+                    done = np.abs(lam_new - lam[active]) <= 1e-12
+                    lam[active] = lam_new
+                    converged[active[done]] = True
+                    active = active[~done]
+                sin_sigma, cos_sigma, sigma, cos_sq_alpha, cos_2sigma_m = _vincenty_lambda(
+                    lam, lon_delta, sin_u1, cos_u1, sin_u2, cos_u2)[1:]
+            valid &= converged
+            u_sq = cos_sq_alpha * ((a * a) - (b * b)) / (b * b)
+            big_a = 1 + (u_sq / 16384) * (4096 + u_sq * (-768 + u_sq * (320 - 175 * u_sq)))
+            big_b = (u_sq / 1024) * (256 + u_sq * (-128 + u_sq * (74 - 47 * u_sq)))
+            delta_sigma = big_b * sin_sigma * (cos_2sigma_m + (big_b / 4) * (
+                cos_sigma * (-1 + 2 * cos_2sigma_m * cos_2sigma_m) -
+                (big_b / 6) * cos_2sigma_m * (-3 + 4 * sin_sigma * sin_sigma) * (-3 + 4 * cos_2sigma_m * cos_2sigma_m)))
+            distance = b * big_a * (sigma - delta_sigma)
+            bearings = np.arctan2(cos_u2 * np.sin(lam), (cos_u1 * sin_u2) - (sin_u1 * cos_u2 * np.cos(lam)))
+        distance = np.where(valid, distance, np.nan)
+        bearings = np.where(valid, np.degrees(bearings) % 360, np.nan)
+        invalid_count = int(valid.size - np.count_nonzero(valid))
+        if invalid_count > 0:
+            ret_dict["messages"].append("calc_geodesic_dist: {0} of {1} rows are invalid".format(invalid_count, valid.size))
+        ret_dict["distance"] = distance
+        ret_dict["bearings"] = bearings
+        ret_dict["valid"] = valid
+        ret_dict["success"] = True
+    except Exception as e:
+        ret_dict["messages"].append("Error: {0}".format(str(e)))
+        ret_dict["success"] = False
+    finally:
+        return ret_dict
 
 
-def get_domain(gdb, domain_name):
+def create_rectangle(x_cen, y_cen, width, height, angle=0, clockwise=True):
     """
     purpose:
-        get a domain from a geodatabase
+        Create an arcpy.Polygon from the corner coordinates, optionally rotated
+        If arcpy is not installed, a GeometryUtils.Polygon is created instead.
     arguments:
-        gdb: string
-            geodatabase
-        domain_name: string
-            name of the domain to retrieve
-    return value: arcpy.Domain
-        None if error
+        x_cen: number
+            center x coordinate of the rectangle
+        y_cen: number
+            center y coordinate of the rectangle
+        width: number
+            width of the rectangle
+        height: number
+            height of the rectangle
+        angle: number
+            angle between the original point and the new point using the pivot point as the vertex of the angle
+            0-360
+            positive numbers for clockwise
+            negative numbers for counter-clockwise
+        clockwise: boolean
+            if False, the angle is applied counter-clockwise
+    return value: arcpy.Polygon or GeometryUtils.Polygon
+        if error, None
     """
-    ret_val = None
+
     try:
-        for domain in arcpy.da.ListDomains(gdb):
-            if domain.name.lower() == domain_name.lower():
-                ret_val = domain
+        if not clockwise:
+            angle = angle * -1
+        # lower-left
+        coords_ll = rotate_xy(x_cen - (width / float(2)), y_cen - (height / float(2)), x_cen, y_cen, angle)
+        # upper-left
+        coords_ul = rotate_xy(x_cen - (width / float(2)), y_cen + (height / float(2)), x_cen, y_cen, angle)
+        # upper-right
+        coords_ur = rotate_xy(x_cen + (width / float(2)), y_cen + (height / float(2)), x_cen, y_cen, angle)
+        # lower-right
+        coords_lr = rotate_xy(x_cen + (width / float(2)), y_cen - (height / float(2)), x_cen, y_cen, angle)
+        if not ARCPY_AVAILABLE:
+            return GeometryUtils.Polygon([coords_ll, coords_ul, coords_ur, coords_lr])
+        array = arcpy.Array()
+        for coords in (coords_ll, coords_ul, coords_ur, coords_lr):
+            array.add(arcpy.Point(coords[0], coords[1]))
+        return arcpy.Polygon(array)
     except Exception:
         return None
-    finally:
-        return ret_val
 
 
-def get_prior_date(this_date, day_of_week):
+def create_rectangles(x_cens, y_cens, widths, heights, angles=0, clockwise=True):
     """
     purpose:
-        Get the date of a day of the week prior to a given date.
-        If the date provided is on the same day of the week as the requested
-        day, the prior week will be returned.
+        Calculate the corner coordinates of many rectangles, optionally rotated
+        Batch version of create_rectangle that returns coordinates instead of geometry,
+        use rectangles_to_polygons to convert them to arcpy.Polygon.
+        Scalar arguments are broadcast against the array arguments.
     arguments:
-        this_date: datetime.date
-            date prior to which the date will be returned
-        day_of_week: int
-            Monday is 0, Sunday is 6
-    return value: datetime.date
-        the datetime.date of the day_of_week before this_date
-        returns None if error
+        x_cens: array-like of number
+            center x coordinates of the rectangles
+        y_cens: array-like of number
+            center y coordinates of the rectangles
+        widths: array-like of number
+            widths of the rectangles
+        heights: array-like of number
+            heights of the rectangles
+        angles: array-like of number
+            rotation angles about the centers, 0-360
+            positive numbers for clockwise
+            negative numbers for counter-clockwise
+        clockwise: boolean
+            if False, the angles are applied counter-clockwise
+    return value: numpy.ndarray of float, shape (N, 4, 2)
+        lower-left, upper-left, upper-right, lower-right corners of each rectangle
+        None if error
     """
 
     try:
-        if day_of_week not in range(0, 7):
-            raise Exception()
-        this_day = this_date.weekday()
-        if this_day > day_of_week:
-            # if this_day is ahead of the day of week, subtract the number of days it's ahead
-            ret_date = this_date - datetime.timedelta(days=(this_day - day_of_week))
-        else:
-            # if this_day is on or behind the day of week, subtract a week minus the number days it's behind
-            ret_date = this_date - datetime.timedelta(days=(7 - (day_of_week - this_day)))
-        return ret_date
+        x_cens, y_cens, widths, heights, angles = np.broadcast_arrays(
+            *[np.atleast_1d(np.asarray(arg, dtype=np.float64)) for arg in (x_cens, y_cens, widths, heights, angles)])
+        radians = np.radians(angles if clockwise else -angles)
+        cos_a = np.cos(radians)[:, np.newaxis]
+        sin_a = np.sin(radians)[:, np.newaxis]
+        # corner offsets from the center before rotation, ll, ul, ur, lr
+        half_w = (widths / 2.0)[:, np.newaxis] * np.array([-1, -1, 1, 1], dtype=np.float64)
+        half_h = (heights / 2.0)[:, np.newaxis] * np.array([-1, 1, 1, -1], dtype=np.float64)
+        corners = np.empty((x_cens.shape[0], 4, 2), dtype=np.float64)
+        corners[:, :, 0] = x_cens[:, np.newaxis] + (half_w * cos_a) + (half_h * sin_a)
+        corners[:, :, 1] = y_cens[:, np.newaxis] - (half_w * sin_a) + (half_h * cos_a)
+        return corners
     except Exception:
         return None
 
 
-def get_station(point, lines):
+def export_table_to_csv(input_table, output_file, field_names=["*"], include_header=True, batch_size=10000,
+                        buffer_size=1048576, resume=False, checkpoint_field=None, report_seconds=None,
+                        run_method="script"):
     """
     purpose:
-        gets the station of an arcpy.Point to the closest line
-        in a list of arcpy.Polyline
-        uses the measure of the point along the line
+        Export a feature class or table to a csv file
+        Rows are written in batches to a temporary file next to the output_file.
+        The temporary file is renamed to output_file only after every row is written,
+        so a failed export never leaves a partial output_file behind.
+        Without resume, the temporary file of a failed export is removed.
+        With resume, a checkpoint is saved after each batch so a failed export can be resumed.
     arguments:
-        point: arcpy.Point
-        lines: list of arcpy.Polyline
-    return value: string
-        formatted station string if successful
-        None if error
+        input_table: string or row source
+            full path to a feature class, layer, table, or table view
+            or an ArcpyRowSource, IterableRowSource, SqliteRowSource, or GeometryUtils.Table
+        output_file: string
+            full path to the csv file to create
+            WARNING: if the output_file exists it will be overwritten
+        field_names: list of string
+            list of field names to include in the csv file
+            specify individual field names or use ["*"] for all fields
+        include_header: boolean
+            whether or not to include the header row in the output_file
+        batch_size: int
+            number of rows written with each writerows call
+            with resume, a checkpoint is saved after each batch
+        buffer_size: int
+            size in bytes of the file write buffer
+        resume: boolean
+            if True and a checkpoint from a failed export of the same fields exists,
+            continue from the checkpoint instead of starting over
+            and save checkpoints as this export runs
+        checkpoint_field: string
+            optional field, like the OID, that increases with every row
+            rows are read sorted on this field and a resumed export restarts after
+            the last value written instead of re-reading and skipping the written rows
+            rows with a null value are read again at the end and the ones already written skipped
+            if only null values were written the export starts over instead
+            must be one of the field_names
+        report_seconds: number
+            if specified, report the rows written and rows per second at this interval
+        run_method: string or MessageSink
+            script (default), tool, or a MessageSink
+            how progress is reported, see add_message
+    return value: dictionary
+        success: boolean
+        rows: int
+            number of data rows in the output_file
+        rows_per_second: float
+            rate of this run, resumed rows are not counted
+        last_value: varies
+            last non-null value of the checkpoint_field written
+            None if no checkpoint_field was specified or every value was null
+        max_value: varies
+            highest non-null value of the checkpoint_field written
+            None if no checkpoint_field was specified or every value was null
+        messages: list of string
+            only error messages will be returned.
+            This will be empty if successful
     """
 
+    ret_dict = {"messages": [], "rows": 0, "rows_per_second": 0.0, "last_value": None, "max_value": None}
+    temp_file = None
     try:
-        # get the closest line to the point
-        closest_line = None
-        try:
-            min_distance = None
-            for line in lines:
-                dist = line.distanceTo(point)
-                if min_distance is None or dist < min_distance:
-                    min_distance = dist
-                    closest_line = line
-        except Exception:
-            return None
-        # get the station of the closest line
-        if closest_line is not None:
-            # get the measure of the point on the closest line
-            measure = closest_line.measureOnLine(point)
-            # get the formatted station
-            station_txt = format_station(measure)
-            return station_txt
+        row_source = get_row_source(input_table)
+        field_names = get_field_names(row_source, field_names)
+        checkpoint_position = None
+        if checkpoint_field is not None:
+            lower_names = [name.lower() for name in field_names]
+            if checkpoint_field.lower() not in lower_names:
+                ret_dict["messages"].append("Error in export_table_to_csv: checkpoint_field must be one of the field_names")
+                ret_dict["success"] = False
+                return
+            checkpoint_position = lower_names.index(checkpoint_field.lower())
+        temp_file = "{0}.part".format(output_file)
+        checkpoint_file = "{0}.checkpoint".format(output_file)
+        # read the checkpoint of a previous failed export
+        checkpoint = None
+        if resume is True and os.path.isfile(temp_file) and os.path.isfile(checkpoint_file):
+            with open(checkpoint_file, "r") as f:
+                checkpoint = json.load(f)
+            if checkpoint.get("field_names") != field_names or checkpoint.get("checkpoint_field") != checkpoint_field:
+                checkpoint = None
+            elif checkpoint_field is not None and checkpoint.get("last_value") is None:
+                # only nulls written so far, nothing to filter on, resuming would append the whole table again
+                checkpoint = None
+        if checkpoint is not None:
+            # drop anything written after the last checkpoint
+            with open(temp_file, "r+b") as f:
+                f.truncate(checkpoint["offset"])
+            rows_written = checkpoint["rows"]
+            last_value = _decode_value(checkpoint.get("last_value"))
+            max_value = _decode_value(checkpoint.get("max_value"))
+            null_rows = checkpoint.get("null_rows", 0)
+            if checkpoint_field is not None:
+                # the filter drops null values, so the null rows not written yet are read after the others,
+                # wherever the source sorts them
+                null_tail = (row for row in row_source.rows(field_names) if row[checkpoint_position] is None)
+                rows = itertools.chain(row_source.rows(field_names, checkpoint_field, last_value),
+                                       itertools.islice(null_tail, null_rows, None))
+            else:
+                rows = itertools.islice(row_source.rows(field_names), rows_written, None)
+            mode = "a"
         else:
-            return None
-    except Exception:
-        return None
+            rows_written = 0
+            last_value = None
+            max_value = None
+            null_rows = 0
+            rows = row_source.rows(field_names, checkpoint_field)
+            mode = "w"
+            # an old checkpoint doesn't match the new temporary file
+            if os.path.isfile(checkpoint_file):
+                os.remove(checkpoint_file)
+        start_rows = rows_written
+        start_time = time.time()
+        report_time = start_time
+        with open(temp_file, mode, newline="", buffering=buffer_size) as csvfile:
+            csvwriter = csv.writer(csvfile)
+            # write the header row
+            if include_header is True and mode == "w":
+                csvwriter.writerow(field_names)
+            # write the data
+            while True:
+                batch = list(itertools.islice(rows, batch_size))
+                if len(batch) == 0:
+                    break
+                csvwriter.writerows(batch)
+                rows_written += len(batch)
+                if checkpoint_position is not None:
+                    for row in batch:
+                        if row[checkpoint_position] is None:
+                            null_rows += 1
+                        else:
+                            last_value = row[checkpoint_position]
+                    max_value = _max_value(batch, checkpoint_position, max_value)
+                if resume is True:
+                    # save a checkpoint of everything written so far
+                    csvfile.flush()
+                    _write_json_file(checkpoint_file, {
+                        "field_names": field_names,
+                        "checkpoint_field": checkpoint_field,
+                        "rows": rows_written,
+                        "last_value": _encode_value(last_value),
+                        "max_value": _encode_value(max_value),
+                        "null_rows": null_rows,
+                        "offset": csvfile.tell()
+                    })
+                if report_seconds is not None and time.time() - report_time >= report_seconds:
+                    report_time = time.time()
+                    add_message("export_table_to_csv: {0} rows, {1:.0f} rows per second".format(
+                        rows_written, (rows_written - start_rows) / max(report_time - start_time, 1e-9)), "message", run_method)
+        # move the finished file into place
+        os.replace(temp_file, output_file)
+        if os.path.isfile(checkpoint_file):
+            os.remove(checkpoint_file)
+        ret_dict["rows"] = rows_written
+        ret_dict["last_value"] = last_value
+        ret_dict["max_value"] = max_value
+        ret_dict["rows_per_second"] = (rows_written - start_rows) / max(time.time() - start_time, 1e-9)
+        ret_dict["success"] = True
+    except Exception as e:
+        ret_dict["messages"].append(str(e))
+        ret_dict["success"] = False
+        # the partial file is only kept for a resume
+        if resume is not True and temp_file is not None and os.path.isfile(temp_file):
+            os.remove(temp_file)
+    finally:
+        return ret_dict
 
 
-def rotate_xy(x_orig, y_orig, x_pivot=0, y_pivot=0, angle=0):
+def export_table_to_csv_incremental(input_table, output_file, watermark_field, field_names=["*"],
+                                    include_header=True, delta_file=None, state_file=None, full_rebuild=False):
     """
     purpose:
-        Rotate an xy coordinate around a specified origin
+        Export only the rows added or edited since the last export
+        The highest value of watermark_field that has been exported (the watermark)
+        is kept in a small json state file. Each run exports the rows with a higher value.
+        The first run, or a run with full_rebuild=True, exports the whole table
+        with export_table_to_csv and starts a new watermark.
+        The watermark field should be an edit date or an increasing id like the OID.
+        Rows are compared with >, so rows saved later with a value equal to the
+        watermark are not picked up. Rows with a null watermark are only exported by full rebuilds.
+        If a full export finds no non-null watermark value, no state is saved and the next run
+        is a full rebuild too.
     arguments:
-        x_orig: number
-            x coordinate of original point
-        y_orig: number
-            y coordinate of original point
-        x_pivot: number
-            x coordinate of pivot point
-        y_pivot: number
-            y coordinate of pivot point
-        angle: number
-            angle between the original point and the new point using the pivot point as the vertex of the angle
-            0-360
-            positive numbers for clockwise
-            negative numbers for counter-clockwise
-    return value: tuple
-        x_rotated, y_rotated
-        if error: None, None
+        input_table: string or row source
+            full path to a feature class, layer, table, or table view
+            or an ArcpyRowSource, IterableRowSource, or SqliteRowSource
+        output_file: string
+            full path to the csv file holding the full export
+            new rows are appended to it unless delta_file is specified
+        watermark_field: string
+            field used to find new rows, must be one of the field_names
+        field_names: list of string
+            list of field names to include in the csv file
+            specify individual field names or use ["*"] for all fields
+        include_header: boolean
+            whether or not to include the header row in new csv files
+        delta_file: string
+            optional full path to a csv file to receive only this run's new rows
+            WARNING: if the delta_file exists it will be overwritten
+            output_file is left as is when a delta_file is used
+        state_file: string
+            full path to the json file holding the watermark
+            default is <output_file>.watermark.json
+        full_rebuild: boolean
+            if True, ignore the state file and export the whole table to output_file
+    return value: dictionary
+        success: boolean
+        full_rebuild: boolean
+            True if the whole table was exported
+        rows: int
+            number of rows exported by this run
+        watermark: varies
+            the watermark after this run
+        messages: list of string
     """
 
+    ret_dict = {"messages": [], "full_rebuild": False, "rows": 0, "watermark": None}
     try:
-        x_orig_delta = x_orig - x_pivot
-        y_orig_delta = y_orig - y_pivot
-        angle = angle * -1
-        # convert angle to radians
-        angle = math.radians(angle)
-        # get the deltas from the center point to the rotated point
-        x_rot_delta = (x_orig_delta * math.cos(angle)) - (y_orig_delta * math.sin(angle))
-        y_rot_delta = (x_orig_delta * math.sin(angle)) + (y_orig_delta * math.cos(angle))
-        # get the rotated point coords
-        x_rot = x_pivot + x_rot_delta
-        y_rot = y_pivot + y_rot_delta
-        # return a tuple of rotated coords
-        return x_rot, y_rot
-    except Exception:
-        return None, None
+        row_source = get_row_source(input_table)
+        field_names = get_field_names(row_source, field_names)
+        lower_names = [name.lower() for name in field_names]
+        if watermark_field.lower() not in lower_names:
+            ret_dict["messages"].append("Error in export_table_to_csv_incremental: watermark_field must be one of the field_names")
+            ret_dict["success"] = False
+            return
+        watermark_position = lower_names.index(watermark_field.lower())
+        if state_file is None:
+            state_file = "{0}.watermark.json".format(output_file)
+        # read the watermark of the last run
+        state = None
+        if full_rebuild is False and os.path.isfile(state_file):
+            with open(state_file, "r") as f:
+                state = json.load(f)
+            # field names are case insensitive, watermark_Field and WATERMARK_FIELD are the same field
+            if (state.get("watermark_field", "").upper() != watermark_field.upper()
+                    or state.get("field_names") != field_names):
+                state = None
+            elif delta_file is None and not os.path.isfile(output_file):
+                state = None
+        if state is None:
+            # full export
+            result = export_table_to_csv(row_source, output_file, field_names, include_header, checkpoint_field=watermark_field)
+            ret_dict["messages"].extend(result["messages"])
+            if result["success"] is False:
+                ret_dict["success"] = False
+                return
+            ret_dict["full_rebuild"] = True
+            ret_dict["rows"] = result["rows"]
+            watermark = result["max_value"]
+        else:
+            watermark = _decode_value(state["watermark"])
+            rows = row_source.rows(field_names, watermark_field, watermark)
+            if delta_file is not None:
+                result = export_table_to_csv(IterableRowSource(rows, field_names), delta_file, field_names,
+                                             include_header, checkpoint_field=watermark_field)
+                ret_dict["messages"].extend(result["messages"])
+                if result["success"] is False:
+                    ret_dict["success"] = False
+                    return
+                ret_dict["rows"] = result["rows"]
+                watermark = _max_value([(result["max_value"],)], 0, watermark)
+            else:
+                # append the new rows, cutting the file back to its original size if anything fails
+                original_size = os.path.getsize(output_file)
+                try:
+                    with open(output_file, "a", newline="", buffering=1048576) as csvfile:
+                        csvwriter = csv.writer(csvfile)
+                        while True:
+                            batch = list(itertools.islice(rows, 10000))
+                            if len(batch) == 0:
+                                break
+                            csvwriter.writerows(batch)
+                            ret_dict["rows"] += len(batch)
+                            watermark = _max_value(batch, watermark_position, watermark)
+                except Exception:
+                    with open(output_file, "r+b") as f:
+                        f.truncate(original_size)
+                    raise
+        if watermark is None:
+            # nothing to filter on, a saved None would make the next run append the whole table again
+            if os.path.isfile(state_file):
+                os.remove(state_file)
+            ret_dict["success"] = True
+            return
+        # only move the watermark after the rows are safely written
+        _write_json_file(state_file, {
+            "watermark_field": watermark_field.upper(),
+            "field_names": field_names,
+            "watermark": _encode_value(watermark),
+            "updated": datetime.datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
+        })
+        ret_dict["watermark"] = watermark
+        ret_dict["success"] = True
+    except Exception as e:
+        ret_dict["messages"].append(str(e))
+        ret_dict["success"] = False
+    finally:
+        return ret_dict
+
+
+def export_table_to_geojson(input_table, output_file, field_names=["*"], geometry_field="SHAPE@",
+                            output_format="ndjson", precision=None, compress=None, batch_size=10000):
+    """
+    purpose:
+        Export a feature class or table with its geometry to GeoJSON
+        Features are streamed to the file as they are read, so memory use does not
+        depend on the size of the table.
+        The file is written to a temporary file next to the output_file and
+        renamed when complete, like export_table_to_csv. The temporary file of a failed
+        export is removed.
+    arguments:
+        input_table: string or row source
+            full path to a feature class, layer, table, or table view
+            or an ArcpyRowSource, IterableRowSource, or SqliteRowSource
+        output_file: string
+            full path to the file to create
+            WARNING: if the output_file exists it will be overwritten
+        field_names: list of string
+            list of field names to write as feature properties
+            specify individual field names or use ["*"] for all fields
+            the geometry field and the arcpy geometry fields (SHAPE, SHAPE@...) are not written as properties
+        geometry_field: string
+            field holding the geometry
+            SHAPE@ (default) or SHAPE@XY for arcpy tables
+            values can be objects with __geo_interface__ (arcpy geometry, GeometryUtils.Polyline),
+            GeoJSON geometry dictionaries or strings, (x, y) tuples, or None
+        output_format: string
+            ndjson (default): one GeoJSON Feature per line
+            featurecollection: a single GeoJSON FeatureCollection
+        precision: int
+            optional number of decimal places to round coordinates to
+        compress: boolean
+            if True, gzip the output as it is written
+            None (default) compresses if output_file ends with .gz
+        batch_size: int
+            number of features written at a time
+    return value: dictionary
+        success: boolean
+        features: int
+            number of features written
+        messages: list of string
+    """
+
+    ret_dict = {"messages": [], "features": 0}
+    try:
+        if output_format not in ("ndjson", "featurecollection"):
+            ret_dict["messages"].append("Error in export_table_to_geojson: output_format must be ndjson or featurecollection")
+            ret_dict["success"] = False
+            return
+        row_source = get_row_source(input_table)
+        field_names = [name for name in get_field_names(row_source, field_names)
+                       if name.lower() != geometry_field.lower() and not name.upper().startswith("SHAPE@")
+                       and name.upper() != "SHAPE"]
+        if compress is None:
+            compress = output_file.lower().endswith(".gz")
+        temp_file = "{0}.part".format(output_file)
+        encoder = json.JSONEncoder(default=_json_default, separators=(",", ":"))
+        separator = "\n" if output_format == "ndjson" else ",\n"
+        if compress:
+            out_file = gzip.open(temp_file, "wt", encoding="utf-8", newline="\n")
+        else:
+            out_file = open(temp_file, "w", encoding="utf-8", newline="\n", buffering=1048576)
+        try:
+            rows = row_source.rows(field_names + [geometry_field])
+            if output_format == "featurecollection":
+                out_file.write('{"type":"FeatureCollection","features":[\n')
+            first = True
+            while True:
+                batch = list(itertools.islice(rows, batch_size))
+                if len(batch) == 0:
+                    break
+                features = []
+                for row in batch:
+                    features.append(encoder.encode({
+                        "type": "Feature",
+                        "geometry": _geojson_geometry(row[-1], precision),
+                        "properties": dict(zip(field_names, row[:-1]))
+                    }))
+                if output_format == "featurecollection" and not first:
+                    out_file.write(separator)
+                out_file.write(separator.join(features))
+                if output_format == "ndjson":
+                    out_file.write("\n")
+                first = False
+                ret_dict["features"] += len(batch)
+            if output_format == "featurecollection":
+                out_file.write("\n]}\n")
+            out_file.close()
+            os.replace(temp_file, output_file)
+        except Exception:
+            # don't leave the handle open or the partial file behind
+            out_file.close()
+            if os.path.isfile(temp_file):
+                os.remove(temp_file)
+            raise
+        ret_dict["success"] = True
+    except Exception as e:
+        ret_dict["messages"].append(str(e))
+        ret_dict["success"] = False
+    finally:
+        return ret_dict
+
+
+def export_table_to_numpy(input_table, output_path, field_names=["*"], output_format="npy", batch_size=100000):
+    """
+    purpose:
+        Export a feature class or table to typed numpy columns, one array per field
+        so downstream tools can load columns without parsing text.
+        A schema.json sidecar records the rows, field names, dtypes, and column files.
+        Rows are read in batches and spooled to disk, memory use is bounded by batch_size.
+        Column types are taken from the values:
+            integers -> int64 (float64 if there are nulls)
+            floats -> float64, nulls are NaN
+            datetimes -> datetime64[us], nulls are NaT
+            strings -> fixed width unicode, nulls are ""
+            tuples like SHAPE@XY -> 2D float64 arrays, nulls are NaN
+        The export fails if a field mixes types, like numbers and strings, or tuples of different lengths.
+    arguments:
+        input_table: string or row source
+            full path to a feature class, layer, table, or table view
+            or an ArcpyRowSource, IterableRowSource, or SqliteRowSource
+        output_path: string
+            npy: folder to create with a .npy file per field and schema.json
+                the columns can be memory-mapped with read_numpy_columns
+            npz: .npz file to create, the schema is written next to it as <output_path>.schema.json
+                npz members are read into memory, they can not be memory-mapped
+            WARNING: if the output_path exists it will be overwritten
+        field_names: list of string
+            list of field names to export
+            specify individual field names or use ["*"] for all fields
+        output_format: string
+            npy (default), npz
+        batch_size: int
+            number of rows read at a time
+    return value: dictionary
+        success: boolean
+        rows: int
+        schema: dictionary
+            the contents of the schema sidecar
+        messages: list of string
+    """
+
+    ret_dict = {"messages": [], "rows": 0, "schema": None}
+    spool_folder = None
+    try:
+        if output_format not in ("npy", "npz"):
+            ret_dict["messages"].append("Error in export_table_to_numpy: output_format must be npy or npz")
+            ret_dict["success"] = False
+            return
+        row_source = get_row_source(input_table)
+        field_names = get_field_names(row_source, field_names)
+        # spool each column's batches to its own file so only one batch is in memory
+        spool_folder = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(output_path)))
+        spool_files = [open(os.path.join(spool_folder, "{0}.spool".format(i)), "w+b") for i in range(len(field_names))]
+        # per column: (row count, spooled) for every batch, batches with only nulls are not spooled
+        column_batches = [[] for i in range(len(field_names))]
+        dtypes = [None] * len(field_names)
+        widths = [()] * len(field_names)
+        has_nulls = [False] * len(field_names)
+        row_count = 0
+        rows = row_source.rows(field_names)
+        try:
+            while True:
+                batch = list(itertools.islice(rows, batch_size))
+                if len(batch) == 0:
+                    break
+                row_count += len(batch)
+                for i, values in enumerate(zip(*batch)):
+                    array, nulls = _column_array(values)
+                    has_nulls[i] = has_nulls[i] or nulls
+                    if array is None:
+                        column_batches[i].append((len(values), False))
+                        continue
+                    if dtypes[i] is None:
+                        dtypes[i] = array.dtype
+                        widths[i] = array.shape[1:]
+                    else:
+                        if array.shape[1:] != widths[i]:
+                            raise ValueError("field {0} has values of width {1} and {2}".format(
+                                field_names[i], list(widths[i]), list(array.shape[1:])))
+                        kinds = set((dtypes[i].kind, array.dtype.kind))
+                        # a batch of integers or booleans with nulls is float, anything else can't be mixed
+                        if len(kinds) > 1 and not kinds <= set(("b", "i", "f")):
+                            raise ValueError("field {0} has values of type {1} and {2}".format(
+                                field_names[i], dtypes[i], array.dtype))
+                        dtypes[i] = np.result_type(dtypes[i], array.dtype)
+                    np.save(spool_files[i], array, allow_pickle=False)
+                    column_batches[i].append((len(values), True))
+            # build the schema
+            fields = []
+            used_names = set()
+            for i, name in enumerate(field_names):
+                dtype = dtypes[i] if dtypes[i] is not None else np.dtype(np.float64)
+                if has_nulls[i] and dtype.kind in ("i", "u", "b"):
+                    # integers and booleans can't hold nulls
+                    dtype = np.dtype(np.float64)
+                fields.append({
+                    "name": name,
+                    "dtype": dtype.str,
+                    "shape": [row_count] + list(widths[i]),
+                    "file": _column_file_name(name, used_names)
+                })
+            schema = {"format": output_format, "rows": row_count, "fields": fields}
+            # write the columns to a temporary location and move them into place when complete
+            temp_path = "{0}.part".format(output_path)
+            try:
+                if output_format == "npy":
+                    if os.path.isdir(temp_path):
+                        shutil.rmtree(temp_path)
+                    os.makedirs(temp_path)
+                    for i, field in enumerate(fields):
+                        with open(os.path.join(temp_path, field["file"]), "wb") as f:
+                            _write_spooled_column(f, spool_files[i], column_batches[i], field)
+                    _write_json_file(os.path.join(temp_path, "schema.json"), schema)
+                    if os.path.isdir(output_path):
+                        shutil.rmtree(output_path)
+                    os.replace(temp_path, output_path)
+                else:
+                    with zipfile.ZipFile(temp_path, "w", compression=zipfile.ZIP_STORED, allowZip64=True) as npz_file:
+                        for i, field in enumerate(fields):
+                            with npz_file.open(field["file"], "w", force_zip64=True) as f:
+                                _write_spooled_column(f, spool_files[i], column_batches[i], field)
+                    os.replace(temp_path, output_path)
+                    _write_json_file("{0}.schema.json".format(output_path), schema)
+            except Exception:
+                # don't leave a half written export behind
+                if os.path.isdir(temp_path):
+                    shutil.rmtree(temp_path, ignore_errors=True)
+                elif os.path.isfile(temp_path):
+                    os.remove(temp_path)
+                raise
+        finally:
+            for spool_file in spool_files:
+                spool_file.close()
+        ret_dict["rows"] = row_count
+        ret_dict["schema"] = schema
+        ret_dict["success"] = True
+    except Exception as e:
+        ret_dict["messages"].append(str(e))
+        ret_dict["success"] = False
+    finally:
+        if spool_folder is not None and os.path.isdir(spool_folder):
+            shutil.rmtree(spool_folder, ignore_errors=True)
+        return ret_dict
+
+
+def export_tables_to_csv(jobs, processes=None, include_header=True, run_method=None):
+    """
+    purpose:
+        Export many feature classes or tables to csv files in parallel
+        Each job runs export_table_to_csv on a bounded process pool.
+        A failing job does not stop the others, including a job that can't be sent
+        to a worker process (row sources must be picklable) or whose worker dies.
+    arguments:
+        jobs: list of tuple
+            (input_table, output_file) or (input_table, output_file, field_names)
+            see export_table_to_csv for the values
+            field_names defaults to ["*"]
+        processes: int
+            maximum number of worker processes
+            None uses the number of CPUs, 1 runs the jobs one at a time in this process
+        include_header: boolean
+            whether or not to include the header row in the output files
+        run_method: string or MessageSink
+            script, tool, a MessageSink, or None (default)
+            if specified, a message is sent with add_message as each job finishes
+    return value: dictionary
+        success: boolean
+            True only if every job succeeded
+        results: list of dictionary, in the same order as jobs
+            input_table: string
+            output_file: string
+            success: boolean
+            rows: int
+            seconds: float
+            messages: list of string
+        messages: list of string
+            error messages of the failed jobs, prefixed with the input table
+            (or the output file if the input is a row source)
+    """
+
+    ret_dict = {"messages": [], "results": []}
+    try:
+        job_args = []
+        for job in jobs:
+            field_names = job[2] if len(job) > 2 else ["*"]
+            job_args.append((job[0], job[1], field_names, include_header))
+        results = [None] * len(job_args)
+
+        def finish(i, result):
+            results[i] = result
+            if run_method is not None:
+                add_message("{0}: {1} rows in {2:.1f} seconds".format(
+                    _job_label(result), result["rows"], result["seconds"]),
+                    "message" if result["success"] else "error", run_method)
+
+        if processes == 1 or len(job_args) <= 1:
+            for i, result in map(_export_table_job, enumerate(job_args)):
+                finish(i, result)
+        else:
+            broken = []
+            with concurrent.futures.ProcessPoolExecutor(min(processes or multiprocessing.cpu_count(), len(job_args))) as executor:
+                futures = {executor.submit(_export_table_job, indexed_job): indexed_job[0]
+                           for indexed_job in enumerate(job_args)}
+                # collect the jobs as they finish so progress can be reported
+                for future in concurrent.futures.as_completed(futures):
+                    try:
+                        finish(*future.result())
+                    except concurrent.futures.process.BrokenProcessPool:
+                        broken.append(futures[future])
+                    except Exception as e:
+                        # the job couldn't be sent to a worker, e.g. it can't be pickled
+                        finish(futures[future], _failed_job_result(job_args[futures[future]], e))
+            # a dead worker fails every unfinished job of the pool, run those again
+            # one at a time in their own worker so only the job that kills its worker fails
+            for i in sorted(broken):
+                with concurrent.futures.ProcessPoolExecutor(1) as executor:
+                    try:
+                        finish(*executor.submit(_export_table_job, (i, job_args[i])).result())
+                    except Exception as e:
+                        finish(i, _failed_job_result(job_args[i], e))
+        for result in results:
+            for message in result["messages"]:
+                ret_dict["messages"].append("{0}: {1}".format(_job_label(result), message))
+        ret_dict["results"] = results
+        ret_dict["success"] = all(result["success"] for result in results)
+    except Exception as e:
+        ret_dict["messages"].append(str(e))
+        ret_dict["success"] = False
+    finally:
+        return ret_dict
+
+
+def field_exists(feature_class, field_name, use_cache=False):
+    """
+    purpose:
+        determine if a field exists in a feature class
+    arguments:
+        feature_class: string or row source
+            gdb feature class, or e.g. a GeometryUtils.Table
+        field_name: string
+        use_cache: boolean
+            if True, look the field up in SCHEMA_CACHE instead of listing the fields every call
+            the cache only sees schema changes once the dataset's modification time is checked again,
+            see SchemaCache, so leave it off when the schema may have just changed
+    return value: boolean
+        True if the field exists
+        False if it does not exist or if there is an error
+    """
+    try:
+        if hasattr(feature_class, "list_fields"):
+            return field_name.lower() in [name.lower() for name in feature_class.list_fields()]
+        if use_cache is True:
+            return SCHEMA_CACHE.field_exists(feature_class, field_name)
+        return field_name.lower() in [fld.name.lower() for fld in arcpy.ListFields(feature_class, field_name)]
+    except Exception:
+        return False
+
+
+def format_station(station):
+    """
+    purpose:
+        format a measure as a station value with hundreds offset
+        0+00 notation
+    arguments:
+        station: number
+            station measurement
+    return value: string
+        measurement formatted as 0+00
+        None if error
+    """
+
+    try:
+        if TypeUtils.is_numeric(station):
+            station_str = str(station)
+            if station < 100 and station >= 10:
+                return "0+{0}".format(station_str)
+            elif station < 10:
+                return "0+0{0}".format(station_str)
+            else:
+                if "." in station_str:
+                    return "{0}+{1}.{2}".format(
+                        station_str.split(".")[0][:-2],
+                        station_str.split(".")[0][-2:],
+                        station_str.split(".")[1]
+                    )
+                else:
+                    return "{0}+{1}".format(
+                        station_str.split(".")[0][:-2],
+                        station_str.split(".")[0][-2:]
+                    )
+        else:
+            return None
+    except Exception:
+        return None
+
+
+def format_stations(measures, precision=2):
+    """
+    purpose:
+        format many measures as station values with hundreds offset in one pass
+        Batch version of format_station that always writes the same number of decimals.
+        The measures are rounded to integers of 10 ** -precision units and the
+        digits are split out with integer arithmetic, no per-measure string handling.
+    arguments:
+        measures: array-like of number
+            station measurements
+        precision: int
+            number of decimal places, 0 for whole units
+    return value: numpy.ndarray of string
+        measurements formatted as 0+00.00
+        NaN measures are ""
+        None if error
+    """
+
+    try:
+        precision = int(precision)
+        measures = np.asarray(measures, dtype=np.float64).ravel()
+        valid = np.isfinite(measures)
+        scaled = np.rint(np.where(valid, measures, 0) * (10 ** precision))
+        if np.any(np.abs(scaled) >= 1e18):
+            raise ValueError("measures are too large for the precision")
+        negative = scaled < 0
+        magnitude = np.abs(scaled).astype(np.int64)
+        n_digits = max(len(str(int(magnitude.max()))) if magnitude.size > 0 else 1, precision + 3)
+        n_hundreds = n_digits - precision - 2
+        # character columns: sign, hundreds digits, +, 2 unit digits, optional . and decimals
+        width = n_digits + 2 + (1 if precision > 0 else 0)
+        chars = np.full((magnitude.shape[0], width), ord(" "), dtype=np.uint8)
+        # hundreds digits are blank until the first non-zero digit, the last one is always shown
+        shown = np.zeros(magnitude.shape[0], dtype=bool)
+        sign_column = np.full(magnitude.shape[0], n_hundreds - 1, dtype=np.int64)
+        column = 1
+        for i in range(n_digits):
+            if i == n_hundreds:
+                chars[:, column] = ord("+")
+                column += 1
+            elif i == n_hundreds + 2:
+                chars[:, column] = ord(".")
+                column += 1
+            digit = ((magnitude // (10 ** (n_digits - 1 - i))) % 10).astype(np.uint8)
+            if i < n_hundreds - 1:
+                first_digit = ~shown & (digit != 0)
+                sign_column[first_digit] = i
+                shown |= first_digit
+                chars[:, column] = np.where(shown, digit + ord("0"), ord(" "))
+            else:
+                chars[:, column] = digit + ord("0")
+            column += 1
+        chars[negative, sign_column[negative]] = ord("-")
+        stations = np.char.lstrip(chars.view("S{0}".format(width)).ravel().astype(np.str_))
+        return np.where(valid, stations, "")
+    except Exception:
+        return None
+
+
+def get_agol_token(username, password, use_cache=True):
+    """
+    purpose:
+        get a security token from ArcGIS Online
+    arguments:
+        username: string
+        password: string
+        use_cache: boolean
+            if True, reuse an unexpired token from TOKEN_CACHE
+    return value: string
+        token, None if error
+    """
+
+    try:
+        url = "https://www.arcgis.com/sharing/rest/generateToken"
+        if use_cache is True:
+            return TOKEN_CACHE.get_token(url, username, password, {"referer": "something"})
+        params = {
+            "username": username,
+            "password": password,
+            "referer": "something",
+            "f": "json"}
+        result = get_session().post(url, params).json()
+        return result.get("token")
+    except Exception:
+        return None
+
+
+def get_ags_token(server, username, password, use_cache=True):
+    """
+    purpose:
+        get a security token from ArcGIS Server
+    arguments:
+        server: string
+            the name of the ArcGIS Server to get the token from
+        username: string
+        password: string
+        use_cache: boolean
+            if True, reuse an unexpired token from TOKEN_CACHE
+    return value: string
+        token, None if error
+    """
+
+    try:
+        url = r"http://{0}:6080/arcgis/tokens/generateToken".format(server)
+        if use_cache is True:
+            return TOKEN_CACHE.get_token(url, username, password)
+        params = {
+            "username": username,
+            "password": password,
+            "f": "json"}
+        result = get_session().post(url, params).json()
+        return result.get("token")
+    except Exception:
+        return None
+
+
+def get_domain(gdb, domain_name, use_cache=False):
+    """
+    purpose:
+        get a domain from a geodatabase
+    arguments:
+        gdb: string
+            geodatabase
+        domain_name: string
+            name of the domain to retrieve
+        use_cache: boolean
+            if True, look the domain up in SCHEMA_CACHE instead of listing the domains every call
+            see field_exists
+    return value: arcpy.Domain
+        None if error
+    """
+    ret_val = None
+    try:
+        if use_cache is True:
+            ret_val = SCHEMA_CACHE.get_domain(gdb, domain_name)
+        else:
+            for domain in arcpy.da.ListDomains(gdb):
+                if domain.name.lower() == domain_name.lower():
+                    ret_val = domain
+                    break
+    except Exception:
+        return None
+    finally:
+        return ret_val
+
+
+def get_field_names(input_table, field_names=["*"]):
+    """
+    purpose:
+        expand ["*"] into all of the field names of a table
+    arguments:
+        input_table: string or row source
+            full path to a feature class, layer, table, or table view
+            or an ArcpyRowSource, IterableRowSource, or SqliteRowSource
+        field_names: list of string
+            individual field names or ["*"] for all fields
+    return value: list of string
+    """
+
+    if len(field_names) == 1 and field_names[0] == "*":
+        return list(get_row_source(input_table).list_fields())
+    return list(field_names)
+
+
+def get_prior_date(this_date, day_of_week):
+    """
+    purpose:
+        Get the date of a day of the week prior to a given date.
+        If the date provided is on the same day of the week as the requested
+        day, the prior week will be returned.
+    arguments:
+        this_date: datetime.date
+            date prior to which the date will be returned
+        day_of_week: int
+            Monday is 0, Sunday is 6
+    return value: datetime.date
+        the datetime.date of the day_of_week before this_date
+        returns None if error
+    """
+
+    try:
+        if day_of_week not in range(0, 7):
+            raise Exception()
+        this_day = this_date.weekday()
+        if this_day > day_of_week:
+            # if this_day is ahead of the day of week, subtract the number of days it's ahead
+            ret_date = this_date - datetime.timedelta(days=(this_day - day_of_week))
+        else:
+            # if this_day is on or behind the day of week, subtract a week minus the number days it's behind
+            ret_date = this_date - datetime.timedelta(days=(7 - (day_of_week - this_day)))
+        return ret_date
+    except Exception:
+        return None
+
+
+def get_prior_dates(dates, day_of_week):
+    """
+    purpose:
+        Get the date of a day of the week prior to each of many dates in one pass.
+        Batch version of get_prior_date with the same rule:
+        if a date is on the same day of the week as the requested day,
+        the prior week will be returned.
+    arguments:
+        dates: numpy.ndarray of datetime64 or list of datetime.date
+            dates prior to which the dates will be returned
+            times of day are kept, like get_prior_date does for datetime.datetime
+        day_of_week: int
+            Monday is 0, Sunday is 6
+    return value: numpy.ndarray of datetime64
+        the dates of the day_of_week before each date, in the unit of the input
+        NaT for NaT input
+        returns None if error
+    """
+
+    try:
+        if day_of_week not in range(0, 7):
+            raise Exception()
+        dates = np.asarray(dates)
+        if dates.dtype.kind != "M":
+            # lets numpy pick the unit, days for dates and microseconds for datetimes
+            dates = np.array(dates.tolist(), dtype="datetime64")
+        # 1970-01-01 was a Thursday, weekday 3
+        this_day = (dates.astype("datetime64[D]").astype(np.int64) + 3) % 7
+        # days back: this_day - day_of_week if ahead, otherwise a week minus the days behind
+        days_back = ((this_day - day_of_week - 1) % 7) + 1
+        return dates - days_back.astype("timedelta64[D]")
+    except Exception:
+        return None
+
+
+def get_row_source(input_table):
+    """
+    purpose:
+        get a row source for a table
+        Row sources have list_fields() and rows(field_names, after_field, after_value) methods
+        so the exports can read from arcpy, sqlite, or plain python rows.
+    arguments:
+        input_table: string or row source
+            full path to a feature class, layer, table, or table view
+            or an object that already is a row source, e.g. a GeometryUtils.Table
+    return value: row source
+    """
+
+    if hasattr(input_table, "rows") and hasattr(input_table, "list_fields"):
+        return input_table
+    return ArcpyRowSource(input_table)
+
+
+def get_session():
+    """
+    purpose:
+        get the shared requests.Session
+        Connections are kept alive and pooled, so repeated REST calls to the
+        same server don't open a new connection every time.
+    arguments: none
+    return value: requests.Session
+    """
+
+    global _SESSION
+    with _SESSION_LOCK:
+        if _SESSION is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=10, pool_maxsize=20)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _SESSION = session
+        return _SESSION
+
+
+def get_station(point, lines):
+    """
+    purpose:
+        gets the station of an arcpy.Point to the closest line
+        in a list of arcpy.Polyline
+        uses the measure of the point along the line
+    arguments:
+        point: arcpy.Point or GeometryUtils.Point
+        lines: list of arcpy.Polyline or GeometryUtils.Polyline, or a GeometryUtils.LineIndex
+            build a GeometryUtils.LineIndex once when stationing many points
+            against the same lines to avoid measuring every line for every point
+    return value: string
+        formatted station string if successful
+        None if error
+    """
+
+    try:
+        # use the spatial index if one was provided
+        if isinstance(lines, GeometryUtils.LineIndex):
+            measure = lines.nearest(point)[2]
+            return format_station(measure)
+        # get the closest line to the point
+        closest_line = None
+        try:
+            min_distance = None
+            for line in lines:
+                dist = line.distanceTo(point)
+                if min_distance is None or dist < min_distance:
+                    min_distance = dist
+                    closest_line = line
+        except Exception:
+            return None
+        # get the station of the closest line
+        if closest_line is not None:
+            # get the measure of the point on the closest line
+            measure = closest_line.measureOnLine(point)
+            # get the formatted station
+            station_txt = format_station(measure)
+            return station_txt
+        else:
+            return None
+    except Exception:
+        return None
+
+
+def get_stations(points, lines, processes=None, chunk_size=10000):
+    """
+    purpose:
+        gets the stations of many points to the closest line in a list of lines
+        Batch version of get_station.
+        The points are split into chunks and stationed on a process pool.
+        Each worker builds a GeometryUtils.LineIndex of the lines once.
+    arguments:
+        points: array-like of float, shape (N, 2), or list of arcpy.Point
+        lines: list of arcpy.Polyline or GeometryUtils.Polyline
+        processes: int
+            number of worker processes
+            None uses the number of CPUs, 1 runs in this process without a pool
+        chunk_size: int
+            number of points sent to a worker at a time
+    return value: dictionary
+        success: boolean
+        stations: list of string
+            formatted station of each point, in the same order as points
+        measures: numpy.ndarray of float
+            measure of each point on its closest line
+        line_ids: numpy.ndarray of int
+            position in lines of the closest line to each point
+        messages: list of string
+    """
+
+    ret_dict = {"messages": [], "stations": [], "measures": None, "line_ids": None}
+    try:
+        xy = np.array([GeometryUtils.point_xy(point) for point in points], dtype=np.float64).reshape(-1, 2)
+        # convert to picklable pure python geometry once, workers only rebuild the index
+        polylines = [line if isinstance(line, GeometryUtils.Polyline) else GeometryUtils.Polyline.from_arcpy(line) for line in lines]
+        chunks = [xy[start:start + chunk_size] for start in range(0, xy.shape[0], chunk_size)]
+        if processes == 1 or len(chunks) <= 1:
+            # pass the index directly so it isn't left behind in _STATION_INDEX
+            line_index = GeometryUtils.LineIndex(polylines)
+            results = [_station_chunk(chunk, line_index) for chunk in chunks]
+        else:
+            with multiprocessing.Pool(processes, _init_station_worker, (polylines,)) as pool:
+                # map returns the chunk results in input order
+                results = pool.map(_station_chunk, chunks)
+        if len(results) > 0:
+            ret_dict["line_ids"] = np.concatenate([result[0] for result in results])
+            ret_dict["measures"] = np.concatenate([result[1] for result in results])
+        else:
+            ret_dict["line_ids"] = np.empty(0, dtype=np.int64)
+            ret_dict["measures"] = np.empty(0)
+        ret_dict["stations"] = [format_station(measure) for measure in ret_dict["measures"].tolist()]
+        ret_dict["success"] = True
+    except Exception as e:
+        ret_dict["messages"].append(str(e))
+        ret_dict["success"] = False
+    finally:
+        return ret_dict
+
+
+def parse_station(station):
+    """
+    purpose:
+        convert a station value in 0+00 notation back to a measure
+    arguments:
+        station: string
+            station value like 12+34.5
+    return value: float
+        None if error
+    """
+
+    try:
+        hundreds, units = station.strip().split("+")
+        if hundreds.startswith("-"):
+            return -((float(hundreds[1:]) * 100) + float(units))
+        return (float(hundreds) * 100) + float(units)
+    except Exception:
+        return None
+
+
+def parse_stations(stations):
+    """
+    purpose:
+        convert many station values in 0+00 notation back to measures
+        Batch version of parse_station.
+    arguments:
+        stations: array-like of string
+            station values like 12+34.50
+    return value: numpy.ndarray of float
+        NaN for values that can't be parsed
+        None if error
+    """
+
+    try:
+        stations = np.asarray(stations, dtype=np.str_)
+        try:
+            # fast path, removing the + from well formed stations leaves plain numbers
+            measures = np.char.replace(np.char.strip(stations), "+", "").astype(np.float64)
+            if np.all(np.char.count(stations, "+") == 1):
+                return measures
+        except ValueError:
+            pass
+        # slow path for arrays with blank or malformed values
+        measures = [parse_station(station) for station in stations.tolist()]
+        return np.array([np.nan if measure is None else measure for measure in measures], dtype=np.float64)
+    except Exception:
+        return None
+
+
+def read_numpy_columns(input_path, mmap_mode="r"):
+    """
+    purpose:
+        Read the columns written by export_table_to_numpy
+    arguments:
+        input_path: string
+            folder of .npy files or .npz file created by export_table_to_numpy
+        mmap_mode: string
+            numpy memory-map mode for .npy folders, r (default), r+, c
+            None reads the columns into memory
+            ignored for .npz files
+    return value: dictionary
+        success: boolean
+        columns: dictionary
+            field name: numpy.ndarray (numpy.memmap for memory-mapped columns)
+        schema: dictionary
+            the contents of the schema sidecar
+        messages: list of string
+    """
+
+    ret_dict = {"messages": [], "columns": {}, "schema": None}
+    try:
+        if os.path.isdir(input_path):
+            with open(os.path.join(input_path, "schema.json"), "r") as f:
+                schema = json.load(f)
+            for field in schema["fields"]:
+                ret_dict["columns"][field["name"]] = np.load(
+                    os.path.join(input_path, field["file"]), mmap_mode=mmap_mode, allow_pickle=False)
+        else:
+            with open("{0}.schema.json".format(input_path), "r") as f:
+                schema = json.load(f)
+            # the arrays are read out of the file inside the with block, so the file is closed after
+            with np.load(input_path, allow_pickle=False) as npz_file:
+                for field in schema["fields"]:
+                    ret_dict["columns"][field["name"]] = npz_file[os.path.splitext(field["file"])[0]]
+        ret_dict["schema"] = schema
+        ret_dict["success"] = True
+    except Exception as e:
+        ret_dict["messages"].append(str(e))
+        ret_dict["success"] = False
+    finally:
+        return ret_dict
+
+
+def rectangles_to_polygons(corners, spatial_reference=None):
+    """
+    purpose:
+        Convert corner coordinates from create_rectangles to arcpy.Polygon
+        If arcpy is not installed, GeometryUtils.Polygon are created instead.
+    arguments:
+        corners: numpy.ndarray of float, shape (N, 4, 2)
+        spatial_reference: arcpy.SpatialReference
+            optional spatial reference of the polygons
+    return value: list of arcpy.Polygon or GeometryUtils.Polygon
+        None if error
+    """
+
+    try:
+        if not ARCPY_AVAILABLE:
+            return [GeometryUtils.Polygon(rectangle, spatial_reference) for rectangle in np.asarray(corners, dtype=np.float64)]
+        polygons = []
+        for rectangle in np.asarray(corners).tolist():
+            array = arcpy.Array([arcpy.Point(x, y) for x, y in rectangle])
+            polygons.append(arcpy.Polygon(array, spatial_reference))
+        return polygons
+    except Exception:
+        return None
+
+
+def rotate_xy(x_orig, y_orig, x_pivot=0, y_pivot=0, angle=0):
+    """
+    purpose:
+        Rotate an xy coordinate around a specified origin
+    arguments:
+        x_orig: number
+            x coordinate of original point
+        y_orig: number
+            y coordinate of original point
+        x_pivot: number
+            x coordinate of pivot point
+        y_pivot: number
+            y coordinate of pivot point
+        angle: number
+            angle between the original point and the new point using the pivot point as the vertex of the angle
+            0-360
+            positive numbers for clockwise
+            negative numbers for counter-clockwise
+    return value: tuple
+        x_rotated, y_rotated
+        if error: None, None
+    """
+
+    try:
+        return rotate_xy_fast(x_orig, y_orig, x_pivot, y_pivot, angle)
+    except Exception:
+        return None, None
+
+
+def rotate_xy_fast(x_orig, y_orig, x_pivot=0, y_pivot=0, angle=0):
+    """
+    purpose:
+        Fast path of rotate_xy for tight loops
+        Raises exceptions instead of returning None, None.
+    arguments:
+        see rotate_xy
+    return value: tuple
+        x_rotated, y_rotated
+    """
+
+    x_orig_delta = x_orig - x_pivot
+    y_orig_delta = y_orig - y_pivot
+    # clockwise is positive, so rotate by the negative angle
+    radians = math.radians(angle * -1)
+    cos_a = math.cos(radians)
+    sin_a = math.sin(radians)
+    return (x_pivot + ((x_orig_delta * cos_a) - (y_orig_delta * sin_a)),
+            y_pivot + ((x_orig_delta * sin_a) + (y_orig_delta * cos_a)))
+
+
+def transform_coords(coords, matrix):
+    """
+    purpose:
+        Apply an affine matrix from affine_matrix to many xy coordinates at once
+    arguments:
+        coords: array-like of float, shape (N, 2)
+            x, y coordinates, extra columns like z are passed through unchanged
+        matrix: array-like of float, shape (3, 3)
+    return value: numpy.ndarray of float, shape (N, 2) or the shape of coords
+        None if error
+    """
+
+    try:
+        coords = np.array(coords, dtype=np.float64, ndmin=2)
+        matrix = np.asarray(matrix, dtype=np.float64)
+        x = coords[:, 0].copy()
+        y = coords[:, 1]
+        coords[:, 0] = (matrix[0, 0] * x) + (matrix[0, 1] * y) + matrix[0, 2]
+        coords[:, 1] = (matrix[1, 0] * x) + (matrix[1, 1] * y) + matrix[1, 2]
+        return coords
+    except Exception:
+        return None
+
+
+def _column_array(values):
+    """
+    purpose:
+        convert the values of one field in a batch of rows to a typed numpy array
+        see export_table_to_numpy for the type rules
+    arguments:
+        values: sequence
+            the field's values, may contain None
+    return value: tuple
+        (numpy.ndarray, has_nulls)
+        the array is None if every value is None
+    """
+
+    non_null = [value for value in values if value is not None]
+    has_nulls = len(non_null) < len(values)
+    if len(non_null) == 0:
+        return None, has_nulls
+    if all(isinstance(value, bool) for value in non_null) and not has_nulls:
+        return np.array(values, dtype=np.bool_), has_nulls
+    if all(isinstance(value, numbers.Integral) for value in non_null) and not has_nulls:
+        return np.array(values, dtype=np.int64), has_nulls
+    if all(isinstance(value, numbers.Real) for value in non_null):
+        return np.array([np.nan if value is None else value for value in values], dtype=np.float64), has_nulls
+    if all(isinstance(value, (datetime.date, datetime.datetime)) for value in non_null):
+        return np.array([np.datetime64("NaT") if value is None else value for value in values], dtype="datetime64[us]"), has_nulls
+    if all(isinstance(value, (tuple, list)) for value in non_null):
+        null_value = [np.nan] * len(non_null[0])
+        return np.array([null_value if value is None else value for value in values], dtype=np.float64), has_nulls
+    return np.array(["" if value is None else str(value) for value in values], dtype=np.str_), has_nulls
+
+
+def _column_file_name(field_name, used_names):
+    """
+    purpose:
+        get a unique, file system safe .npy file name for a field
+    arguments:
+        field_name: string
+        used_names: set of string
+            lower case names already taken, the new name is added to it
+    return value: string
+    """
+
+    root = re.sub(r"[^0-9A-Za-z_]", "_", field_name)
+    file_name = root
+    suffix = 1
+    while file_name.lower() in used_names:
+        file_name = "{0}_{1}".format(root, suffix)
+        suffix += 1
+    used_names.add(file_name.lower())
+    return "{0}.npy".format(file_name)
+
+
+def _decode_value(value):
+    """
+    purpose:
+        restore a value saved with _encode_value
+    arguments:
+        value: varies
+    return value: varies
+    """
+
+    if isinstance(value, dict) and "datetime" in value:
+        return datetime.datetime.strptime(value["datetime"], "%Y-%m-%dT%H:%M:%S.%f")
+    return value
+
+
+def _encode_value(value):
+    """
+    purpose:
+        make a checkpoint or watermark value json serializable
+    arguments:
+        value: varies
+    return value: varies
+    """
+
+    if isinstance(value, datetime.datetime):
+        return {"datetime": value.strftime("%Y-%m-%dT%H:%M:%S.%f")}
+    return value
+
+
+def _export_table_job(indexed_job):
+    """
+    purpose:
+        export_tables_to_csv worker function
+        run one export and time it
+    arguments:
+        indexed_job: tuple
+            (job position, (input_table, output_file, field_names, include_header))
+    return value: tuple
+        (job position, result dictionary)
+    """
+
+    i, (input_table, output_file, field_names, include_header) = indexed_job
+    start = time.time()
+    result = export_table_to_csv(input_table, output_file, field_names, include_header)
+    return i, {
+        "input_table": input_table,
+        "output_file": output_file,
+        "success": result["success"],
+        "rows": result.get("rows", 0),
+        "seconds": time.time() - start,
+        "messages": result["messages"]
+    }
+
+
+def _failed_job_result(job_args, error):
+    """
+    purpose:
+        export_tables_to_csv result of a job that didn't run
+    arguments:
+        job_args: tuple
+            (input_table, output_file, field_names, include_header)
+        error: Exception
+    return value: dictionary
+        see export_tables_to_csv
+    """
+
+    return {
+        "input_table": job_args[0],
+        "output_file": job_args[1],
+        "success": False,
+        "rows": 0,
+        "seconds": 0.0,
+        "messages": [str(error) or type(error).__name__]
+    }
+
+
+def _geojson_geometry(value, precision=None):
+    """
+    purpose:
+        convert a geometry value to a GeoJSON geometry dictionary
+    arguments:
+        value: varies
+            object with __geo_interface__, GeoJSON dictionary or string, (x, y) tuple, or None
+        precision: int
+            optional number of decimal places to round coordinates to
+    return value: dictionary
+        None for null geometry
+    """
+
+    if value is None:
+        return None
+    if hasattr(value, "__geo_interface__"):
+        geometry = value.__geo_interface__
+    elif isinstance(value, dict):
+        geometry = value
+    elif isinstance(value, str):
+        geometry = json.loads(value)
+    elif isinstance(value, (tuple, list)):
+        if value[0] is None:
+            return None
+        geometry = {"type": "Point", "coordinates": list(value)}
+    else:
+        raise TypeError("unsupported geometry value: {0}".format(type(value).__name__))
+    if precision is not None and geometry.get("coordinates") is not None:
+        geometry = dict(geometry)
+        geometry["coordinates"] = _round_coords(geometry["coordinates"], precision)
+    return geometry
+
+
+def _init_station_worker(polylines):
+    """
+    purpose:
+        get_stations worker initializer
+        builds the line index once per worker process
+    arguments:
+        polylines: list of GeometryUtils.Polyline
+    return value: none
+    """
+
+    global _STATION_INDEX
+    _STATION_INDEX = GeometryUtils.LineIndex(polylines)
+
+
+def _job_label(result):
+    """
+    purpose:
+        name of an export job for messages
+    arguments:
+        result: dictionary
+            export_tables_to_csv job result
+    return value: string
+        the input table path, or the output file if the input is a row source
+    """
+
+    return result["input_table"] if isinstance(result["input_table"], str) else result["output_file"]
+
+
+def _json_default(value):
+    """
+    purpose:
+        json encoder fallback for field values json can't write
+    arguments:
+        value: varies
+    return value: json serializable value
+    """
+
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return None
+    return str(value)
+
+
+def _max_value(rows, position, current=None):
+    """
+    purpose:
+        get the highest non-null value at a position in a list of rows
+    arguments:
+        rows: list of tuple
+        position: int
+        current: varies
+            highest value so far, None if there isn't one
+    return value: varies
+        None if current is None and every value is null
+    """
+
+    values = [row[position] for row in rows if row[position] is not None]
+    if current is not None:
+        values.append(current)
+    return max(values) if values else None
+
+
+def _normalize_longitude(longitudes):
+    """
+    purpose:
+        wrap longitudes into the range -180 to 180
+    arguments:
+        longitudes: numpy.ndarray of float
+    return value: numpy.ndarray of float
+    """
+
+    return ((longitudes + 180) % 360) - 180
+
+
+def _round_coords(coords, precision):
+    """
+    purpose:
+        round nested GeoJSON coordinate lists
+    arguments:
+        coords: list
+            a position or nested lists of positions
+        precision: int
+            number of decimal places
+    return value: list
+    """
+
+    if len(coords) > 0 and isinstance(coords[0], (int, float)):
+        return [round(c, precision) for c in coords]
+    return [_round_coords(c, precision) for c in coords]
+
+
+def _schema_mtime(path):
+    """
+    purpose:
+        get a modification time for a dataset or geodatabase path
+        Datasets inside a geodatabase aren't files, so the nearest existing
+        parent is used. For folders like a file geodatabase, the newest
+        modification time of the folder's files is used.
+    arguments:
+        path: string
+    return value: float
+        None if no part of the path exists
+    """
+
+    while path and not os.path.exists(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            return None
+        path = parent
+    if not path:
+        return None
+    if os.path.isdir(path):
+        return max([os.path.getmtime(path)] + [entry.stat().st_mtime for entry in os.scandir(path) if entry.is_file()])
+    return os.path.getmtime(path)
+
+
+def _send_message(message, message_type, run_method):
+    """
+    purpose:
+        send a message right away, see add_message
+        tool messages are printed if arcpy is not installed
+    arguments:
+        message: string
+        message_type: string
+            message, warning, error
+        run_method: string
+            script, tool
+    return value: none
+    """
+
+    if run_method == "script" or (run_method == "tool" and not ARCPY_AVAILABLE):
+        print("{0}: {1}".format(message_type, message))
+    elif run_method == "tool":
+        if message_type == "message":
+            arcpy.AddMessage(message)
+        elif message_type == "warning":
+            arcpy.AddWarning(message)
+        elif message_type == "error":
+            arcpy.AddError(message)
+
+
+def _sql_identifier(name):
+    """
+    purpose:
+        quote a sqlite table or field name
+    arguments:
+        name: string
+    return value: string
+    """
+
+    return '"{0}"'.format(name.replace('"', '""'))
+
+
+def _sql_literal(value):
+    """
+    purpose:
+        format a value for an arcpy where clause
+    arguments:
+        value: number, string, or datetime.datetime
+    return value: string
+    """
+
+    if isinstance(value, datetime.datetime):
+        return "date '{0}'".format(value.strftime("%Y-%m-%d %H:%M:%S"))
+    if isinstance(value, str):
+        return "'{0}'".format(value.replace("'", "''"))
+    return str(value)
+
+
+def _station_chunk(xy, line_index=None):
+    """
+    purpose:
+        get_stations worker function
+        find the closest line and measure for a chunk of points
+    arguments:
+        xy: numpy.ndarray of float, shape (N, 2)
+        line_index: GeometryUtils.LineIndex
+            None uses the worker's _STATION_INDEX
+    return value: tuple of numpy.ndarray
+        (line_ids, measures)
+    """
+
+    if line_index is None:
+        line_index = _STATION_INDEX
+    line_ids, distances, measures = line_index.nearest_many(xy)
+    return line_ids, measures
+
+
+def _vincenty_lambda(lam, lon_delta, sin_u1, cos_u1, sin_u2, cos_u2):
+    """
+    purpose:
+        one iteration of the Vincenty inverse formula
+    arguments:
+        lam: numpy.ndarray of float
+            current longitude difference on the auxiliary sphere
+        lon_delta: numpy.ndarray of float
+            longitude difference of the points
+        sin_u1, cos_u1, sin_u2, cos_u2: numpy.ndarray of float
+            reduced latitude terms of the points
+    return value: tuple of numpy.ndarray
+        (new lam, sin_sigma, cos_sigma, sigma, cos_sq_alpha, cos_2sigma_m)
+    """
+
+    f = WGS84_F
+    sin_lam = np.sin(lam)
+    cos_lam = np.cos(lam)
+    sin_sigma = np.sqrt(((cos_u2 * sin_lam) ** 2) + (((cos_u1 * sin_u2) - (sin_u1 * cos_u2 * cos_lam)) ** 2))
+    cos_sigma = (sin_u1 * sin_u2) + (cos_u1 * cos_u2 * cos_lam)
+    sigma = np.arctan2(sin_sigma, cos_sigma)
+    # coincident points have sin_sigma == 0
+    sin_alpha = np.where(sin_sigma == 0, 0.0, cos_u1 * cos_u2 * sin_lam / sin_sigma)
+    cos_sq_alpha = 1 - (sin_alpha * sin_alpha)
+    # equatorial lines have cos_sq_alpha == 0
+    cos_2sigma_m = np.where(cos_sq_alpha == 0, 0.0, cos_sigma - (2 * sin_u1 * sin_u2 / cos_sq_alpha))
+    c = (f / 16) * cos_sq_alpha * (4 + f * (4 - 3 * cos_sq_alpha))
+    lam_new = lon_delta + (1 - c) * f * sin_alpha * (sigma + c * sin_sigma * (
+        cos_2sigma_m + c * cos_sigma * (-1 + 2 * cos_2sigma_m * cos_2sigma_m)))
+    return lam_new, sin_sigma, cos_sigma, sigma, cos_sq_alpha, cos_2sigma_m
+
+
+def _write_json_file(file_path, data):
+    """
+    purpose:
+        write a small json file by replacing it, so readers never see a partial file
+    arguments:
+        file_path: string
+        data: json serializable object
+    return value: none
+    """
+
+    temp_file = "{0}.tmp".format(file_path)
+    with open(temp_file, "w") as f:
+        json.dump(data, f)
+    os.replace(temp_file, file_path)
+
+
+def _write_spooled_column(out_file, spool_file, column_batches, field):
+    """
+    purpose:
+        write a column spooled by export_table_to_numpy as a .npy array
+        the header is written first, then the batches are converted and streamed after it
+    arguments:
+        out_file: file object
+            open binary file or zip member to write the .npy data to
+        spool_file: file object
+            spool file holding the batches saved with numpy.save
+        column_batches: list of tuple
+            (row count, spooled) for each batch
+        field: dictionary
+            the field's entry in the schema
+    return value: none
+    """
+
+    dtype = np.dtype(field["dtype"])
+    width = tuple(field["shape"][1:])
+    np.lib.format.write_array_header_1_0(out_file, {
+        "descr": np.lib.format.dtype_to_descr(dtype),
+        "fortran_order": False,
+        "shape": tuple(field["shape"])
+    })
+    if dtype.kind == "M":
+        null_value = np.datetime64("NaT")
+    elif dtype.kind == "U":
+        null_value = ""
+    else:
+        null_value = np.nan
+    spool_file.seek(0)
+    for count, spooled in column_batches:
+        if spooled:
+            array = np.load(spool_file, allow_pickle=False).astype(dtype, copy=False)
+        else:
+            array = np.full((count,) + width, null_value, dtype=dtype)
+        out_file.write(np.ascontiguousarray(array).tobytes())
 
 
 if __name__ == '__main__':
@@ -0,0 +1,1047 @@
+"""
+Name:           GeometryUtils
+
+Purpose:        Pure python/numpy geometry that does not require arcpy
+                Array-backed points, polylines, and polygons, a grid index for nearest
+                line queries, a k-d tree for point radius and nearest neighbor queries,
+                and an in-memory table with arcpy style cursors.
+                GISUtils uses these when arcpy is not installed.
+
+Dependencies:   numpy, ConfigUtils
+
+Version:        3.6
+
+Author:         ted.chapin
+
+Created:        10/18/2026
+"""
+
+
+import ConfigUtils
+import math
+import operator
+
+# numpy is imported the first time it is used
+np = ConfigUtils.lazy_import("numpy")
+
+
+CONFIG = ConfigUtils.get_config()
+
+
+def main():
+    pass
+
+    return
+
+
+class PointIndex(object):
+    """
+    purpose:
+        k-d tree over 2D or 3D points for radius and k nearest neighbor queries
+        Built once from a coordinate array. Queries are batched: every query point
+        walks the tree together, so the distance math runs on numpy blocks
+        instead of one python call per pair of points.
+    arguments:
+        points: array-like of float, shape (N, 2) or (N, 3)
+        leaf_size: int
+            maximum number of points in a leaf node
+    """
+
+    def __init__(self, points, leaf_size=32):
+        points = np.ascontiguousarray(points, dtype=np.float64)
+        if points.ndim != 2 or points.shape[1] not in (2, 3) or points.shape[0] == 0:
+            raise ValueError("PointIndex requires an (N, 2) or (N, 3) array of points")
+        self.leaf_size = int(leaf_size)
+        order = np.arange(points.shape[0])
+        starts = []
+        ends = []
+        lefts = []
+        rights = []
+        split_dims = []
+        split_values = []
+        mins = []
+        maxs = []
+        # build the nodes breadth first, node 0 is the root
+        queue = [(0, points.shape[0])]
+        while len(queue) > len(starts):
+            start, end = queue[len(starts)]
+            node_points = points[order[start:end]]
+            node_min = node_points.min(axis=0)
+            node_max = node_points.max(axis=0)
+            starts.append(start)
+            ends.append(end)
+            mins.append(node_min)
+            maxs.append(node_max)
+            if end - start <= self.leaf_size:
+                lefts.append(-1)
+                rights.append(-1)
+                split_dims.append(0)
+                split_values.append(0.0)
+                continue
+            # split the widest dimension at the median
+            dim = int(np.argmax(node_max - node_min))
+            mid = (start + end) // 2
+            ids = order[start:end]
+            order[start:end] = ids[np.argpartition(points[ids, dim], mid - start)]
+            split_dims.append(dim)
+            split_values.append(float(points[order[mid], dim]))
+            lefts.append(len(queue))
+            queue.append((start, mid))
+            rights.append(len(queue))
+            queue.append((mid, end))
+        self.order = order
+        self.points = points[order]
+        self.starts = np.array(starts, dtype=np.int64)
+        self.ends = np.array(ends, dtype=np.int64)
+        self.lefts = np.array(lefts, dtype=np.int64)
+        self.rights = np.array(rights, dtype=np.int64)
+        self.split_dims = np.array(split_dims, dtype=np.int64)
+        self.split_values = np.array(split_values, dtype=np.float64)
+        self.mins = np.array(mins, dtype=np.float64)
+        self.maxs = np.array(maxs, dtype=np.float64)
+
+    @classmethod
+    def load(cls, file_path):
+        """
+        purpose:
+            load an index saved with save
+        arguments:
+            file_path: string
+                .npz file, the extension is added if it is missing like save does
+        return value: PointIndex
+        """
+
+        index = cls.__new__(cls)
+        with np.load(_npz_path(file_path), allow_pickle=False) as data:
+            for name in ("order", "points", "starts", "ends", "lefts", "rights", "split_dims", "split_values", "mins", "maxs"):
+                setattr(index, name, data[name])
+            index.leaf_size = int(data["leaf_size"])
+        return index
+
+    def query_knn(self, points, k=1):
+        """
+        purpose:
+            find the k nearest indexed points to each query point
+        arguments:
+            points: array-like of float, shape (M, 2) or (M, 3), or a single point
+            k: int
+                number of neighbors, at most the number of indexed points
+        return value: tuple of numpy.ndarray, each shape (M, k)
+            (distances, indices)
+            indices are rows of the array the index was built from, nearest first
+            query points with nan or infinite coordinates get nan distances and -1 indices
+        """
+
+        queries = self._queries(points)
+        n_points = self.points.shape[0]
+        if not 1 <= k <= n_points:
+            raise ValueError("k must be between 1 and the number of indexed points")
+        finite = np.isfinite(queries).all(axis=1)
+        if not finite.all():
+            # non-finite queries match nothing in the search, which would break the k per query reshape
+            distances = np.full((queries.shape[0], k), np.nan)
+            indices = np.full((queries.shape[0], k), -1, dtype=np.int64)
+            if finite.any():
+                distances[finite], indices[finite] = self.query_knn(queries[finite], k)
+            return distances, indices
+        # descend to the smallest node around each query that still holds k points,
+        # the k-th distance inside it bounds the search radius
+        nodes = np.zeros(queries.shape[0], dtype=np.int64)
+        while True:
+            is_branch = self.lefts[nodes] >= 0
+            go_left = queries[np.arange(queries.shape[0]), self.split_dims[nodes]] <= self.split_values[nodes]
+            children = np.where(go_left, self.lefts[nodes], self.rights[nodes])
+            step = is_branch & ((self.ends[children] - self.starts[children]) >= k)
+            if not np.any(step):
+                break
+            nodes = np.where(step, children, nodes)
+        radii = np.empty(queries.shape[0], dtype=np.float64)
+        for node in np.unique(nodes):
+            members = np.nonzero(nodes == node)[0]
+            block = _sq_distances(queries[members], self.points[self.starts[node]:self.ends[node]])
+            radii[members] = np.partition(block, k - 1, axis=1)[:, k - 1]
+        query_ids, point_ids, sq_distances = self._search(queries, radii)
+        # sort the candidates by query then distance, and keep the first k of each query
+        order = np.lexsort((point_ids, sq_distances, query_ids))
+        query_ids = query_ids[order]
+        counts = np.bincount(query_ids, minlength=queries.shape[0])
+        first = np.cumsum(counts) - counts
+        rank = np.arange(query_ids.shape[0]) - first[query_ids]
+        keep = order[rank < k]
+        distances = np.sqrt(sq_distances[keep]).reshape(queries.shape[0], k)
+        indices = self.order[point_ids[keep]].reshape(queries.shape[0], k)
+        return distances, indices
+
+    def query_radius(self, points, radius, return_distance=False):
+        """
+        purpose:
+            find the indexed points within a radius of each query point
+        arguments:
+            points: array-like of float, shape (M, 2) or (M, 3), or a single point
+            radius: number or array-like of number, shape (M,)
+                search radius, one for all queries or one per query
+            return_distance: boolean
+                if True, also return the distances
+        return value: list of numpy.ndarray of int
+            for each query, the rows of the array the index was built from, nearest first
+            empty for query points with nan or infinite coordinates
+            if return_distance, a tuple (indices, distances) of lists
+        """
+
+        queries = self._queries(points)
+        radii = np.broadcast_to(np.asarray(radius, dtype=np.float64), (queries.shape[0],))
+        radii = radii * radii
+        query_ids, point_ids, sq_distances = self._search(queries, radii)
+        order = np.lexsort((point_ids, sq_distances, query_ids))
+        splits = np.cumsum(np.bincount(query_ids, minlength=queries.shape[0]))[:-1]
+        indices = np.split(self.order[point_ids[order]], splits)
+        if return_distance:
+            return indices, np.split(np.sqrt(sq_distances[order]), splits)
+        return indices
+
+    def save(self, file_path):
+        """
+        purpose:
+            save the index so it can be reused without rebuilding
+        arguments:
+            file_path: string
+                .npz file to create, the extension is added if it is missing
+        return value: none
+        """
+
+        np.savez(_npz_path(file_path), order=self.order, points=self.points, starts=self.starts, ends=self.ends,
+                 lefts=self.lefts, rights=self.rights, split_dims=self.split_dims, split_values=self.split_values,
+                 mins=self.mins, maxs=self.maxs, leaf_size=self.leaf_size)
+
+    def _queries(self, points):
+        """
+        purpose:
+            validate query points
+        arguments:
+            points: array-like of float
+        return value: numpy.ndarray of float, shape (M, dimensions)
+        """
+
+        queries = np.atleast_2d(np.asarray(points, dtype=np.float64))
+        if queries.shape[1] != self.points.shape[1]:
+            raise ValueError("query points must have {0} coordinates".format(self.points.shape[1]))
+        return queries
+
+    def _search(self, queries, sq_radii):
+        """
+        purpose:
+            walk the tree with all the queries at once and collect the points within each query's radius
+        arguments:
+            queries: numpy.ndarray of float, shape (M, dimensions)
+            sq_radii: numpy.ndarray of float, shape (M,)
+                squared search radius of each query
+        return value: tuple of numpy.ndarray
+            (query ids, point positions in self.points, squared distances) of every match
+        """
+
+        found_queries = []
+        found_points = []
+        found_distances = []
+        stack = [(0, np.arange(queries.shape[0]))]
+        while stack:
+            node, query_ids = stack.pop()
+            # squared distance from each query to the node's bounding box
+            q = queries[query_ids]
+            gap = np.maximum(self.mins[node] - q, 0) + np.maximum(q - self.maxs[node], 0)
+            query_ids = query_ids[np.einsum("ij,ij->i", gap, gap) <= sq_radii[query_ids]]
+            if query_ids.shape[0] == 0:
+                continue
+            if self.lefts[node] >= 0:
+                stack.append((self.lefts[node], query_ids))
+                stack.append((self.rights[node], query_ids))
+                continue
+            block = _sq_distances(queries[query_ids], self.points[self.starts[node]:self.ends[node]])
+            rows, cols = np.nonzero(block <= sq_radii[query_ids][:, np.newaxis])
+            found_queries.append(query_ids[rows])
+            found_points.append(cols + self.starts[node])
+            found_distances.append(block[rows, cols])
+        if len(found_queries) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        return np.concatenate(found_queries), np.concatenate(found_points), np.concatenate(found_distances)
+
+
+class Polyline(object):
+    """
+    purpose:
+        Array-backed polyline that can stand in for an arcpy.Polyline
+        when measuring points against lines.
+        Each part is stored as consecutive segments, measures run continuously
+        from the start of the first part to the end of the last part.
+    arguments:
+        parts: list of sequences of (x, y)
+            the vertices of each part
+            a single sequence of (x, y) is treated as a one part line
+    """
+
+    __slots__ = ("segments", "measures", "lengths", "length", "extent", "part_starts")
+
+    def __init__(self, parts):
+        parts = list(parts)
+        if len(parts) > 0 and len(parts[0]) > 0 and np.ndim(parts[0][0]) == 0:
+            parts = [parts]
+        starts = []
+        ends = []
+        part_starts = []
+        segment_count = 0
+        for part in parts:
+            vertices = np.asarray(part, dtype=np.float64)[:, :2]
+            if vertices.shape[0] < 2:
+                continue
+            starts.append(vertices[:-1])
+            ends.append(vertices[1:])
+            part_starts.append(segment_count)
+            segment_count += vertices.shape[0] - 1
+        if len(starts) == 0:
+            raise ValueError("Polyline requires at least one part with 2 vertices")
+        # index of the first segment of each part
+        self.part_starts = np.array(part_starts, dtype=np.int64)
+        # segments columns are x0, y0, x1, y1
+        self.segments = np.hstack((np.vstack(starts), np.vstack(ends)))
+        self.lengths = np.hypot(self.segments[:, 2] - self.segments[:, 0], self.segments[:, 3] - self.segments[:, 1])
+        # measure at the start of every segment
+        self.measures = np.concatenate(([0.0], np.cumsum(self.lengths)[:-1]))
+        self.length = float(np.sum(self.lengths))
+        xs = self.segments[:, [0, 2]]
+        ys = self.segments[:, [1, 3]]
+        self.extent = (float(xs.min()), float(ys.min()), float(xs.max()), float(ys.max()))
+
+    @classmethod
+    def from_arcpy(cls, polyline):
+        """
+        purpose:
+            build a Polyline from an arcpy.Polyline
+        arguments:
+            polyline: arcpy.Polyline
+        return value: Polyline
+        """
+
+        parts = []
+        for i in range(polyline.partCount):
+            parts.append([(pnt.X, pnt.Y) for pnt in polyline.getPart(i) if pnt is not None])
+        return cls(parts)
+
+    @property
+    def __geo_interface__(self):
+        """
+        purpose:
+            GeoJSON geometry of the line, the same protocol arcpy geometries support
+        return value: dictionary
+            LineString or MultiLineString
+        """
+
+        parts = []
+        bounds = list(self.part_starts) + [self.segments.shape[0]]
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            vertices = np.vstack((self.segments[start:end, 0:2], self.segments[end - 1:end, 2:4]))
+            parts.append(vertices.tolist())
+        if len(parts) == 1:
+            return {"type": "LineString", "coordinates": parts[0]}
+        return {"type": "MultiLineString", "coordinates": parts}
+
+    def distance_to(self, point):
+        """
+        purpose:
+            planar distance from a point to the closest location on the line
+        arguments:
+            point: arcpy.Point or tuple of float
+        return value: float
+        """
+
+        return _nearest_on_segments(self.segments, self.lengths, self.measures, point_xy(point))[1]
+
+    def measure_on_line(self, point):
+        """
+        purpose:
+            distance along the line to the location closest to the point
+        arguments:
+            point: arcpy.Point or tuple of float
+        return value: float
+        """
+
+        return _nearest_on_segments(self.segments, self.lengths, self.measures, point_xy(point))[2]
+
+    @property
+    def partCount(self):
+        """
+        purpose:
+            number of parts, the same as arcpy.Polyline.partCount
+        return value: int
+        """
+
+        return self.part_starts.shape[0]
+
+    def getPart(self, index):
+        """
+        purpose:
+            get the vertices of a part, the same as arcpy.Polyline.getPart
+        arguments:
+            index: int
+        return value: list of Point
+        """
+
+        bounds = list(self.part_starts) + [self.segments.shape[0]]
+        start, end = bounds[index], bounds[index + 1]
+        vertices = np.vstack((self.segments[start:end, 0:2], self.segments[end - 1:end, 2:4]))
+        return [Point(x, y) for x, y in vertices.tolist()]
+
+    # arcpy.Polyline compatible names so a Polyline can be passed where arcpy geometry is expected
+    distanceTo = distance_to
+    measureOnLine = measure_on_line
+
+
+class LineIndex(object):
+    """
+    purpose:
+        Uniform grid over the segment bounding boxes of a set of lines.
+        Built once, then answers nearest line and measure on line queries
+        without measuring every line for every point.
+    arguments:
+        lines: list of Polyline or arcpy.Polyline
+            arcpy geometries are converted to Polyline when the index is built
+        cell_size: float
+            size of the grid cells
+            if None, a size is picked so there are roughly 2 segments per cell
+    """
+
+    def __init__(self, lines, cell_size=None):
+        self.lines = [line if isinstance(line, Polyline) else Polyline.from_arcpy(line) for line in lines]
+        if len(self.lines) == 0:
+            raise ValueError("LineIndex requires at least one line")
+        # flatten every segment of every line into parallel arrays
+        self.segments = np.vstack([line.segments for line in self.lines])
+        self.lengths = np.concatenate([line.lengths for line in self.lines])
+        self.measures = np.concatenate([line.measures for line in self.lines])
+        self.line_ids = np.repeat(np.arange(len(self.lines)), [line.segments.shape[0] for line in self.lines])
+        seg_x_min = np.minimum(self.segments[:, 0], self.segments[:, 2])
+        seg_y_min = np.minimum(self.segments[:, 1], self.segments[:, 3])
+        seg_x_max = np.maximum(self.segments[:, 0], self.segments[:, 2])
+        seg_y_max = np.maximum(self.segments[:, 1], self.segments[:, 3])
+        self.x_min = float(seg_x_min.min())
+        self.y_min = float(seg_y_min.min())
+        width = float(seg_x_max.max()) - self.x_min
+        height = float(seg_y_max.max()) - self.y_min
+        if cell_size is None:
+            cell_size = math.sqrt(max(width * height, 1e-12) / max(self.segments.shape[0] / 2.0, 1.0))
+            # long thin extents would otherwise get one enormous row of cells
+            cell_size = max(cell_size, max(width, height) / 4096.0, 1e-9)
+        self.cell_size = float(cell_size)
+        self.n_cols = int(width // self.cell_size) + 1
+        self.n_rows = int(height // self.cell_size) + 1
+        # cell ranges covered by each segment bounding box
+        col0 = ((seg_x_min - self.x_min) // self.cell_size).astype(np.int64)
+        col1 = ((seg_x_max - self.x_min) // self.cell_size).astype(np.int64)
+        row0 = ((seg_y_min - self.y_min) // self.cell_size).astype(np.int64)
+        row1 = ((seg_y_max - self.y_min) // self.cell_size).astype(np.int64)
+        n_c = col1 - col0 + 1
+        n_r = row1 - row0 + 1
+        counts = n_c * n_r
+        # expand each segment into one entry per covered cell
+        seg_ids = np.repeat(np.arange(self.segments.shape[0]), counts)
+        offsets = np.arange(seg_ids.shape[0]) - np.repeat(np.cumsum(counts) - counts, counts)
+        cols = col0[seg_ids] + (offsets % n_c[seg_ids])
+        rows = row0[seg_ids] + (offsets // n_c[seg_ids])
+        keys = rows * self.n_cols + cols
+        # compressed cell -> segment lookup, cell k holds cell_segments[cell_starts[k]:cell_starts[k + 1]]
+        order = np.argsort(keys, kind="stable")
+        self.cell_segments = seg_ids[order]
+        self.cell_starts = np.searchsorted(keys[order], np.arange(self.n_rows * self.n_cols + 1))
+
+    def nearest(self, point):
+        """
+        purpose:
+            find the line closest to a point and the measure of the point on that line
+            ties go to the line that comes first in the list, the same as a linear scan
+        arguments:
+            point: arcpy.Point or tuple of float
+        return value: tuple
+            (line_id, distance, measure)
+            line_id is the position of the line in the list the index was built from
+        """
+
+        x, y = point_xy(point)
+        col = int(math.floor((x - self.x_min) / self.cell_size))
+        row = int(math.floor((y - self.y_min) / self.cell_size))
+        # rings beyond this cannot contain any cells of the grid
+        max_ring = max(abs(col), abs(col - self.n_cols + 1), abs(row), abs(row - self.n_rows + 1))
+        best = None
+        # rings before this one are entirely outside the grid
+        ring = max(0, -col, col - self.n_cols + 1, -row, row - self.n_rows + 1)
+        while ring <= max_ring:
+            candidates = self._ring_segments(row, col, ring)
+            if candidates.shape[0] > 0:
+                seg_id, distance, measure = _nearest_on_segments(
+                    self.segments[candidates], self.lengths[candidates], self.measures[candidates], (x, y))
+                seg_id = int(candidates[seg_id])
+                if best is None or (distance, seg_id) < (best[1], best[0]):
+                    best = (seg_id, distance, measure)
+            # unsearched cells are at least ring * cell_size away from the point
+            if best is not None and best[1] <= ring * self.cell_size:
+                break
+            ring += 1
+        return int(self.line_ids[best[0]]), best[1], best[2]
+
+    def nearest_many(self, points):
+        """
+        purpose:
+            run nearest for every point in an array
+        arguments:
+            points: array-like of float, shape (N, 2), or list of arcpy.Point
+        return value: tuple of numpy.ndarray
+            (line_ids, distances, measures), each shape (N,)
+        """
+
+        xy = [point_xy(point) for point in points] if not isinstance(points, np.ndarray) else points[:, :2]
+        results = [self.nearest(point) for point in xy]
+        if len(results) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0), np.empty(0)
+        line_ids, distances, measures = zip(*results)
+        return np.array(line_ids, dtype=np.int64), np.array(distances), np.array(measures)
+
+    def _ring_segments(self, row, col, ring):
+        """
+        purpose:
+            get the unique ids of the segments in the cells on a square ring around a cell
+        arguments:
+            row: int
+            col: int
+                the center cell, it may be outside the grid
+            ring: int
+                Chebyshev distance in cells from the center cell
+        return value: numpy.ndarray of int
+        """
+
+        if ring == 0:
+            ring_rows = np.array([row])
+            ring_cols = np.array([col])
+        else:
+            span = np.arange(-ring, ring + 1)
+            side = np.arange(-ring + 1, ring)
+            ring_rows = np.concatenate((np.full(span.shape, row - ring), np.full(span.shape, row + ring), row + side, row + side))
+            ring_cols = np.concatenate((col + span, col + span, np.full(side.shape, col - ring), np.full(side.shape, col + ring)))
+        inside = (ring_rows >= 0) & (ring_rows < self.n_rows) & (ring_cols >= 0) & (ring_cols < self.n_cols)
+        keys = ring_rows[inside] * self.n_cols + ring_cols[inside]
+        if keys.shape[0] == 0:
+            return keys
+        starts = self.cell_starts[keys]
+        stops = self.cell_starts[keys + 1]
+        if not np.any(stops > starts):
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate([self.cell_segments[a:b] for a, b in zip(starts, stops) if b > a]))
+
+
+class Point(object):
+    """
+    purpose:
+        Point that can stand in for an arcpy.Point
+        Only the coordinates are stored, so millions of them stay small.
+        For bulk work keep the coordinates in a numpy array of shape (N, 2) instead,
+        the batch functions in GISUtils and GeometryUtils take those directly.
+    arguments:
+        X: float
+        Y: float
+        Z: float
+            optional
+        M: float
+            optional
+    """
+
+    __slots__ = ("X", "Y", "Z", "M")
+
+    def __init__(self, X=0.0, Y=0.0, Z=None, M=None):
+        self.X = X
+        self.Y = Y
+        self.Z = Z
+        self.M = M
+
+    def __eq__(self, other):
+        return isinstance(other, Point) and (self.X, self.Y, self.Z, self.M) == (other.X, other.Y, other.Z, other.M)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return "Point({0}, {1}, {2}, {3})".format(self.X, self.Y, self.Z, self.M)
+
+    @property
+    def __geo_interface__(self):
+        """
+        purpose:
+            GeoJSON geometry of the point
+        return value: dictionary
+        """
+
+        if self.Z is None:
+            return {"type": "Point", "coordinates": [self.X, self.Y]}
+        return {"type": "Point", "coordinates": [self.X, self.Y, self.Z]}
+
+
+class Polygon(object):
+    """
+    purpose:
+        Array-backed polygon that can stand in for an arcpy.Polygon
+        Rings are closed when they are built if the last vertex doesn't repeat the first.
+        Like arcpy, clockwise rings add to the area and counter-clockwise rings (holes) subtract from it.
+    arguments:
+        rings: list of sequences of (x, y), or numpy.ndarray of float, shape (N, 2)
+            the vertices of each ring
+            a single sequence of (x, y) is treated as a one ring polygon
+        spatial_reference: varies
+            optional, kept as spatialReference
+    """
+
+    __slots__ = ("rings", "extent", "spatialReference")
+
+    def __init__(self, rings, spatial_reference=None):
+        if isinstance(rings, np.ndarray) and rings.ndim == 2:
+            rings = [rings]
+        else:
+            rings = list(rings)
+            if len(rings) > 0 and len(rings[0]) > 0 and np.ndim(rings[0][0]) == 0:
+                rings = [rings]
+        closed = []
+        for ring in rings:
+            vertices = np.asarray(ring, dtype=np.float64)[:, :2]
+            if vertices.shape[0] < 3:
+                continue
+            if vertices[0, 0] != vertices[-1, 0] or vertices[0, 1] != vertices[-1, 1]:
+                vertices = np.vstack((vertices, vertices[:1]))
+            closed.append(vertices)
+        if len(closed) == 0:
+            raise ValueError("Polygon requires at least one ring with 3 vertices")
+        self.rings = closed
+        self.spatialReference = spatial_reference
+        if len(closed) == 1:
+            vertices = closed[0]
+        else:
+            vertices = np.vstack(closed)
+        x_min, y_min = vertices.min(axis=0).tolist()
+        x_max, y_max = vertices.max(axis=0).tolist()
+        self.extent = (x_min, y_min, x_max, y_max)
+
+    @property
+    def __geo_interface__(self):
+        """
+        purpose:
+            GeoJSON geometry of the polygon
+        return value: dictionary
+        """
+
+        return {"type": "Polygon", "coordinates": [ring.tolist() for ring in self.rings]}
+
+    @property
+    def area(self):
+        """
+        purpose:
+            planar area, clockwise rings positive and counter-clockwise rings negative
+        return value: float
+        """
+
+        total = 0.0
+        for ring in self.rings:
+            x = ring[:, 0]
+            y = ring[:, 1]
+            # shoelace formula, negated so clockwise is positive
+            total -= 0.5 * float(np.dot(x[:-1], y[1:]) - np.dot(x[1:], y[:-1]))
+        return total
+
+    @property
+    def length(self):
+        """
+        purpose:
+            perimeter of all the rings
+        return value: float
+        """
+
+        return float(sum(np.sum(np.hypot(np.diff(ring[:, 0]), np.diff(ring[:, 1]))) for ring in self.rings))
+
+    @property
+    def partCount(self):
+        """
+        purpose:
+            number of rings, the same as arcpy.Polygon.partCount
+        return value: int
+        """
+
+        return len(self.rings)
+
+    @property
+    def pointCount(self):
+        """
+        purpose:
+            number of vertices including the closing vertex of each ring
+        return value: int
+        """
+
+        return sum(ring.shape[0] for ring in self.rings)
+
+    def contains(self, point):
+        """
+        purpose:
+            determine if a point is inside the polygon, even-odd rule
+            points exactly on the boundary may go either way
+        arguments:
+            point: Point, arcpy.Point, or tuple of float
+        return value: boolean
+        """
+
+        return bool(self.contains_many(np.array([point_xy(point)]))[0])
+
+    def contains_many(self, points):
+        """
+        purpose:
+            determine which points are inside the polygon, even-odd rule
+        arguments:
+            points: array-like of float, shape (N, 2)
+        return value: numpy.ndarray of boolean, shape (N,)
+        """
+
+        xy = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        inside = np.zeros(xy.shape[0], dtype=bool)
+        for ring in self.rings:
+            x0 = ring[:-1, 0]
+            y0 = ring[:-1, 1]
+            x1 = ring[1:, 0]
+            y1 = ring[1:, 1]
+            # points x edges blocks of about a million values
+            chunk_size = max(1, 1048576 // x0.shape[0])
+            for start in range(0, xy.shape[0], chunk_size):
+                x = xy[start:start + chunk_size, 0][:, np.newaxis]
+                y = xy[start:start + chunk_size, 1][:, np.newaxis]
+                # edges that straddle each point's horizontal line, then which side of the edge the point is on
+                straddles = (y0 > y) != (y1 > y)
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    x_cross = x0 + ((y - y0) * (x1 - x0) / (y1 - y0))
+                inside[start:start + chunk_size] ^= (np.count_nonzero(straddles & (x < x_cross), axis=1) % 2).astype(bool)
+        return inside
+
+    def getPart(self, index):
+        """
+        purpose:
+            get the vertices of a ring, the same as arcpy.Polygon.getPart
+        arguments:
+            index: int
+        return value: list of Point
+        """
+
+        return [Point(x, y) for x, y in self.rings[index].tolist()]
+
+
+class Table(object):
+    """
+    purpose:
+        In-memory table that can stand in for a feature class or table
+        Rows are read and written with SearchCursor and InsertCursor, which work like
+        arcpy.da.SearchCursor and arcpy.da.InsertCursor, and the table is a row source
+        (list_fields and rows) so the GISUtils exports can read it.
+        The field tokens OID@ and SHAPE@ are supported.
+    arguments:
+        field_names: list of string
+            names of the fields, not including the object id field
+        rows: iterable of sequence
+            optional rows to load, each ordered like field_names
+        oid_field: string
+            name of the object id field, numbered from 1 as rows are inserted
+        shape_field: string
+            name of the geometry field used by the SHAPE@ token, None if there is no geometry
+    """
+
+    def __init__(self, field_names, rows=None, oid_field="OBJECTID", shape_field="SHAPE"):
+        self.oid_field = oid_field
+        self.shape_field = shape_field
+        self.field_names = [oid_field] + [name for name in field_names if name.lower() != oid_field.lower()]
+        self._rows = []
+        if rows is not None:
+            with self.insert_cursor(self.field_names[1:]) as cursor:
+                for row in rows:
+                    cursor.insertRow(row)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def insert_cursor(self, field_names):
+        """
+        purpose:
+            get a cursor that adds rows to the table
+        arguments:
+            field_names: list of string
+                fields of the inserted rows, in order, fields not listed are None
+        return value: InsertCursor
+        """
+
+        return InsertCursor(self, field_names)
+
+    def list_fields(self):
+        """
+        purpose:
+            get the names of all the fields in the table
+        return value: list of string
+        """
+
+        return list(self.field_names)
+
+    def rows(self, field_names, after_field=None, after_value=None):
+        """
+        purpose:
+            iterate over the rows of the table
+        arguments:
+            field_names: list of string
+                fields to include in each row, in order
+            after_field: string
+                optional field to filter and sort on, null values are sorted last
+            after_value: varies
+                only rows with after_field > after_value are returned
+                ignored if None
+        return value: iterator of tuple
+        """
+
+        rows = self._rows
+        if after_field is not None:
+            position = self._positions([after_field])[0]
+            if after_value is not None:
+                rows = [row for row in rows if row[position] is not None and row[position] > after_value]
+            # nulls sort last, like ORDER BY in most databases
+            rows = sorted(rows, key=lambda row: (row[position] is None, row[position] if row[position] is not None else 0))
+        return _select_rows(rows, self._positions(field_names), len(self.field_names))
+
+    def search_cursor(self, field_names, where=None):
+        """
+        purpose:
+            get a cursor that reads the rows of the table
+        arguments:
+            field_names: list of string
+                fields to include in each row, in order, or ["*"] for all fields
+            where: function
+                optional filter, called with each row (ordered like field_names)
+                and the row is returned only if it returns True
+        return value: SearchCursor
+        """
+
+        return SearchCursor(self, field_names, where)
+
+    def _positions(self, field_names):
+        """
+        purpose:
+            get the position in each stored row of a list of field names or tokens
+        arguments:
+            field_names: list of string
+        return value: list of int
+        """
+
+        lower_names = [name.lower() for name in self.field_names]
+        positions = []
+        for name in field_names:
+            name = name.lower()
+            if name == "oid@":
+                name = self.oid_field.lower()
+            elif name == "shape@" and self.shape_field is not None:
+                name = self.shape_field.lower()
+            if name not in lower_names:
+                raise ValueError("field {0} does not exist".format(name))
+            positions.append(lower_names.index(name))
+        return positions
+
+
+class InsertCursor(object):
+    """
+    purpose:
+        Adds rows to a Table, like arcpy.da.InsertCursor
+    arguments:
+        table: Table
+        field_names: list of string
+            fields of the inserted rows, in order, fields not listed are None
+    """
+
+    def __init__(self, table, field_names):
+        self.table = table
+        self.fields = tuple(field_names)
+        self._positions = table._positions(field_names)
+        self._width = len(table.field_names)
+        if self._positions == list(range(1, self._width)):
+            # every field but the object id, in table order
+            self._positions = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+    def insertRow(self, row):
+        """
+        purpose:
+            add a row to the table
+        arguments:
+            row: sequence
+                values ordered like the cursor's fields
+        return value: int
+            object id of the new row
+        """
+
+        rows = self.table._rows
+        oid = len(rows) + 1
+        if self._positions is None:
+            if len(row) != self._width - 1:
+                raise ValueError("row has {0} values, expected {1}".format(len(row), self._width - 1))
+            rows.append((oid,) + tuple(row))
+        else:
+            values = [None] * self._width
+            for position, value in zip(self._positions, row):
+                values[position] = value
+            values[0] = oid
+            rows.append(tuple(values))
+        return oid
+
+
+class SearchCursor(object):
+    """
+    purpose:
+        Reads the rows of a Table, like arcpy.da.SearchCursor
+    arguments:
+        table: Table
+        field_names: list of string
+            fields to include in each row, in order, or ["*"] for all fields
+        where: function
+            optional filter, called with each row and the row is returned only if it returns True
+    """
+
+    def __init__(self, table, field_names, where=None):
+        if len(field_names) == 1 and field_names[0] == "*":
+            field_names = table.field_names
+        self.table = table
+        self.fields = tuple(field_names)
+        self.where = where
+        self._positions = table._positions(field_names)
+        self.reset()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._iterator)
+
+    # python 2 iterator protocol, arcpy cursors support both
+    next = __next__
+
+    def reset(self):
+        """
+        purpose:
+            go back to the first row
+        return value: none
+        """
+
+        rows = _select_rows(self.table._rows, self._positions, len(self.table.field_names))
+        if self.where is not None:
+            rows = filter(self.where, rows)
+        self._iterator = iter(rows)
+
+
+def point_xy(point):
+    """
+    purpose:
+        get the x and y coordinates from an arcpy.Point or a coordinate tuple
+    arguments:
+        point: arcpy.Point or tuple of float
+    return value: tuple
+        (x, y)
+    """
+
+    if hasattr(point, "X"):
+        return float(point.X), float(point.Y)
+    return float(point[0]), float(point[1])
+
+
+def _nearest_on_segments(segments, lengths, measures, xy):
+    """
+    purpose:
+        find the segment closest to a point
+        the first segment wins if several are equally close
+    arguments:
+        segments: numpy.ndarray of float, shape (N, 4)
+            x0, y0, x1, y1 of each segment
+        lengths: numpy.ndarray of float, shape (N,)
+            length of each segment
+        measures: numpy.ndarray of float, shape (N,)
+            measure at the start of each segment
+        xy: tuple of float
+    return value: tuple
+        (segment position, distance, measure)
+    """
+
+    x0 = segments[:, 0]
+    y0 = segments[:, 1]
+    dx = segments[:, 2] - x0
+    dy = segments[:, 3] - y0
+    length_sq = lengths * lengths
+    # parameter of the projection of the point onto each segment, clamped to the segment
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = ((xy[0] - x0) * dx + (xy[1] - y0) * dy) / length_sq
+    t = np.clip(np.nan_to_num(t), 0.0, 1.0)
+    distances = np.hypot(x0 + (t * dx) - xy[0], y0 + (t * dy) - xy[1])
+    i = int(np.argmin(distances))
+    return i, float(distances[i]), float(measures[i] + (t[i] * lengths[i]))
+
+
+def _npz_path(file_path):
+    """
+    purpose:
+        add the .npz extension numpy.savez adds when it is missing
+    arguments:
+        file_path: string
+    return value: string
+    """
+
+    return file_path if file_path.endswith(".npz") else file_path + ".npz"
+
+
+def _select_rows(rows, positions, width):
+    """
+    purpose:
+        pick fields out of stored rows
+    arguments:
+        rows: iterable of tuple
+        positions: list of int
+            position of each field to return
+        width: int
+            number of fields in each stored row
+    return value: iterator of tuple
+    """
+
+    if positions == list(range(width)):
+        # every field in table order, pass the rows through untouched
+        return iter(rows)
+    select = operator.itemgetter(*positions)
+    if len(positions) == 1:
+        return ((select(row),) for row in rows)
+    return map(select, rows)
+
+
+def _sq_distances(queries, points):
+    """
+    purpose:
+        squared distances between every query and every point
+    arguments:
+        queries: numpy.ndarray of float, shape (M, dimensions)
+        points: numpy.ndarray of float, shape (N, dimensions)
+    return value: numpy.ndarray of float, shape (M, N)
+    """
+
+    block = np.zeros((queries.shape[0], points.shape[0]), dtype=np.float64)
+    for axis in range(queries.shape[1]):
+        delta = queries[:, axis][:, np.newaxis] - points[:, axis][np.newaxis, :]
+        block += delta * delta
+    return block
+
+
+if __name__ == '__main__':
+    main()
@@ -3,7 +3,7 @@ Name:           SMSUtils
 
 Purpose:        Utilities for sending SMS messages using Twilio API
 
-Dependencies:   twilio
+Dependencies:   twilio, ConfigUtils
 
 Version:        3.6
 
@@ -13,14 +13,14 @@ Created:        9/12/2018
 """
 
 
-import json
-import os
+import ConfigUtils
 import re
-from twilio.rest import Client
-from twilio.base.exceptions import TwilioRestException
 
-config_file = os.path.join(os.path.dirname(__file__), "config.json")
-CONFIG = json.loads(open(config_file).read()) if os.path.isfile(config_file) else {}
+# twilio is imported the first time it is used
+twilio_rest = ConfigUtils.lazy_import("twilio.rest")
+twilio_exceptions = ConfigUtils.lazy_import("twilio.base.exceptions")
+
+CONFIG = ConfigUtils.get_config()
 
 
 def main():
@@ -59,16 +59,21 @@ def send_text_message(phone_number, text_message):
         ret_dict["messages"].append("Text message must be <= 1000 characters")
         ret_dict["success"] = False
         return
+    # twilio is only imported here, so check it's installed before the except clauses need it
+    if not ConfigUtils.module_available("twilio"):
+        ret_dict["messages"].append("There was an error sending the SMS: the twilio module is not installed")
+        ret_dict["success"] = False
+        return ret_dict
     # send the text
     acct_sid = CONFIG.get("twilio_sid", "")
     token = CONFIG.get("twilio_token", "")
     from_num = CONFIG.get("twilio_from_num", "")
     to_num = "+1{0}".format(phone_number.replace("-", ""))
     try:
-        client = Client(acct_sid, token)
+        client = twilio_rest.Client(acct_sid, token)
         client.messages.create(to=to_num, from_=from_num, body=text_message)
         ret_dict["success"] = True
-    except TwilioRestException as e:
+    except twilio_exceptions.TwilioRestException as e:
         ret_dict["messages"].append("There was an error sending the SMS: {0}".format(e.msg))
         ret_dict["success"] = False
     except Exception as e:
@@ -3,7 +3,7 @@ Name:           SlackUtils
 
 Purpose:        Post messages and files to Slack
 
-Dependencies:   requests
+Dependencies:   requests, ConfigUtils
 
 Version:        3.6
 
@@ -13,14 +13,14 @@ Created:        9/12/2018
 """
 
 
-import json
-import os
-import requests
+import ConfigUtils
 import time
 
+# requests is imported the first time it is used
+requests = ConfigUtils.lazy_import("requests")
 
-config_file = os.path.join(os.path.dirname(__file__), "config.json")
-CONFIG = json.loads(open(config_file).read()) if os.path.isfile(config_file) else {}
+
+CONFIG = ConfigUtils.get_config()
 
 
 def main():
@@ -3,7 +3,7 @@ Name:           TypeUtils
 
 Purpose:        Determine the data types of arguments
 
-Dependencies:   none
+Dependencies:   ConfigUtils
 
 Version:        3.6
 
@@ -13,13 +13,11 @@ Created:        9/17/2018
 """
 
 
+import ConfigUtils
 import datetime
-import json
-import os
 
 
-config_file = os.path.join(os.path.dirname(__file__), "config.json")
-CONFIG = json.loads(open(config_file).read()) if os.path.isfile(config_file) else {}
+CONFIG = ConfigUtils.get_config()
 
 
 def main():
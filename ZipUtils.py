@@ -3,7 +3,7 @@ Name:           ZipUtils.py
 
 Purpose:        Zip file utilities
 
-Dependencies:   none
+Dependencies:   ConfigUtils
 
 Version:        3.6
 
@@ -13,13 +13,12 @@ Created:        9/12/2018
 """
 
 
-import json
+import ConfigUtils
 import os
 import zipfile
 
 
-config_file = os.path.join(os.path.dirname(__file__), "config.json")
-CONFIG = json.loads(open(config_file).read()) if os.path.isfile(config_file) else {}
+CONFIG = ConfigUtils.get_config()
 
 
 def main():